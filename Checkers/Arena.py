@@ -0,0 +1,300 @@
+from Checkers.DuelModel import *
+
+import numpy as np
+
+import json
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+# constants for playing games in an arena
+# the exploration rate used by every network, so that games with different seeds are different
+ARENA_EXPLORATION = 0.05
+# the number of games given to a worker process at once
+ARENA_CHUNK_SIZE = 8
+# the number of draws added between every pair of checkpoints which played each other, so that the rating of
+#   a checkpoint which won or lost every game is still finite
+ARENA_PRIOR_DRAWS = 1
+# the number of Elo points for a factor of 10 in the odds of winning
+ARENA_ELO_SCALE = 400
+# the number of standard errors on each side of a rating for its confidence interval, 1.96 for 95%
+ARENA_CONFIDENCE = 1.96
+# the maximum number of iterations used to find ratings
+ARENA_MAX_ITERATIONS = 100
+
+# the checkpoints of the Arena a worker process is playing games for
+arenaCheckpoints = []
+# the Backends loaded in a worker process, mapping the index of a checkpoint to a dictionary mapping the names of
+#   the networks of a DuelModel to Backends
+arenaBackends = {}
+
+
+class Arena:
+    """
+    An object for finding how strong saved DuelModels are, by playing games between them without a Gui.
+    Games are played in parallel across processes, with a fixed seed for each game, and each pair of DuelModels
+        swaps colors every game. Ratings are found from the results with a Bradley-Terry model, on the Elo scale
+    """
+
+    def __init__(self, checkpoints, size=8, workers=None, explorationRate=ARENA_EXPLORATION, seed=0):
+        """
+        Create an Arena
+        :param checkpoints: A list of 2-tuples (loadPath, name), of the DuelModels to play, in the same form as
+            DuelModel.load
+        :param size: The size of the board, default 8
+        :param workers: The number of processes to use, or None to use one for each CPU, default None
+        :param explorationRate: The exploration rate of every network while playing, default ARENA_EXPLORATION
+        :param seed: The seed of the first game, each game after uses the next seed, default 0
+        """
+        self.checkpoints = checkpoints
+        self.size = size
+        self.workers = workers
+        self.explorationRate = explorationRate
+        self.seed = seed
+
+    def run(self, gamesPerPair, pairs=None, printProgress=False):
+        """
+        Play games between pairs of checkpoints, and find the rating of each checkpoint
+        :param gamesPerPair: The number of games played by each pair, each checkpoint plays red in half of them
+        :param pairs: A list of 2-tuples of the indexes of the checkpoints which play each other,
+            or None to play every pair, default None
+        :param printProgress: True to print each time a pair finishes, False otherwise, default False
+        :return: A dictionary of the results, in the same form written by saveResults
+        """
+        if pairs is None:
+            pairs = [(i, j) for i in range(len(self.checkpoints)) for j in range(i + 1, len(self.checkpoints))]
+
+        # each game is a 5-tuple (size, red index, black index, seed, explorationRate)
+        games = []
+        for i, j in pairs:
+            for g in range(gamesPerPair):
+                red, black = (i, j) if g % 2 == 0 else (j, i)
+                games.append((self.size, red, black, self.seed + len(games), self.explorationRate))
+
+        results = []
+        with ProcessPoolExecutor(self.workers, initializer=initArenaWorker, initargs=(self.checkpoints,)) as executor:
+            for result in executor.map(playArenaGame, games, chunksize=ARENA_CHUNK_SIZE):
+                results.append(result)
+                if printProgress and len(results) % gamesPerPair == 0:
+                    print("Played", len(results), "of", len(games), "games")
+
+        return self.summarize(games, results)
+
+    def summarize(self, games, results):
+        """
+        Helper method for run. Count the outcomes of the games, and find the ratings
+        :param games: The list of games played, in the form used by run
+        :param results: A list of 3-tuples (win, moves, random moves) for each game, from playArenaGame
+        :return: The dictionary of the results
+        """
+        count = len(self.checkpoints)
+        wins = np.zeros((count, count))
+        draws = np.zeros((count, count))
+
+        pairResults = {}
+        for (size, red, black, seed, explore), (win, moves, randomMoves) in zip(games, results):
+            # the number of wins each checkpoint has against each other checkpoint
+            if win == E_RED_WIN:
+                wins[red, black] += 1
+            elif win == E_BLACK_WIN:
+                wins[black, red] += 1
+            else:
+                draws[red, black] += 1
+                draws[black, red] += 1
+
+            # the results of each pair, from the perspective of the checkpoint with the lower index
+            first, second = min(red, black), max(red, black)
+            pair = pairResults.setdefault((first, second), {
+                "first": checkpointName(self.checkpoints[first]),
+                "second": checkpointName(self.checkpoints[second]),
+                "games": 0, "first wins": 0, "second wins": 0, "draws": 0, "moves": 0, "random moves": 0,
+                "outcomes": {}
+            })
+            pair["games"] += 1
+            pair["moves"] += moves
+            pair["random moves"] += randomMoves
+            winner = {E_RED_WIN: red, E_BLACK_WIN: black}.get(win)
+            if winner is None:
+                pair["draws"] += 1
+            else:
+                pair["first wins" if winner == first else "second wins"] += 1
+            pair["outcomes"][E_TEXT[win]] = pair["outcomes"].get(E_TEXT[win], 0) + 1
+
+        ratings, errors = bradleyTerry(wins, draws)
+
+        return {
+            "games": len(results),
+            "seed": self.seed,
+            "exploration rate": self.explorationRate,
+            # the moves made randomly because the networks could not pick a move, if this is a large part of the
+            #   moves, the ratings are not only of the networks
+            "moves": sum(r[1] for r in results),
+            "random moves": sum(r[2] for r in results),
+            # a player which can't be compared to the first player has no bounds, None is written as null
+            "ratings": [{
+                "checkpoint": checkpointName(c),
+                "elo": float(r),
+                "low": float(r - ARENA_CONFIDENCE * e) if np.isfinite(e) else None,
+                "high": float(r + ARENA_CONFIDENCE * e) if np.isfinite(e) else None
+            } for c, r, e in zip(self.checkpoints, ratings, errors)],
+            "outcomes": {E_TEXT[w]: sum(1 for r in results if r[0] == w) for w in sorted({r[0] for r in results})},
+            "pairs": list(pairResults.values())
+        }
+
+
+def saveResults(results, fileName):
+    """
+    Write the results of an Arena to a JSON file
+    :param results: The dictionary from Arena.run
+    :param fileName: The name of the file, relative to Constants.NETWORK_SAVES
+    """
+    if not path.isdir(NETWORK_SAVES):
+        os.mkdir(NETWORK_SAVES)
+    with open(NETWORK_SAVES + "/" + fileName, "w") as f:
+        json.dump(results, f, indent=2, allow_nan=False)
+
+
+def checkpointName(checkpoint):
+    """
+    Get a name to display for a checkpoint
+    :param checkpoint: A 2-tuple (loadPath, name)
+    :return: The name
+    """
+    return checkpoint[0] + "/" + checkpoint[1]
+
+
+def initArenaWorker(checkpoints):
+    """
+    Set up a worker process for an Arena, each DuelModel is only loaded the first time it is used
+    :param checkpoints: The list of checkpoints of the Arena
+    """
+    global arenaCheckpoints
+    arenaCheckpoints = checkpoints
+    arenaBackends.clear()
+
+
+def loadArenaBackends(index):
+    """
+    Get the Backends of a checkpoint in a worker process, loading them if they are not loaded.
+    The networks only play in an arena, so only their weights are loaded, and their outputs are found with numpy
+    :param index: The index of the checkpoint
+    :return: A dictionary mapping the names of the networks of a DuelModel to Backends
+    """
+    backends = arenaBackends.get(index)
+    if backends is None:
+        backends = loadBackends(*arenaCheckpoints[index])
+        if backends is None:
+            raise ValueError("Could not load the checkpoint " + checkpointName(arenaCheckpoints[index]))
+        arenaBackends[index] = backends
+    return backends
+
+
+def playArenaGame(gameInfo):
+    """
+    Play one game in a worker process of an Arena
+    :param gameInfo: A 5-tuple (size, red index, black index, seed, explorationRate)
+    :return: A 3-tuple (win, moves, random moves), the E_* code of how the game ended, the number of moves made,
+        and how many of them were made randomly because the networks could not pick a move
+    """
+    size, red, black, seed, explorationRate = gameInfo
+    random.seed(seed)
+    np.random.seed(seed % 2 ** 32)
+
+    game = Game(size)
+    redEnv = backendEnvironment(game, loadArenaBackends(red), True)
+    blackEnv = backendEnvironment(game, loadArenaBackends(black), False)
+
+    moves = 0
+    randomMoves = 0
+    while game.win == E_PLAYING:
+        env = redEnv if game.redTurn else blackEnv
+        if not playEnvironmentMove(env, game, explorationRate):
+            # if the networks can't pick a move, make a random one
+            allMoves = game.allMoves()
+            if len(allMoves) == 0:
+                game.checkWinConditions()
+                break
+            pos, modifiers = random.choice(allMoves)
+            game.play(pos, modifiers)
+            randomMoves += 1
+        moves += 1
+
+    return game.win, moves, randomMoves
+
+
+def playEnvironmentMove(env, game, explorationRate):
+    """
+    Helper function for playArenaGame. Make a move in a Game with the networks of a PieceEnvironment,
+        without training them
+    :param env: The PieceEnvironment
+    :param game: The Game to make the move in, which does not need to be the Game of the PieceEnvironment
+    :param explorationRate: The exploration rate to use for the move
+    :return: True if a move was made, False otherwise
+    """
+    oldGame, oldCurrent = env.game, env.current
+    oldExplore = env.internalNetwork.explorationRate, env.gameNetwork.explorationRate
+    env.game = game
+    env.gameEnv.game = game
+    env.internalNetwork.explorationRate = explorationRate
+    env.gameNetwork.explorationRate = explorationRate
+
+    before = (game.toKey(True), game.redTurn)
+    try:
+        env.performAction(env.internalNetwork)
+    finally:
+        env.game, env.current = oldGame, oldCurrent
+        env.gameEnv.game = oldGame
+        env.internalNetwork.explorationRate, env.gameNetwork.explorationRate = oldExplore
+
+    return not before == (game.toKey(True), game.redTurn)
+
+
+def bradleyTerry(wins, draws):
+    """
+    Find the rating of each player with the maximum likelihood of a Bradley-Terry model, where each draw counts as
+        half of a win for both players. The first player has a rating of 0
+    :param wins: A 2D numpy array, where wins[i, j] is the number of times player i beat player j
+    :param draws: A symmetric 2D numpy array, where draws[i, j] is the number of draws between player i and j
+    :return: A 2-tuple (ratings, errors), 1D numpy arrays of the rating of each player on the Elo scale,
+        and the standard error of each rating. Players who never played anyone have a rating of 0, and an
+        infinite error
+    """
+    count = len(wins)
+    games = wins + wins.T + draws
+    played = games > 0
+
+    # add draws between every pair that played, so every rating is finite
+    scores = wins + (draws + ARENA_PRIOR_DRAWS * played) / 2
+    games = games + ARENA_PRIOR_DRAWS * played
+
+    # only players connected to the first player can be rated, the rest keep a rating of 0
+    connected = np.zeros(count, dtype=bool)
+    connected[0] = True
+    for i in range(count):
+        connected |= played[connected].any(axis=0)
+    free = np.flatnonzero(connected)[1:]
+
+    theta = np.zeros(count)
+    information = np.zeros((len(free), len(free)))
+    for iteration in range(ARENA_MAX_ITERATIONS):
+        # the probability that player i beats player j
+        p = 1 / (1 + np.exp(theta[np.newaxis, :] - theta[:, np.newaxis]))
+        gradient = (scores - games * p).sum(axis=1)[free]
+        weights = games * p * (1 - p)
+        hessian = np.diag(weights.sum(axis=1)) - weights
+        information = hessian[np.ix_(free, free)]
+        if len(free) == 0:
+            break
+
+        # take a Newton step, the log likelihood is concave, so this converges quickly
+        step = np.linalg.solve(information, gradient)
+        theta[free] += step
+        if np.abs(step).max() < 1e-9:
+            break
+
+    scale = ARENA_ELO_SCALE / np.log(10)
+    errors = np.full(count, np.inf)
+    errors[0] = 0
+    if len(free) > 0:
+        errors[free] = np.sqrt(np.diag(np.linalg.inv(information)))
+
+    return theta * scale, errors * scale
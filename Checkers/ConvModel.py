@@ -21,30 +21,37 @@ class ConvNetwork(Network):
         layers = [keras.layers.Conv2D(self.actions, c, activation="sigmoid",
                                       use_bias=True, data_format='channels_last',
                                       input_shape=(self.game.height, self.game.width, self.channels),
+                                      dtype=self.layerPolicy(),
                                       kernel_initializer=tf.keras.initializers.RandomUniform(-1, 1, None),
                                       bias_initializer=tf.keras.initializers.RandomUniform(-1, 1, None))
                   if i == 0 else
 
                   keras.layers.Conv2D(self.inner[i], c, activation="sigmoid",
-                                      use_bias=True, data_format='channels_last',
+                                      use_bias=True, data_format='channels_last', dtype=self.layerPolicy(),
                                       kernel_initializer=tf.keras.initializers.RandomUniform(-1, 1, None),
                                       bias_initializer=tf.keras.initializers.RandomUniform(-1, 1, None))
 
                   for i, c in enumerate(convSizes)]
 
-        # create the output layer
-        layers.append(keras.layers.Dense(self.actions, activation="linear", use_bias=True))
+        # create the output layer, always in float32 so the outputs are float32
+        layers.append(keras.layers.Dense(self.actions, activation="linear", use_bias=True, dtype="float32"))
 
         # create the network object
         self.net = keras.Sequential(layers)
 
         # compile and finish building network
         self.net.compile(optimizer=self.optimizer,
-                         loss=LOSS_FUNCTION())
+                         loss=getattr(keras.losses, LOSS_FUNCTION)())
+        self.trainFunction = None
+
+    def getConfig(self):
+        config = super().getConfig()
+        config.update({"channels": self.channels, "width": self.game.width, "height": self.game.height})
+        return config
 
     def getActions(self, s):
         # get the actions
-        actions = self.net(s)
+        actions = self.backend.predict(s)
         # convert the actions to a list
         return actions[0][0][0]
 
@@ -53,4 +60,4 @@ class ConvNetwork(Network):
         Get the output values of the model
         :return: The output values as a numpy array
         """
-        return self.net(self.getInputs())[0][0]
+        return self.backend.predict(self.getInputs())[0][0]
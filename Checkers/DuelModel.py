@@ -1,4 +1,5 @@
 from Checkers.Environments import *
+from learning.Checkpoint import *
 
 
 class DuelModel:
@@ -6,20 +7,36 @@ class DuelModel:
     A class used to contain two Environment models, one for each side of a checkers game
     """
 
-    def __init__(self, game, rGameInner=None, rPieceInner=None, bGameInner=None, bPieceInner=None):
+    def __init__(self, game, rGameInner=None, rPieceInner=None, bGameInner=None, bPieceInner=None,
+                 sharedNetworks=False):
         """
         Create the DuelModel object
         :param game: The game to use for the object
         :param rGameInner: The inner layers for the red game network
         :param rPieceInner: The inner layers for the red piece network
-        :param bGameInner: The inner layers for the black game network
-        :param bPieceInner: The inner layers for the black piece network
+        :param bGameInner: The inner layers for the black game network, not used with shared networks
+        :param bPieceInner: The inner layers for the black piece network, not used with shared networks
+        :param sharedNetworks: True for both sides to use one game network and one piece network, which see the board
+            from the perspective of the side moving, False for each side to have its own networks, default False
         """
         self.redEnv = PieceEnvironment(game, gameInner=rGameInner, pieceInner=rPieceInner)
-        self.blackEnv = PieceEnvironment(game, gameInner=bGameInner, pieceInner=bPieceInner, enemyEnv=self.redEnv)
-        self.redEnv.enemyEnv = self.blackEnv
+        self.sharedNetworks = sharedNetworks
+        if sharedNetworks:
+            # one PieceEnvironment with no enemy environment uses its own networks for both sides
+            self.blackEnv = self.redEnv
+        else:
+            self.blackEnv = PieceEnvironment(game, gameInner=bGameInner, pieceInner=bPieceInner,
+                                             enemyEnv=self.redEnv)
+            self.redEnv.enemyEnv = self.blackEnv
         self.game = game
 
+        # Players which make the moves for a side instead of the Environment of that side, None to not use one
+        self.redPlayer = None
+        self.blackPlayer = None
+
+        # the Checkpointer which saves this DuelModel in the background while it trains, None to not save
+        self.checkpointer = None
+
     def currentEnvironment(self):
         """
         Get the Environment object for the current turn of the game
@@ -27,6 +44,45 @@ class DuelModel:
         """
         return self.redEnv if self.game.redTurn else self.blackEnv
 
+    def setPlayer(self, red, player):
+        """
+        Set the Player which makes the moves for one side, instead of the Environment of that side.
+        Moves made by a Player are not used for training
+        :param red: True to set the Player for red side, False for black side
+        :param player: The Player, which must use the same Game as this DuelModel, or None to use the Environment
+        """
+        if red:
+            self.redPlayer = player
+        else:
+            self.blackPlayer = player
+
+    def currentPlayer(self):
+        """
+        Get the Player object for the current turn of the game
+        :return: The Player object, or None if the Environment makes moves for that side
+        """
+        return self.redPlayer if self.game.redTurn else self.blackPlayer
+
+    def enableCheckpoints(self, savePath, name, everyGames=None, everyMinutes=None, keep=CHECKPOINT_KEEP):
+        """
+        Save this DuelModel to numbered checkpoints in the background while it plays games with playGame
+        :param savePath: The path, relative to saves, to save the checkpoints
+        :param name: The base name to use for the checkpoints
+        :param everyGames: The number of games between checkpoints, None to not count games, default None
+        :param everyMinutes: The number of minutes between checkpoints, None to not count time, default None
+        :param keep: The number of checkpoints to keep, older ones are deleted, default CHECKPOINT_KEEP
+        """
+        self.closeCheckpoints()
+        self.checkpointer = Checkpointer(path.join(savePath, name), everyGames, everyMinutes, keep)
+
+    def closeCheckpoints(self):
+        """
+        Stop saving checkpoints, waiting for any checkpoint which is still being written
+        """
+        if self.checkpointer is not None:
+            self.checkpointer.close()
+            self.checkpointer = None
+
     def playGame(self, printReward=False, defaultState=None):
         """
         Play a game of checkers using both models, training them separately
@@ -37,6 +93,9 @@ class DuelModel:
         """
 
         self.game.resetGame(defaultState)
+        for player in (self.redPlayer, self.blackPlayer):
+            if player is not None:
+                player.reset()
 
         redTotal, blackTotal, redMoves, blackMoves = 0, 0, 0, 0
 
@@ -44,7 +103,12 @@ class DuelModel:
         while self.game.win == E_PLAYING:
 
             turn = self.game.redTurn
-            reward = self.currentEnvironment().playGameMove(printReward)
+            player = self.currentPlayer()
+            if player is None:
+                reward = self.currentEnvironment().playGameMove(printReward)
+            else:
+                # moves made by a player give no reward
+                reward = 0 if player.makeMove() else None
             if reward is None:
                 break
             else:
@@ -55,6 +119,13 @@ class DuelModel:
                     blackTotal += reward
                     blackMoves += 1
 
+        self.redEnv.endEpisode()
+        if not self.sharedNetworks:
+            self.blackEnv.endEpisode()
+
+        if self.checkpointer is not None:
+            self.checkpointer.gameFinished(self.snapshot)
+
         return redTotal, blackTotal, redMoves, blackMoves
 
     def decayModels(self):
@@ -62,31 +133,118 @@ class DuelModel:
         Apply decay to the networks of both models
         """
         self.redEnv.decayNetworks()
-        self.blackEnv.decayNetworks()
+        if not self.sharedNetworks:
+            self.blackEnv.decayNetworks()
+
+    def networks(self):
+        """
+        Get every Network of this DuelModel, with the name used for it in a checkpoint.
+            Shared networks only use the names of the red networks
+        :return: A dictionary mapping names to Networks
+        """
+        if self.sharedNetworks:
+            return {
+                "red " + PIECE_NETWORK_NAME: self.redEnv.internalNetwork,
+                "red " + GAME_NETWORK_NAME: self.redEnv.gameNetwork
+            }
+        return {
+            "red " + PIECE_NETWORK_NAME: self.redEnv.internalNetwork,
+            "red " + GAME_NETWORK_NAME: self.redEnv.gameNetwork,
+            "black " + PIECE_NETWORK_NAME: self.blackEnv.internalNetwork,
+            "black " + GAME_NETWORK_NAME: self.blackEnv.gameNetwork
+        }
+
+    def setBackend(self, backend):
+        """
+        Set the Backend used to find the outputs of every Network of this DuelModel
+        :param backend: The Backend class, i.e. KerasBackend or NumpyBackend, which is created for each Network
+        """
+        for net in self.networks().values():
+            net.setBackend(backend(net))
+
+    def shareSamples(self, share=True):
+        """
+        Set whether the networks of each side also train on the moves made by the other side. Each side sees the board
+            from its own perspective, so a move by one side is also a valid sample for the other
+        :param share: True to share samples, False to only train on moves from the same side, default True
+        """
+        # shared networks already train on the moves of both sides
+        if self.sharedNetworks:
+            return
+        for red, black in ((self.redEnv.gameNetwork, self.blackEnv.gameNetwork),
+                           (self.redEnv.internalNetwork, self.blackEnv.internalNetwork)):
+            for net, twin in ((red, black), (black, red)):
+                if share:
+                    net.shareSamples(twin)
+                elif twin in net.sampleTwins:
+                    net.sampleTwins.remove(twin)
+
+    def enableReplay(self, capacity, batchSize=REPLAY_BATCH_SIZE):
+        """
+        Train every Network of this DuelModel from its own PrioritizedReplay, see Network.enableReplay
+        :param capacity: The largest number of transitions stored for each Network
+        :param batchSize: The number of transitions trained on each move, default REPLAY_BATCH_SIZE
+        """
+        for net in self.networks().values():
+            net.enableReplay(capacity, batchSize)
+
+    def enableNStep(self, steps):
+        """
+        Train every Network of this DuelModel on n-step transitions, see Network.enableNStep. Each side only combines
+            its own moves
+        :param steps: The number of moves combined into each transition
+        """
+        for net in self.networks().values():
+            net.enableNStep(steps)
+
+    def enableFastTraining(self, jitCompile=True, mixedPrecision=False, stepsPerExecution=1):
+        """
+        Train every Network of this DuelModel with a compiled train step, see Network.enableFastTraining
+        :param jitCompile: True to compile the train step with XLA, False otherwise, default True
+        :param mixedPrecision: True to use mixed precision, False to use float32, default False
+        :param stepsPerExecution: The number of minibatches trained in each call to the train step, default 1
+        """
+        for net in self.networks().values():
+            net.enableFastTraining(jitCompile, mixedPrecision, stepsPerExecution)
+
+    def snapshot(self):
+        """
+        Copy the weights, optimizer state, and rates of every Network into memory
+        :return: A dictionary mapping the names of Networks to snapshots, which can be given to writeCheckpoint
+        """
+        return {name: networkSnapshot(net) for name, net in self.networks().items()}
 
     def save(self, savePath, name):
         """
-        Save all of the networks associated with this DuelModel
+        Save all of the networks associated with this DuelModel, to a checkpoint with all of their weights,
+            optimizer states, and rates
         :param savePath: The path, relative to saves, to save this DuelModel
         :param name: The base name to use for saving
         :return: True if the save was successful, False otherwise
         """
-
-        redName = savePath + "/" + name + " red "
-        blackName = savePath + "/" + name + " black "
-
-        success = self.redEnv.saveNetworks(redName + PIECE_NETWORK_NAME, redName + GAME_NETWORK_NAME)
-        success &= self.blackEnv.saveNetworks(blackName + PIECE_NETWORK_NAME, blackName + GAME_NETWORK_NAME)
-
-        return success
+        try:
+            writeCheckpoint(self.snapshot(), path.join(savePath, name))
+            return True
+        except (IOError, OSError):
+            return False
 
     def load(self, loadPath, name):
         """
-        Load all of the networks associated with this DuelModel
+        Load all of the networks associated with this DuelModel, from a checkpoint,
+            or from the Keras models saved by older versions if there is no checkpoint.
+            A checkpoint of a DuelModel with shared networks can be loaded by a DuelModel without, and the reverse
         :param loadPath: the path, relative to saves, where the DuelModel is saved
         :param name: The base name used to save the model
         :return: True if the load was successful, False otherwise
         """
+        snapshots = readCheckpoint(path.join(loadPath, name))
+        if snapshots is not None:
+            success = True
+            for netName, net in self.networks().items():
+                snapshot = sideEntry(snapshots, netName)
+                success &= snapshot is not None and restoreNetwork(net, snapshot)
+            return success
+
         redName = loadPath + "/" + name + " red "
         blackName = loadPath + "/" + name + " black "
 
@@ -95,6 +253,82 @@ class DuelModel:
 
         return success
 
+    def loadLatest(self, loadPath, name):
+        """
+        Load all of the networks associated with this DuelModel, from the newest checkpoint saved by enableCheckpoints
+        :param loadPath: the path, relative to saves, where the checkpoints are saved
+        :param name: The base name used for the checkpoints
+        :return: True if the load was successful, False otherwise
+        """
+        latest = latestCheckpoint(path.join(loadPath, name))
+        return latest is not None and self.load(path.dirname(latest), path.basename(latest))
+
+    def exportQuantized(self, savePath, name, precision=QUANTIZE_INT8):
+        """
+        Save the weights of all of the networks of this DuelModel in a lower precision, to a checkpoint which can
+            only be loaded with loadQuantized, for playing games
+        :param savePath: The path, relative to saves, to save the checkpoint
+        :param name: The base name to use for saving
+        :param precision: QUANTIZE_INT8 or QUANTIZE_FLOAT16, default QUANTIZE_INT8
+        :return: True if the save was successful, False otherwise
+        """
+        try:
+            snapshots = {n: quantizedSnapshot(s, precision) for n, s in self.snapshot().items()}
+            writeCheckpoint(snapshots, path.join(savePath, name))
+            return True
+        except (IOError, OSError):
+            return False
+
+    def loadQuantized(self, loadPath, name):
+        """
+        Load the networks of this DuelModel from a checkpoint saved by exportQuantized. Each Network uses a
+            QuantizedBackend with the loaded weights, the Keras models are not changed, and should not be trained
+        :param loadPath: the path, relative to saves, where the checkpoint is saved
+        :param name: The base name used to save the checkpoint
+        :return: True if the load was successful, False otherwise
+        """
+        snapshots = readCheckpoint(path.join(loadPath, name))
+        if snapshots is None:
+            return False
+
+        backends = {}
+        for netName, net in self.networks().items():
+            snapshot = sideEntry(snapshots, netName)
+            if snapshot is None or "precision" not in snapshot["config"] or \
+                    not snapshot["config"]["actions"] == net.actions:
+                return False
+            backends[netName] = QuantizedBackend(precision=snapshot["config"]["precision"])
+            backends[netName].loadQuantized(snapshot["weights"])
+
+        for netName, net in self.networks().items():
+            net.setBackend(backends[netName])
+        return True
+
+    def quantizationReport(self, precision=QUANTIZE_INT8, positions=200, seed=0):
+        """
+        Find how much quantizing the weights of the networks of this DuelModel changes the moves they pick,
+            by comparing them on positions from random games
+        :param precision: QUANTIZE_INT8 or QUANTIZE_FLOAT16, default QUANTIZE_INT8
+        :param positions: The number of positions to compare on, default 200
+        :param seed: The seed for the random games, default 0
+        :return: A dictionary mapping the name of each Network to a dictionary with the results of compareBackends,
+            and the keys "float bytes" and "quantized bytes" with the memory used by the weights of each
+        """
+        games = randomPositions(self.game.width * 2, positions, seed)
+        gameInputs = np.concatenate([gameToNetInput(g, None) for g in games])
+        pieceInputs = np.concatenate([gameToNetInput(g, g.singlePos(s)) for g in games
+                                      for s in sorted({g.toSinglePos(*pos) for pos, modifiers in g.allMoves()})])
+
+        report = {}
+        for netName, net in self.networks().items():
+            reference = NumpyBackend(net)
+            quantized = QuantizedBackend(net, precision)
+            inputs = gameInputs if net is self.redEnv.gameNetwork or net is self.blackEnv.gameNetwork else pieceInputs
+            report[netName] = compareBackends(reference, quantized, inputs)
+            report[netName]["float bytes"] = reference.weightBytes()
+            report[netName]["quantized bytes"] = quantized.weightBytes()
+        return report
+
     def trainCollective(self, games, printMoves=False, printGames=False):
         """
         Play the game by making moves without learning anything from them initially.
@@ -168,5 +402,93 @@ class DuelModel:
         # after all moves have been made, run all data through training
         self.redEnv.internalNetwork.trainMultiple(pieceStates[0], pieceRewards[0])
         self.redEnv.gameNetwork.trainMultiple(gameStates[0], gameRewards[0])
-        self.blackEnv.internalNetwork.trainMultiple(pieceStates[1], pieceRewards[1])
-        self.blackEnv.gameNetwork.trainMultiple(gameStates[1], gameRewards[1])
+        if not self.sharedNetworks:
+            self.blackEnv.internalNetwork.trainMultiple(pieceStates[1], pieceRewards[1])
+            self.blackEnv.gameNetwork.trainMultiple(gameStates[1], gameRewards[1])
+
+
+def sideEntry(entries, netName):
+    """
+    Get the entry for a Network of a DuelModel, from a dictionary keyed by the names from DuelModel.networks.
+        A black Network uses the entry of the red Network of the same kind if it has none, as the entries of a DuelModel
+        with shared networks only use the names of the red networks
+    :param entries: The dictionary, i.e. the snapshots of a checkpoint
+    :param netName: The name of the Network
+    :return: The entry, or None if there is none
+    """
+    entry = entries.get(netName)
+    if entry is None and netName.startswith("black "):
+        entry = entries.get("red " + netName[len("black "):])
+    return entry
+
+
+def loadBackends(loadPath, name):
+    """
+    Load the weights of every Network of a saved DuelModel into Backends, for playing games without creating a
+        DuelModel or any Keras models. The Keras models saved by older versions are also loaded if there is no
+        checkpoint, which does need Keras
+    :param loadPath: the path, relative to saves, where the DuelModel is saved
+    :param name: The base name used to save the model
+    :return: A dictionary mapping the names from DuelModel.networks to Backends, in the same form as
+        checkpointBackends, or None if the DuelModel could not be loaded
+    """
+    backends = checkpointBackends(path.join(loadPath, name))
+    if backends is not None:
+        return backends
+
+    backends = {}
+    for side in ("red ", "black "):
+        for netName in (PIECE_NETWORK_NAME, GAME_NETWORK_NAME):
+            try:
+                net = keras.models.load_model(NETWORK_SAVES + "/" + loadPath + "/" + name + " " + side + netName)
+            except (ImportError, IOError, OSError, ValueError):
+                return None
+            backends[side + netName] = NumpyBackend()
+            backends[side + netName].load(net.get_weights())
+    return backends
+
+
+def backendEnvironment(game, backends, red, explorationRates=(0, 0), rng=None):
+    """
+    Create a PieceEnvironment which only plays, using BackendNetworks instead of Networks, so no Keras models are made
+    :param game: The Game to play in
+    :param backends: A dictionary mapping the names from DuelModel.networks to Backends, i.e. from loadBackends
+    :param red: True to use the Backends of the red networks, False for the black networks
+    :param explorationRates: A 2-tuple (game rate, piece rate) of the exploration rates of the networks,
+        default (0, 0)
+    :param rng: The random.Random used by both networks to choose actions, None to use the random module,
+        default None
+    :return: The PieceEnvironment
+    """
+    side = "red " if red else "black "
+    gameBackend = sideEntry(backends, side + GAME_NETWORK_NAME)
+    pieceBackend = sideEntry(backends, side + PIECE_NETWORK_NAME)
+    if gameBackend is None or pieceBackend is None:
+        raise ValueError("There are no " + side + "networks to play with")
+
+    env = PieceEnvironment(game, createNetworks=False)
+    env.gameNetwork = BackendNetwork(game.area(), env.gameEnv, gameBackend, explorationRates[0], rng)
+    env.internalNetwork = BackendNetwork(Q_PIECE_NUM_ACTIONS, env, pieceBackend, explorationRates[1], rng)
+    return env
+
+
+def randomPositions(size, count, seed=0):
+    """
+    Find positions from games where every move is picked randomly
+    :param size: The size of the board
+    :param count: The number of positions to find
+    :param seed: The seed used to pick moves, default 0
+    :return: A list of count Games, none of which are over
+    """
+    rand = random.Random(seed)
+    games = []
+    game = Game(size)
+    while len(games) < count:
+        moves = game.allMoves() if game.win == E_PLAYING else []
+        if len(moves) == 0:
+            game.resetGame()
+            continue
+        games.append(game.makeCopy())
+        pos, modifiers = rand.choice(moves)
+        game.play(pos, modifiers)
+    return games
@@ -1,7 +1,5 @@
 from Checkers.ConvModel import *
 from Checkers.Game import *
-if USE_TENSOR_FLOW:
-    from tensorflow.keras.models import load_model
 
 import os.path as path
 import os
@@ -18,11 +16,11 @@ Q_PIECE_NUM_ACTIONS = 8
 class PieceEnvironment(Environment):
     """
     An Environment used to determine where a piece should move to.
-    This Environment is incompatible with a QTable.
+    This Environment is incompatible with a QTable, but can be used with a HashTable on small boards.
     This environment considers the move they take, and the next opponent move when determining rewards
     """
 
-    def __init__(self, game, current=None, gameInner=None, pieceInner=None, enemyEnv=None):
+    def __init__(self, game, current=None, gameInner=None, pieceInner=None, enemyEnv=None, createNetworks=True):
         """
         Create a new Environment for determining which move a given piece should move
         :param game: The Checkers Game that the piece will exist
@@ -36,11 +34,17 @@ class PieceEnvironment(Environment):
             None to have no inner layers, default None.  Should only be positive integers
         :param enemyEnv: The environment used to make enemy moves. Use None to make the same network used
             for ally and enemy moves. Default None
+        :param createNetworks: True to create the Networks, False to leave gameNetwork and internalNetwork as None,
+            so they can be set to models which only play, like BackendNetwork, without creating Keras models.
+            Default True
         """
 
         self.game = game
         self.gameEnv = GameEnvironment(self.game, self)
-        if Q_USE_CONVOLUTIONAL_LAYERS:
+        if not createNetworks:
+            self.gameNetwork = None
+            self.internalNetwork = None
+        elif Q_USE_CONVOLUTIONAL_LAYERS:
             self.gameNetwork = ConvNetwork(self.game.area(), self.gameEnv, self.game, Q_GAME_NUM_GRIDS,
                                            inner=[] if gameInner is None else gameInner)
 
@@ -57,6 +61,9 @@ class PieceEnvironment(Environment):
 
         self.current = current
 
+        # a Tablebase used to find the exact result of a game, or None to not use one
+        self.tablebase = None
+
     def networkInputs(self):
         return self.game.area() * Q_PIECE_NUM_GRIDS
 
@@ -69,6 +76,15 @@ class PieceEnvironment(Environment):
     def currentState(self):
         return self.game
 
+    def currentKey(self):
+        # combine the key of the game with the position of the piece being moved, or area for no piece
+        area = self.game.area()
+        current = area if self.current is None else self.game.toSinglePos(self.current[0], self.current[1])
+        return self.game.toKey() * (area + 1) + current
+
+    def turnKey(self):
+        return self.game.redTurn
+
     def numStates(self):
         return self.networkInputs()
 
@@ -102,6 +118,13 @@ class PieceEnvironment(Environment):
                 totalReward += r
             a = None
 
+        # if the result of the game is already known from the tablebase, the enemy moves do not need to be found,
+        #   only add the reward for how the game will end
+        if self.tablebase is not None:
+            r = self.tablebase.reward(newState, redTurn)
+            if r is not None:
+                return totalReward + r
+
         # select the correct environment, depending on if an enemy environment exists
         env = self.getEnemyEnv()
 
@@ -113,6 +136,15 @@ class PieceEnvironment(Environment):
             else:
                 totalReward += r
 
+        # if the result of the game is known from the tablebase, add the reward for how the game will end,
+        #   this is still needed after the first lookup, because a Tablebase built from a starting position only
+        #   has the positions reachable from it, so the position after the enemy moves can be in the Tablebase,
+        #   even when the position before them is not
+        if self.tablebase is not None:
+            r = self.tablebase.reward(newState, redTurn)
+            if r is not None:
+                totalReward += r
+
         return totalReward
 
     def oneActionReward(self, state, action, redTurn):
@@ -311,6 +343,7 @@ class PieceEnvironment(Environment):
                 else:
                     blackTotal += reward
                     blackMoves += 1
+        self.endEpisode()
 
         return redTotal, blackTotal, redMoves, blackMoves
 
@@ -340,6 +373,13 @@ class PieceEnvironment(Environment):
 
             return reward
 
+    def endEpisode(self):
+        """
+        Train both networks on the moves of the game which have not been trained on yet, see Network.endEpisode
+        """
+        self.gameNetwork.endEpisode()
+        self.internalNetwork.endEpisode()
+
     def decayNetworks(self):
         """
         Apply the decay to both networks
@@ -372,10 +412,12 @@ class PieceEnvironment(Environment):
         :return True if the files were loaded, False otherwise
         """
         try:
-            self.internalNetwork.net = load_model(NETWORK_SAVES + "/" + pieceName)
-            self.gameNetwork.net = load_model(NETWORK_SAVES + "/" + networkName)
+            self.internalNetwork.net = keras.models.load_model(NETWORK_SAVES + "/" + pieceName)
+            self.gameNetwork.net = keras.models.load_model(NETWORK_SAVES + "/" + networkName)
+            self.internalNetwork.backend.invalidate()
+            self.gameNetwork.backend.invalidate()
             return True
-        except (ImportError, IOError, OSError):
+        except (ImportError, IOError, OSError, ValueError):
             return False
 
 
@@ -477,6 +519,12 @@ class GameEnvironment(Environment):
     def currentState(self):
         return self.game
 
+    def currentKey(self):
+        return self.game.toKey()
+
+    def turnKey(self):
+        return self.game.redTurn
+
     def numStates(self):
         return self.networkInputs()
 
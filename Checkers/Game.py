@@ -186,6 +186,28 @@ class Game:
 
         return vals
 
+    def toKey(self, red=None):
+        """
+        Convert the position of this Game to a single integer, uniquely identifying the pieces on the board,
+            and whose turn it is, from the perspective of one side.
+        Each square is stored as one base 5 digit, in the same order as toList, and the lowest bit stores if it is
+            the turn of the side the key is from.
+        :param red: True to get the key from red's perspective, False for black's perspective,
+            None to use the perspective of the current player, default None
+        :return: The key
+        """
+        if red is None:
+            red = self.redTurn
+        grid = self.redGrid if red else self.blackGrid
+
+        key = 0
+        for r in reversed(grid):
+            for c in reversed(r):
+                # empty is 0, ally is 1, ally king is 2, enemy is 3, enemy king is 4
+                key = key * 5 + (0 if c is None else 1 + 2 * (not c[0]) + c[1])
+
+        return key * 2 + (self.redTurn == red)
+
     def singlePos(self, s):
         """
         Convert position in a 1D array to a position in the grid
@@ -538,6 +560,21 @@ class Game:
                 playMoves.append(None)
         return playMoves
 
+    def allMoves(self):
+        """
+        Find every move which can be played by the current player
+        :return: A list of 2-tuples (pos, modifiers), each is a move that can be given to play,
+            from the perspective of the current player
+        """
+        moves = []
+        for s in (self.redMoves if self.redTurn else self.blackMoves):
+            pos = self.singlePos(s)
+            for i in range(8):
+                bins = moveIntToBoolList(i)
+                if self.canPlay(pos, bins, self.redTurn):
+                    moves.append((pos, bins))
+        return moves
+
     def canMovePos(self, pos, red):
         """
         Determine if a piece at a given grid position has any moves for the current player
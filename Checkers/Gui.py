@@ -1,15 +1,19 @@
 from Checkers.Game import *
+from Checkers.Search import Ponderer
 from Constants import *
 
-if USE_PY_GAME:
-    import pygame
-
-import time
+import queue
+import threading
 
 # technical constants
-ENABLE_LOOP_WAIT = False
-TICK_RATE = 60
-TICK_TIME = 1.0 / TICK_RATE
+# the number of times per second that tick is called
+TICK_RATE = 10
+# custom pygame events, for timers, and for the worker thread finishing a move, as offsets from pygame.USEREVENT,
+#   so that pygame is not imported until a Gui is made
+EV_TICK = 1
+EV_PRINT_FPS = 2
+EV_SAVE_NOTE = 3
+EV_MOVE_DONE = 4
 
 E_RED_PLAYING = "Red's Turn"
 E_BLACK_PLAYING = "Black's Turn"
@@ -61,11 +65,16 @@ C_MOVE_HIGHLIGHT = (0, 200, 0, 127)
 C_CAPTURE_HIGHLIGHT = (200, 0, 0, 127)
 
 # variables for tracking animations
-T_SAVE_TIME = 120
+# the number of milliseconds the save notification is shown
+T_SAVE_TIME = 2000
 T_SAVE_TEXT = {True: "Save Successful", False: "Save Failed", None: ""}
 T_SAVE_TEXT_COLOR = {True: (0, 0, 100), False: (100, 0, 0), None: (0, 0, 0)}
 T_SAVE_X = 140
 T_SAVE_Y = 60
+T_THINKING_TEXT = "Thinking..."
+T_THINKING_COLOR = (0, 0, 100)
+T_THINKING_X = 140
+T_THINKING_Y = 78
 
 
 class Gui:
@@ -73,7 +82,7 @@ class Gui:
     A class that handles displaying and taking input for playing a Checkers Game in a GUI with pygame
     """
 
-    def __init__(self, qObject, fps=20, printFPS=False, defaultGame=None, playerTrainer=None):
+    def __init__(self, qObject, fps=20, printFPS=False, defaultGame=None, playerTrainer=None, ponder=True):
         """
         Create and display the pygame Gui with the given game.
         Must call loop() to make the Gui stay open
@@ -86,6 +95,8 @@ class Gui:
         :param playerTrainer: A PlayerTrainer object which will be used
             for training the network by a user playing the game. None to not use this feature.
             Default None.
+        :param ponder: True to search for replies on a background thread while the user is picking a move,
+            for any side which uses a Player to make moves, False otherwise. Default True
         """
         # initialize objects
         self.qDuelModel = qObject
@@ -98,9 +109,9 @@ class Gui:
             pygame.K_r: lambda: self.resetGame(),
             pygame.K_e: lambda: self.resetGame(self.defaultGame),
             pygame.K_ESCAPE: lambda: self.stop(),
-            pygame.K_a: lambda: self.unselectSquare() if self.makeQModelMove() else None,
-            pygame.K_t: lambda: self.unselectSquare() if self.makeQModelMove(train=True) else None,
-            pygame.K_q: lambda: self.unselectSquare() if self.makeQModelMove(explore=0) else None,
+            pygame.K_a: lambda: self.startQModelMove(),
+            pygame.K_t: lambda: self.startQModelMove(train=True),
+            pygame.K_q: lambda: self.startQModelMove(explore=0),
             pygame.K_s: lambda: self.saveGame(),
             None: lambda: None
         }
@@ -121,14 +132,36 @@ class Gui:
         self.running = True
         self.fps = fps
         self.printFPS = printFPS
+        self.clock = pygame.time.Clock()
+        self.frames = 0
 
         # variables for tracking save notification
-        self.saveNoteTimer = 0
+        self.saveNoteShown = False
         self.saveSuccess = None
 
         # variables for drawing text
         self.font = makeFont(DR_FONT_FACE, DR_FONT_SIZE)
         self.font.set_bold(True)
+        self.smallFont = makeFont(DR_FONT_FACE, I_FONT_SIZE)
+        self.smallFont.set_bold(True)
+
+        # surfaces drawn once and reused every frame, text is drawn the first time it is used
+        self.textSurfaces = {}
+        self.highlightSurfaces = {}
+        self.boardSurface = self.renderBoard()
+        self.pieceSurfaces = {}
+        for red in (True, False):
+            for king in (True, False):
+                self.pieceSurfaces[(red, king)] = self.renderPiece(red, king)
+
+        # variables for tracking what has been drawn to the window
+        #   the piece and highlights drawn on each square, and the text drawn at the top
+        self.drawnSquares = {}
+        self.drawnText = None
+        # the area of the window where the text at the top is drawn
+        self.textRect = pygame.Rect(0, 0, self.pixelWidth, DR_BORDER_SIZE + DR_TOP_SPACE)
+        # True if the entire window must be drawn on the next frame
+        self.fullRedraw = True
 
         # variables for tracking mouse input
         self.hoverSquare = None
@@ -142,6 +175,21 @@ class Gui:
         #   each element is None, or a 2-tuple of the grid coordinates where a piece can be captured
         self.captureMoves = None
 
+        # variables for searching while the user is thinking, with a Ponderer for each side that has a Player
+        self.ponderers = {}
+        if ponder:
+            for red, player in ((True, qObject.redPlayer), (False, qObject.blackPlayer)):
+                if player is not None:
+                    self.ponderers[red] = Ponderer(player)
+        # the key of the position being pondered, None if nothing is being pondered
+        self.ponderKey = None
+
+        # variables for making AI moves on a worker thread, the results of moves are sent through the queue
+        self.moveResults = queue.Queue()
+        self.thinking = False
+        # a copy of the game from before the AI started thinking, drawn while the worker changes the game
+        self.thinkingGame = None
+
     def stopLoop(self):
         """
         Stop running the game and close the window
@@ -150,62 +198,67 @@ class Gui:
 
     def loop(self):
         """
-        A method that handles updating the state of the game
+        A method that handles updating the state of the game.
+        The loop sleeps until an event happens, then handles every waiting event, and redraws the game,
+            at most fps times per second
         """
-        lastTime = time.time()
-        lastFrame = time.time()
-        lastTick = time.time()
-        frames = 0
+        pygame.time.set_timer(pygame.USEREVENT + EV_TICK, 1000 // TICK_RATE)
+        if self.printFPS:
+            pygame.time.set_timer(pygame.USEREVENT + EV_PRINT_FPS, 1000)
+
+        self.redrawPygame()
         while self.running:
-            frameTime = 1 / self.fps
+            self.handleEvent(pygame.event.wait())
             self.handleEvents()
 
-            currTime = time.time()
-
-            # determine if the game should be redrawn
-            if currTime - lastFrame > frameTime:
-                frames += 1
-                lastFrame = time.time()
-                self.redrawPygame()
-            elif ENABLE_LOOP_WAIT:
-                # wait a bit of time to prevent the loop from running unnecessarily long amounts of time
-                time.sleep(0.01)
-
-            # determine if the game should be ticked again
-            currTime = time.time()
-            if currTime - lastTick > TICK_TIME:
-                frames += 1
-                lastTick = time.time()
-                self.tick()
-
-            currTime = time.time()
-            if currTime - lastTime > 1:
-                if self.printFPS:
-                    print("FPS: " + str(frames))
-                frames = 0
-                lastTime = currTime
+            self.frames += 1
+            self.redrawPygame()
+            self.clock.tick(self.fps)
+
+        pygame.time.set_timer(pygame.USEREVENT + EV_TICK, 0)
+        pygame.time.set_timer(pygame.USEREVENT + EV_PRINT_FPS, 0)
+        self.stopPondering()
 
     def handleEvents(self):
         """
-        A method that handles events that happen each loop of the pygame window
+        Handle every event waiting in the pygame event queue
         """
         for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                self.running = False
-            elif e.type == pygame.MOUSEMOTION:
-                self.handleMouseMove()
-            elif e.type == pygame.MOUSEBUTTONDOWN:
-                self.handleMouseUp()
-            elif e.type == pygame.KEYUP:
-                self.handleKeyUp(e)
+            self.handleEvent(e)
+
+    def handleEvent(self, e):
+        """
+        Handle one event from the pygame window
+        :param e: The pygame event
+        """
+        if e.type == pygame.QUIT:
+            self.running = False
+        elif e.type == pygame.MOUSEMOTION:
+            self.handleMouseMove()
+        elif e.type == pygame.MOUSEBUTTONDOWN:
+            self.handleMouseUp()
+        elif e.type == pygame.KEYUP:
+            self.handleKeyUp(e)
+        elif e.type == pygame.VIDEOEXPOSE:
+            self.fullRedraw = True
+        elif e.type == pygame.USEREVENT + EV_TICK:
+            self.tick()
+        elif e.type == pygame.USEREVENT + EV_MOVE_DONE:
+            self.checkMoveResults()
+            self.updatePondering()
+        elif e.type == pygame.USEREVENT + EV_SAVE_NOTE:
+            self.saveNoteShown = False
+        elif e.type == pygame.USEREVENT + EV_PRINT_FPS:
+            print("FPS: " + str(self.frames))
+            self.frames = 0
 
     def handleMouseMove(self):
         """
         This method is run every time pygame detects a mouse movement
         """
 
-        # only select a square to hover over while the game is not over
-        if self.game.win == E_PLAYING:
+        # only select a square to hover over while the game is not over, and the AI is not thinking
+        if self.game.win == E_PLAYING and not self.thinking:
             mPos = pygame.mouse.get_pos()
             gPos = self.mouseToGrid(mPos[0], mPos[1])
             # only set the hover piece if the square under the mouse is a playable square
@@ -221,6 +274,10 @@ class Gui:
         """
         This method is run every time pygame detects a mouse button up
         """
+        # the game can't be changed while the AI is thinking
+        if self.thinking:
+            return
+
         # if there is not a selected square, then select the hovered square
         if self.selectedSquare is None:
             self.selectSquare()
@@ -295,6 +352,9 @@ class Gui:
         :param event: The pygame event object from the keypress
         """
         k = event.key
+        # only allow closing the game while the AI is thinking
+        if self.thinking and not k == pygame.K_ESCAPE:
+            return
         if k in self.keyDict:
             self.keyDict[k]()
 
@@ -302,19 +362,70 @@ class Gui:
         """
         Save the current state of the game to the default file
         """
-        self.saveNoteTimer = T_SAVE_TIME
         self.saveSuccess = self.qDuelModel.save("", DUEL_MODEL_NAME)
+        self.saveNoteShown = True
+        pygame.time.set_timer(pygame.USEREVENT + EV_SAVE_NOTE, T_SAVE_TIME, 1)
 
     def resetGame(self, defaultGame=None):
         """
         Bring the game in the GUI to a default state.
         :param defaultGame: A Checkers Game with the pieces in the desired starting state.
         """
+        self.stopPondering()
         self.game.resetGame(defaultGame)
         self.unselectSquare()
+        for player in (self.qDuelModel.redPlayer, self.qDuelModel.blackPlayer):
+            if player is not None:
+                player.reset()
         if self.playerTrainer is not None:
             self.playerTrainer.reset()
 
+    def startQModelMove(self, train=False, explore=None):
+        """
+        Start making the next move in the game with the current QModel on a worker thread, so that the Gui keeps
+            drawing while the move is found. Does nothing if a move is already being made.
+        The result is handled by checkMoveResults
+        :param train: True to also train the network with this move, False otherwise, default False
+        :param explore: The exploration rate to use for this move, None to not make any changes, default None
+        """
+        if self.thinking:
+            return
+
+        # a background search may use the same networks, which can't be used by two threads at once
+        self.stopPondering()
+
+        self.thinking = True
+        self.thinkingGame = self.game.makeCopy()
+        threading.Thread(target=self.qModelMoveWorker, args=(train, explore), daemon=True).start()
+
+    def qModelMoveWorker(self, train, explore):
+        """
+        Helper method for startQModelMove, run on the worker thread. Make the move, and send the result to the queue
+        :param train: True to also train the network with this move, False otherwise
+        :param explore: The exploration rate to use for this move, None to not make any changes
+        """
+        result = False
+        try:
+            result = self.makeQModelMove(train, explore)
+        finally:
+            self.moveResults.put(result)
+            # wake up the loop to handle the result
+            pygame.event.post(pygame.event.Event(pygame.USEREVENT + EV_MOVE_DONE))
+
+    def checkMoveResults(self):
+        """
+        Handle the result of a move made on the worker thread, if one has finished
+        """
+        try:
+            result = self.moveResults.get_nowait()
+        except queue.Empty:
+            return
+
+        self.thinking = False
+        self.thinkingGame = None
+        if result:
+            self.unselectSquare()
+
     def makeQModelMove(self, train=False, explore=None):
         """
         Make the next move in the game with the current QModel. Does nothing if that QModel is None
@@ -327,6 +438,20 @@ class Gui:
         if not self.game.win == E_PLAYING:
             return
 
+        # stop searching in the background before the networks or a player are used for this move
+        self.stopPondering()
+
+        # if a player makes the moves for this side, it picks the move, and does not train
+        player = self.qDuelModel.currentPlayer()
+        if player is not None:
+            # use the reply found while pondering if the user made one of the predicted moves
+            ponderer = self.ponderers.get(self.game.redTurn)
+            move = None if ponderer is None else ponderer.reply(self.game)
+            if move is None:
+                return player.makeMove()
+            self.game.play(move[0], move[1])
+            return True
+
         # get the appropriate environment
         qEnv = self.qDuelModel.currentEnvironment()
 
@@ -418,35 +543,109 @@ class Gui:
 
     def tick(self):
         """
-        Update variables tracking animations
+        Update anything which depends on the state of the game changing, run TICK_RATE times per second
         """
-        if self.saveNoteTimer > 0:
-            self.saveNoteTimer -= 1
+        self.checkMoveResults()
+        self.updatePondering()
 
-    def redrawPygame(self):
+    def updatePondering(self):
         """
-        Draw the current state of the Checkers Game to the pygame window
+        Start pondering if the position changed, and it is the turn of a side without a Player,
+            whose opponent has a Ponderer
         """
+        if len(self.ponderers) == 0 or self.thinking:
+            return
 
-        # background fill
-        self.gui.fill(C_BACKGROUND)
+        key = self.game.toKey(True)
+        if key == self.ponderKey:
+            return
 
-        # draw game board border
-        pygame.draw.rect(self.gui, C_GAME_BORDER, (
-            DR_GRID_X - DR_GAME_BORDER_SIZE,
-            DR_GRID_Y - DR_GAME_BORDER_SIZE,
-            self.gridWidth + DR_GAME_BORDER_SIZE * 2, self.gridHeight + DR_GAME_BORDER_SIZE * 2
-        ))
+        self.stopPondering()
+        ponderer = self.ponderers.get(not self.game.redTurn)
+        if self.game.win == E_PLAYING and self.qDuelModel.currentPlayer() is None and ponderer is not None:
+            ponderer.start(self.game)
+        self.ponderKey = key
 
-        # draw the grid squares
-        grid = self.game.redGrid
-        for j, r in enumerate(grid):
-            # iterate through each column
-            for i, c in enumerate(r):
-                self.drawSquare(j, i, c, True)
-                self.drawSquare(j, i, None, False)
-
-        # draw the moves that can be taken by the selected piece
+    def stopPondering(self):
+        """
+        Stop every background search from pondering
+        """
+        for ponderer in self.ponderers.values():
+            ponderer.stop()
+        self.ponderKey = None
+
+    def redrawPygame(self):
+        """
+        Draw the current state of the Checkers Game to the pygame window.
+        Only the squares and text which changed since the last frame are drawn, and only those parts of the window
+            are updated, unless fullRedraw is True
+        """
+        # while the AI is thinking, the game may be changing, so draw the game from before it started
+        game = self.game if self.thinkingGame is None else self.thinkingGame
+
+        # start from the cached board, and forget everything drawn on the window
+        if self.fullRedraw:
+            self.gui.blit(self.boardSurface, (0, 0))
+            self.drawnSquares = {}
+            self.drawnText = None
+
+        rects = []
+
+        # draw each square which has a different piece or highlights from what was last drawn
+        highlights = self.squareHighlights(game)
+        for r, row in enumerate(game.redGrid):
+            for c, piece in enumerate(row):
+                state = (piece, highlights.get((c, r), ()))
+                if not self.drawnSquares.get((c, r)) == state:
+                    self.drawnSquares[(c, r)] = state
+                    rects.append(self.drawSquare(c, r, piece, state[1]))
+
+        # find the text at the top
+        if game.win == E_PLAYING:
+            text = E_RED_PLAYING if game.redTurn else E_BLACK_PLAYING
+        else:
+            text = E_TEXT[game.win]
+        saveNote = self.saveSuccess if self.saveNoteShown else None
+
+        # draw the text at the top, only if it changed
+        textState = (text, saveNote, self.thinking)
+        if not self.drawnText == textState:
+            self.drawnText = textState
+            self.gui.blit(self.boardSurface, self.textRect, self.textRect)
+            self.drawText(E_GAME_STATE_X, E_GAME_STATE_Y, text, E_TEXT_COLOR)
+
+            # draw save notification
+            if saveNote is not None:
+                self.drawText(T_SAVE_X, T_SAVE_Y, T_SAVE_TEXT[saveNote], T_SAVE_TEXT_COLOR[saveNote], self.smallFont)
+
+            # draw a note while the AI is thinking
+            if self.thinking:
+                self.drawText(T_THINKING_X, T_THINKING_Y, T_THINKING_TEXT, T_THINKING_COLOR, self.smallFont)
+            rects.append(self.textRect)
+
+        # update display
+        if self.fullRedraw:
+            pygame.display.update()
+            self.fullRedraw = False
+        elif len(rects) > 0:
+            pygame.display.update(rects)
+
+    def squareHighlights(self, game):
+        """
+        Find the highlights to draw over each square that holds pieces
+        :param game: The Game being drawn
+        :return: A dictionary mapping the grid coordinates (c, r) of squares, to a tuple of the colors of the
+            highlights on that square, in the order they are drawn. Squares without highlights are not included
+        """
+        highlights = {}
+
+        # the highlight for the selected or hovered piece
+        if self.selectedSquare is not None:
+            highlights[self.selectedSquare] = (C_SELECTED_HIGHLIGHT,)
+        if self.hoverSquare is not None and not self.hoverSquare == self.selectedSquare:
+            highlights[self.hoverSquare] = (C_HOVER_HIGHLIGHT,)
+
+        # the moves that can be taken by the selected piece
         moves = []
         if self.playMoves is not None:
             moves.extend(self.playMoves)
@@ -455,81 +654,113 @@ class Gui:
 
         for p in moves:
             if p is not None:
-                gridSquare = self.game.gridPos(p[0], p[1], True)
+                gridSquare = game.gridPos(p[0], p[1], True)
                 color = C_MOVE_HIGHLIGHT if gridSquare is None else C_CAPTURE_HIGHLIGHT
-                square = gridToBounds(p[0], p[1])
-                self.drawSquareHighlight(square, color)
+                highlights[p] = highlights.get(p, ()) + (color,)
 
-        # draw text at top
-        if self.game.win == E_PLAYING:
-            text = E_RED_PLAYING if self.game.redTurn else E_BLACK_PLAYING
-        else:
-            text = E_TEXT[self.game.win]
-        self.drawText(E_GAME_STATE_X, E_GAME_STATE_Y, text, E_TEXT_COLOR)
+        return highlights
+
+    def drawSquare(self, c, r, piece, highlights):
+        """
+        Draw a square of the game which holds pieces, from the cached surfaces
+        :param c: The column of the square in the stored game grid
+        :param r: The row of the square in the stored game grid
+        :param piece: The piece on the square
+        :param highlights: A tuple of the colors of the highlights to draw over the square
+        :return: A pygame Rect of the area drawn
+        """
+        square = pygame.Rect(gridToBounds(c, r))
+
+        # draw the empty square, then the piece, then each highlight
+        self.gui.blit(self.boardSurface, square, square)
+        if piece is not None:
+            self.gui.blit(self.pieceSurfaces[(piece[0], piece[1])], square)
+        for color in highlights:
+            self.drawSquareHighlight(square, color)
+
+        return square
+
+    def renderBoard(self):
+        """
+        Draw everything that never changes, meaning the background, the empty squares, and the instructions,
+            to a surface, which is drawn to the window instead of redrawing each part
+        :return: The pygame Surface
+        """
+        board = pygame.Surface((self.pixelWidth, self.pixelHeight))
+
+        # background fill
+        board.fill(C_BACKGROUND)
+
+        # draw game board border
+        pygame.draw.rect(board, C_GAME_BORDER, (
+            DR_GRID_X - DR_GAME_BORDER_SIZE,
+            DR_GRID_Y - DR_GAME_BORDER_SIZE,
+            self.gridWidth + DR_GAME_BORDER_SIZE * 2, self.gridHeight + DR_GAME_BORDER_SIZE * 2
+        ))
+
+        # draw the grid squares
+        for j in range(self.game.height):
+            for i in range(self.game.width):
+                x, y = gridToBounds(i, j)[:2]
+                pygame.draw.rect(board, C_ON_SQUARE, (x, y, DR_SQUARE_SIZE, DR_SQUARE_SIZE))
+
+                # the square that doesn't hold pieces is on the other half of the pair of squares
+                x, y = gridToMouse(i, j)
+                if j % 2 == 1:
+                    x += DR_SQUARE_SIZE
+                pygame.draw.rect(board, C_OFF_SQUARE, (x, y, DR_SQUARE_SIZE, DR_SQUARE_SIZE))
 
         # draw extra instruction text
-        smallFont = makeFont(DR_FONT_FACE, I_FONT_SIZE)
-        smallFont.set_bold(True)
         for i, text in enumerate(I_TEXT):
-            self.drawText(I_UP_LEFT_X, I_UP_LEFT_Y + i * I_LINE_SPACING, text, I_TEXT_COLOR, smallFont)
-
-        # draw save notification
-        if self.saveNoteTimer > 0:
-            self.drawText(T_SAVE_X, T_SAVE_Y, T_SAVE_TEXT[self.saveSuccess],
-                          T_SAVE_TEXT_COLOR[self.saveSuccess], smallFont)
+            board.blit(self.renderText(text, I_TEXT_COLOR, self.smallFont),
+                       (I_UP_LEFT_X, I_UP_LEFT_Y + i * I_LINE_SPACING))
 
-        # update display
-        pygame.display.update()
+        return board
 
-    def drawSquare(self, r, c, piece, holds):
+    def renderPiece(self, red, king):
         """
-        Draw a square of the game
-        :param r: The row of the square in the stored game grid
-        :param c: The column of the square in the stored game grid
-        :param piece: The piece on the square
-        :param holds: True if this square is one that holds pieces, False otherwise
+        Draw a piece to a transparent surface, the size of one square
+        :param red: True for a red piece, False for a black piece
+        :param king: True if the piece is a king, False otherwise
+        :return: The pygame Surface
         """
-        # get square coordinates
-        x, y = gridToMouse(c, r)
+        piece = pygame.Surface((DR_SQUARE_SIZE, DR_SQUARE_SIZE), pygame.SRCALPHA)
+        pColor = C_RED_PIECE if red else C_BLACK_PIECE
+        kColor = C_RED_KING if red else C_BLACK_KING
 
-        # offset if appropriate
-        if not (r % 2 == 0 ^ holds):
-            x += DR_SQUARE_SIZE
+        # outline
+        circleOffset = (DR_SQUARE_SIZE - DR_PIECE_SIZE) * .5 - DR_PIECE_BORDER
+        pygame.draw.ellipse(piece, C_PIECE_BORDER, (
+            circleOffset, circleOffset,
+            DR_PIECE_SIZE + DR_PIECE_BORDER * 2, DR_PIECE_SIZE + DR_PIECE_BORDER * 2
+        ))
 
-        # draw the square
-        square = (x, y, DR_SQUARE_SIZE, DR_SQUARE_SIZE)
-        pygame.draw.rect(self.gui, C_ON_SQUARE if holds else C_OFF_SQUARE, square)
+        # fill
+        circleOffset = (DR_SQUARE_SIZE - DR_PIECE_SIZE) * .5
+        pygame.draw.ellipse(piece, pColor, (circleOffset, circleOffset, DR_PIECE_SIZE, DR_PIECE_SIZE))
 
-        # draw the piece, if one exists
-        if piece is not None:
-            pColor = C_RED_PIECE if piece[0] else C_BLACK_PIECE
-            kColor = C_RED_KING if piece[0] else C_BLACK_KING
-
-            # draw the piece
-            # outline
-            circleOffset = (DR_SQUARE_SIZE - DR_PIECE_SIZE) * .5 - DR_PIECE_BORDER
-            pygame.draw.ellipse(self.gui, C_PIECE_BORDER, (
-                square[0] + circleOffset, square[1] + circleOffset,
-                DR_PIECE_SIZE + DR_PIECE_BORDER * 2, DR_PIECE_SIZE + DR_PIECE_BORDER * 2
-            ))
-
-            # fill
-            circleOffset = (DR_SQUARE_SIZE - DR_PIECE_SIZE) * .5
-            pygame.draw.ellipse(self.gui, pColor, (
-                square[0] + circleOffset, square[1] + circleOffset,
-                DR_PIECE_SIZE, DR_PIECE_SIZE
-            ))
-
-            # if it is a king, draw a K on the circle
-            if piece[1]:
-                self.drawText(square[0] + DR_PIECE_SIZE * .3, square[1] + DR_FONT_SIZE * .25, "K", kColor)
-
-        # if a piece is selected, then draw an appropriate highlight over it
-        if holds:
-            if self.selectedSquare is not None and self.selectedSquare == (c, r):
-                self.drawSquareHighlight(square, C_SELECTED_HIGHLIGHT)
-            elif self.hoverSquare is not None and self.hoverSquare == (c, r):
-                self.drawSquareHighlight(square, C_HOVER_HIGHLIGHT)
+        # if it is a king, draw a K on the circle
+        if king:
+            piece.blit(self.renderText("K", kColor), (DR_PIECE_SIZE * .3, DR_FONT_SIZE * .25))
+
+        return piece
+
+    def renderText(self, text, color, textFont=None):
+        """
+        Get a surface with some text drawn on it, only drawing the text the first time it is used
+        :param text: The text to draw
+        :param color: The color of the text
+        :param textFont: Font to use, or None to use default
+        :return: The pygame Surface
+        """
+        if textFont is None:
+            textFont = self.font
+        key = (text, color, id(textFont))
+        value = self.textSurfaces.get(key)
+        if value is None:
+            value = textFont.render(text, False, color)
+            self.textSurfaces[key] = value
+        return value
 
     def drawText(self, x, y, text, color, textFont=None):
         """
@@ -540,10 +771,7 @@ class Gui:
         :param color: The color of the text
         :param textFont: Font to use, or None to use default
         """
-        if textFont is None:
-            textFont = self.font
-        value = textFont.render(text, False, color)
-        self.gui.blit(value, (x, y))
+        self.gui.blit(self.renderText(text, color, textFont), (x, y))
 
     def drawSquareHighlight(self, square, color):
         """
@@ -551,8 +779,11 @@ class Gui:
         :param square: The bounds of the square to draw
         :param color: The color of the highlight, including alpha channel
         """
-        highlight = pygame.Surface((square[2], square[3]), pygame.SRCALPHA)
-        pygame.draw.rect(highlight, color, highlight.get_rect())
+        highlight = self.highlightSurfaces.get(color)
+        if highlight is None:
+            highlight = pygame.Surface((square[2], square[3]), pygame.SRCALPHA)
+            pygame.draw.rect(highlight, color, highlight.get_rect())
+            self.highlightSurfaces[color] = highlight
         self.gui.blit(highlight, square)
 
     def mouseToGrid(self, x, y):
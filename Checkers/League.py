@@ -0,0 +1,293 @@
+from Checkers.DuelModel import *
+
+import numpy as np
+
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+# constants for league training
+# the largest number of frozen past versions kept in the pool of opponents
+LEAGUE_POOL_SIZE = 10
+# the number of training games between each time the learning DuelModel is frozen and added to the pool
+LEAGUE_SNAPSHOT_GAMES = 100
+# the number of draws every opponent starts with, so that an opponent which has not played yet has a win rate of 0.5
+LEAGUE_PRIOR_GAMES = 2
+# how strongly opponents which beat the learning DuelModel are preferred, 0 to sample every opponent equally
+LEAGUE_PRIORITY_POWER = 2
+# the smallest weight of an opponent when sampling, so opponents which are always beaten are still played sometimes
+LEAGUE_MIN_WEIGHT = 0.05
+# the exploration rate used by frozen opponents
+LEAGUE_OPPONENT_EXPLORATION = 0.05
+# the number of games given to a worker process at once
+LEAGUE_CHUNK_SIZE = 4
+
+# the backends loaded in a worker process, mapping a 2-tuple (checkpoint name, version) to a dictionary
+#   mapping the names of the networks of a DuelModel to Backends
+leagueBackends = {}
+
+
+class League:
+    """
+    An object for training a DuelModel against a pool of frozen past versions of itself, instead of only against
+        its live self. Opponents are sampled by how often they beat the learning DuelModel, so most games are played
+        against the opponents it still has the most to learn from.
+    The games are played in worker processes, where every network, including the learning side, only plays with
+        a Backend read from a checkpoint, in a PieceEnvironment from backendEnvironment, so no Keras models are made.
+        Each game is sent back as the list of moves made, and the moves of the learning side are then replayed
+        through its PieceEnvironment to train it, so only training uses Keras
+    """
+
+    def __init__(self, model, savePath, name, poolSize=LEAGUE_POOL_SIZE, snapshotGames=LEAGUE_SNAPSHOT_GAMES,
+                 workers=None, seed=0):
+        """
+        Create a League. The frozen opponents already saved with the same path and name are added to the pool,
+            or if there are none, the DuelModel is frozen as the first opponent
+        :param model: The DuelModel to train
+        :param savePath: The path, relative to saves, to save the frozen opponents
+        :param name: The base name to use for the frozen opponents
+        :param poolSize: The largest number of frozen opponents kept, default LEAGUE_POOL_SIZE
+        :param snapshotGames: The number of training games between each time the DuelModel is frozen,
+            default LEAGUE_SNAPSHOT_GAMES
+        :param workers: The number of processes to play games in, None to use one for each CPU,
+            or 0 to play every game in this process, default None
+        :param seed: The seed of the first game, each game after uses the next seed, default 0
+        """
+        self.model = model
+        self.poolName = path.join(savePath, name + " pool")
+        self.learnerName = path.join(savePath, name + " learner")
+        self.poolSize = poolSize
+        self.snapshotGames = snapshotGames
+        self.workers = workers
+        self.seed = seed
+
+        # the number of times the learning DuelModel has been written for the worker processes
+        self.learnerVersion = 0
+        # the number of training games played, and the number when the DuelModel was last frozen
+        self.gamesPlayed = 0
+        self.lastSnapshot = 0
+        self.executor = None
+
+        # a list of dictionaries for each opponent, with the keys,
+        #   "index": the number of its checkpoint, "games": the number of games played against it,
+        #   "wins", "losses": the number of games the learning DuelModel won and lost against it
+        self.pool = [{"index": i, "games": 0, "wins": 0, "losses": 0} for i in checkpointIndexes(self.poolName)]
+        if len(self.pool) == 0:
+            self.freeze()
+
+    def freeze(self):
+        """
+        Save the learning DuelModel as a new frozen opponent. If the pool is full, the opponent with the highest win
+            rate of the learning DuelModel is removed, other than the new opponent
+        """
+        index = 0 if len(self.pool) == 0 else self.pool[-1]["index"] + 1
+        writeCheckpoint(inferenceSnapshot(self.model), periodicCheckpointName(self.poolName, index))
+        self.pool.append({"index": index, "games": 0, "wins": 0, "losses": 0})
+        self.lastSnapshot = self.gamesPlayed
+
+        while len(self.pool) > self.poolSize:
+            weakest = max(self.pool[:-1], key=self.winRate)
+            self.pool.remove(weakest)
+            removeCheckpoint(periodicCheckpointName(self.poolName, weakest["index"]))
+
+    def winRate(self, opponent):
+        """
+        Get the fraction of points the learning DuelModel scored against an opponent, where each draw is half a point,
+            including LEAGUE_PRIOR_GAMES draws
+        :param opponent: The dictionary of the opponent, from the pool
+        :return: The win rate, in the range [0, 1]
+        """
+        draws = opponent["games"] - opponent["wins"] - opponent["losses"] + LEAGUE_PRIOR_GAMES
+        return (opponent["wins"] + draws / 2) / (opponent["games"] + LEAGUE_PRIOR_GAMES)
+
+    def opponentWeights(self):
+        """
+        Get the probability of sampling each opponent in the pool, higher for opponents the learning DuelModel
+            scores less against
+        :return: A numpy array of the probabilities, in the same order as the pool
+        """
+        weights = np.array([(1 - self.winRate(o)) ** LEAGUE_PRIORITY_POWER for o in self.pool])
+        weights = np.maximum(weights, LEAGUE_MIN_WEIGHT)
+        return weights / weights.sum()
+
+    def playRound(self, games):
+        """
+        Play training games against opponents sampled from the pool, and train the learning DuelModel on its moves
+            in each game. The learning DuelModel plays red in half of the games
+        :param games: The number of games to play
+        :return: A list of 3-tuples (opponent index, learner red, win) for each game, the number of the checkpoint of
+            the opponent, True if the learning DuelModel played red, and the E_* code of how the game ended
+        """
+        # the worker processes use the weights of the learning DuelModel as they are at the start of the round
+        self.learnerVersion += 1
+        writeCheckpoint(inferenceSnapshot(self.model), self.learnerName)
+
+        rng = np.random.default_rng(self.seed + self.gamesPlayed)
+        opponents = rng.choice(len(self.pool), size=games, p=self.opponentWeights())
+        learnerRates = {n: net.explorationRate for n, net in self.model.networks().items()}
+        tasks = []
+        for g, o in enumerate(opponents):
+            opponent = self.pool[o]
+            tasks.append((self.model.game.height, self.learnerName, self.learnerVersion,
+                          periodicCheckpointName(self.poolName, opponent["index"]), g % 2 == 0,
+                          self.seed + self.gamesPlayed + g, learnerRates))
+
+        if self.workers == 0:
+            results = [playLeagueGame(t) for t in tasks]
+        else:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(self.workers)
+            results = list(self.executor.map(playLeagueGame, tasks, chunksize=LEAGUE_CHUNK_SIZE))
+
+        summary = []
+        for o, task, (win, moves) in zip(opponents, tasks, results):
+            opponent, learnerRed = self.pool[o], task[4]
+            self.trainGame(learnerRed, moves)
+
+            opponent["games"] += 1
+            if win == E_RED_WIN and learnerRed or win == E_BLACK_WIN and not learnerRed:
+                opponent["wins"] += 1
+            elif win == E_RED_WIN or win == E_BLACK_WIN:
+                opponent["losses"] += 1
+            summary.append((opponent["index"], learnerRed, win))
+
+        self.gamesPlayed += games
+        if self.gamesPlayed - self.lastSnapshot >= self.snapshotGames:
+            self.freeze()
+        return summary
+
+    def trainGame(self, learnerRed, moves):
+        """
+        Helper method for playRound. Replay a game played in a worker process in the Game of the learning DuelModel,
+            training the networks of its side on each of its moves
+        :param learnerRed: True if the learning DuelModel played red, False otherwise
+        :param moves: The list of moves from playLeagueGame
+        """
+        game = self.model.game
+        env = self.model.redEnv if learnerRed else self.model.blackEnv
+        game.resetGame()
+        for gameAction, pieceAction, learner in moves:
+            if learner:
+                env.trainMove(pieceAction, gameAction)
+            else:
+                game.play(game.singlePos(gameAction), moveIntToBoolList(pieceAction))
+        env.endEpisode()
+
+        if self.model.checkpointer is not None:
+            self.model.checkpointer.gameFinished(self.model.snapshot)
+
+    def close(self):
+        """
+        Stop the worker processes
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+def inferenceSnapshot(model):
+    """
+    Copy the weights and rates of every Network of a DuelModel, without the optimizer state, which is only needed
+        for training
+    :param model: The DuelModel
+    :return: A dictionary mapping the names of Networks to snapshots, which can be given to writeCheckpoint
+    """
+    return {name: {"config": net.getConfig(),
+                   "rates": {r: float(getattr(net, r)) for r in CHECKPOINT_RATES},
+                   "weights": [np.array(w) for w in net.net.get_weights()],
+                   "optimizer": []}
+            for name, net in model.networks().items()}
+
+
+def loadLeagueBackends(fileName, version):
+    """
+    Get the Backends for every network of a checkpoint in a worker process, reading the checkpoint the first
+        time it is used
+    :param fileName: The name of the checkpoint
+    :param version: A number which changes each time the checkpoint is written again
+    :return: A dictionary mapping the names of the networks of a DuelModel to Backends, from checkpointBackends
+    """
+    backends = leagueBackends.get((fileName, version))
+    if backends is None:
+        backends = checkpointBackends(fileName)
+        if backends is None:
+            raise ValueError("Could not load the checkpoint " + fileName)
+        # only keep the newest version of each checkpoint
+        for key in [k for k in leagueBackends if k[0] == fileName]:
+            del leagueBackends[key]
+        leagueBackends[(fileName, version)] = backends
+    return backends
+
+
+def playLeagueGame(gameInfo):
+    """
+    Play one game of a League, in a worker process, or the process of the League
+    :param gameInfo: A 7-tuple (size, learner name, learner version, opponent name, learner red, seed, learner rates),
+        where learner rates maps the names of the networks of the learning DuelModel to their exploration rates
+    :return: A 2-tuple (win, moves), the E_* code of how the game ended, and a list of 3-tuples
+        (game action, piece action, learner) for every move, where learner is True for a move picked by the networks
+        of the learning DuelModel, and False for a move by the opponent, or a random move
+    """
+    size, learnerName, learnerVersion, opponentName, learnerRed, seed, learnerRates = gameInfo
+    learner = loadLeagueBackends(learnerName, learnerVersion)
+    opponent = loadLeagueBackends(opponentName, 0)
+
+    # every random choice uses its own generator, so the game only depends on the seed, and playing it in the
+    #   process of the League does not change the random numbers used for training
+    rng = random.Random(seed)
+
+    # the environments of each side only play with the Backends, so no Keras models are made
+    game = Game(size)
+    envs = {}
+    for red in (True, False):
+        side = "red " if red else "black "
+        if red == learnerRed:
+            rates = (sideEntry(learnerRates, side + GAME_NETWORK_NAME),
+                     sideEntry(learnerRates, side + PIECE_NETWORK_NAME))
+            envs[red] = backendEnvironment(game, learner, red, rates, rng)
+        else:
+            rates = LEAGUE_OPPONENT_EXPLORATION, LEAGUE_OPPONENT_EXPLORATION
+            envs[red] = backendEnvironment(game, opponent, red, rates, rng)
+
+    game.resetGame()
+    moves = []
+    while game.win == E_PLAYING:
+        isLearner = game.redTurn == learnerRed
+        move = leagueMove(envs[game.redTurn])
+        if move is not None:
+            moves.append(move + (isLearner,))
+        else:
+            # if the networks can't pick a move, make a random one
+            allMoves = game.allMoves()
+            if len(allMoves) == 0:
+                game.checkWinConditions()
+                break
+            pos, modifiers = rng.choice(allMoves)
+            moves.append((game.toSinglePos(*pos), boolListToInt(modifiers), False))
+            game.play(pos, modifiers)
+
+    return game.win, moves
+
+
+def leagueMove(env):
+    """
+    Helper function for playLeagueGame. Make a move with the networks of a PieceEnvironment, without training them,
+        picking the actions the same way as PieceEnvironment.trainMove, so the move can be replayed with them
+    :param env: The PieceEnvironment, from backendEnvironment
+    :return: A 2-tuple (game action, piece action) of the move made, or None if no move was made
+    """
+    game = env.game
+
+    gameAction = env.gameNetwork.chooseAction(env.gameEnv.toNetInput(), takeAction=env.gameEnv.canTakeAction)
+    if gameAction is None:
+        return None
+    env.gameEnv.takeAction(gameAction)
+    netInput = env.toNetInput()
+    if netInput is None:
+        return None
+    pieceAction = env.internalNetwork.chooseAction(netInput, takeAction=env.canTakeAction)
+
+    before = (game.toKey(True), game.redTurn)
+    env.takeAction(pieceAction)
+    if before == (game.toKey(True), game.redTurn):
+        return None
+    return gameAction, pieceAction
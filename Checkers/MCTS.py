@@ -0,0 +1,266 @@
+from Checkers.Search import *
+
+import numpy as np
+
+from collections import deque
+
+# constants for Monte Carlo tree search
+# the weight of the prior probability of a move, compared to the value found for that move, when picking moves to search
+MCTS_EXPLORATION = 1.5
+# the Q values of the networks are divided by this value before finding the probabilities of moves
+MCTS_PRIOR_TEMPERATURE = 0.1
+# the highest Q value of the game network is multiplied by this value, then put through tanh to get a value in [-1, 1]
+MCTS_VALUE_SCALE = 1 / Q_PIECE_REWARD_WIN
+# the number of visits counted as losses on a path while its leaf waits for the networks
+MCTS_VIRTUAL_LOSS = 1
+# the number of moves to look through in the previous tree, when looking for the position to reuse
+MCTS_REUSE_DEPTH = 4
+
+
+class MCTSNode:
+    """
+    A position in the tree of an MCTSPlayer. The statistics of each move are stored in the node where the move is made,
+        always from the perspective of the player making the move
+    """
+
+    def __init__(self, game):
+        """
+        Create a node for a position, which has not been evaluated
+        :param game: The Game in this position, it should not be modified after creating the node
+        """
+        self.game = game
+        self.key = game.toKey(True)
+        self.redTurn = game.redTurn
+
+        self.moves = game.allMoves() if game.win == E_PLAYING else []
+        if game.win == E_PLAYING and len(self.moves) == 0:
+            game.checkWinConditions()
+
+        # the value of a game which is over, for the player whose turn it is, None if the game is not over
+        if not game.win == E_PLAYING:
+            self.terminal = terminalScore(game, 0) / S_WIN_SCORE
+        elif len(self.moves) == 0:
+            self.terminal = 0
+        else:
+            self.terminal = None
+
+        # the prior probability, number of visits, and total value of each move
+        count = len(self.moves)
+        self.priors = np.full(count, 1 / max(1, count))
+        self.visits = np.zeros(count)
+        self.values = np.zeros(count)
+        self.children = [None] * count
+
+        # True once the networks have given the priors of this node
+        self.expanded = False
+        # True while this node is waiting for the networks
+        self.pending = False
+
+    def child(self, i):
+        """
+        Get the node after making a move, creating it if it does not exist
+        :param i: The index of the move
+        :return: The MCTSNode
+        """
+        if self.children[i] is None:
+            pos, modifiers = self.moves[i]
+            game = self.game.makeCopy()
+            game.play(pos, modifiers)
+            self.children[i] = MCTSNode(game)
+        return self.children[i]
+
+    def selectMove(self, exploration):
+        """
+        Pick the move to search next with the PUCT formula
+        :param exploration: The weight of the prior probabilities
+        :return: The index of the move
+        """
+        total = self.visits.sum()
+        q = np.divide(self.values, self.visits, out=np.zeros(len(self.values)), where=self.visits > 0)
+        u = exploration * self.priors * np.sqrt(total + 1) / (1 + self.visits)
+        return int(np.argmax(q + u))
+
+
+class MCTSPlayer(Player):
+    """
+    A Player which picks moves with Monte Carlo tree search, using the networks of a PieceEnvironment.
+    The game network and the piece network give the prior probability of each move, and the game network gives the
+        value of each position. The positions reached by many simulations are evaluated together in one batch
+    """
+
+    def __init__(self, game, env, simulations=200, batchSize=16, exploration=MCTS_EXPLORATION, temperature=0):
+        """
+        Create an MCTSPlayer
+        :param game: The Game this Player will make moves in
+        :param env: The PieceEnvironment with the networks used to evaluate positions
+        :param simulations: The number of simulations to run for each move, default 200
+        :param batchSize: The maximum number of positions evaluated in one call to the networks, default 16
+        :param exploration: The weight of the prior probability of moves, default MCTS_EXPLORATION
+        :param temperature: 0 to pick the most visited move, otherwise moves are picked randomly, with a probability
+            proportional to the number of visits raised to the power of 1 / temperature, default 0
+        """
+        super().__init__(game)
+        self.env = env
+        self.simulations = simulations
+        self.batchSize = batchSize
+        self.exploration = exploration
+        self.temperature = temperature
+
+        # the node of the last position searched, kept so the tree can be reused on the next move
+        self.root = None
+
+    def reset(self):
+        self.root = None
+
+    def selectMove(self, game):
+        root = self.findRoot(game)
+        if root.terminal is not None:
+            return None
+
+        self.search(root)
+
+        # pick the move based on the number of visits
+        if self.temperature == 0:
+            i = int(np.argmax(root.visits))
+        else:
+            weights = root.visits ** (1 / self.temperature)
+            i = int(np.random.choice(len(weights), p=weights / weights.sum()))
+
+        self.root = root.child(i)
+        return root.moves[i]
+
+    def findRoot(self, game):
+        """
+        Find the node for a Game in the tree from the previous move, or create a new one if it is not in the tree
+        :param game: The Game
+        :return: The MCTSNode
+        """
+        key = game.toKey(True)
+        if self.root is not None:
+            queue = deque([(self.root, 0)])
+            while queue:
+                node, depth = queue.popleft()
+                if node.key == key:
+                    return node
+                if depth < MCTS_REUSE_DEPTH:
+                    queue.extend((c, depth + 1) for c in node.children if c is not None)
+
+        return MCTSNode(game.makeCopy())
+
+    def search(self, root):
+        """
+        Run simulations from a node, until the number of visits of the node reaches the simulation budget
+        :param root: The MCTSNode to search from
+        """
+        if not root.expanded:
+            self.evaluate([root])
+
+        done = int(root.visits.sum())
+        while done < self.simulations and not self.stopped:
+            batch = []
+            paths = []
+            while done < self.simulations and len(batch) < self.batchSize and not self.stopped:
+                done += 1
+                path, leaf = self.selectLeaf(root)
+
+                # the value of a finished game is already known
+                if leaf.terminal is not None:
+                    self.backup(path, leaf.terminal)
+                # the same position was reached twice in one batch, so stop adding to the batch
+                elif leaf.pending:
+                    self.backup(path, None)
+                    break
+                else:
+                    leaf.pending = True
+                    batch.append(leaf)
+                    paths.append(path)
+
+            if len(batch) > 0:
+                values = self.evaluate(batch)
+                for path, value in zip(paths, values):
+                    self.backup(path, value)
+
+    def selectLeaf(self, root):
+        """
+        Follow the best moves from a node, until reaching a node which has not been evaluated, or where the game is over.
+        Each move on the path has a virtual loss added, so other simulations in the same batch avoid it
+        :param root: The MCTSNode to start from
+        :return: A 2-tuple (path, leaf), a list of 2-tuples (node, move index) of each move made, and the final node
+        """
+        path = []
+        node = root
+        while node.expanded and node.terminal is None:
+            i = node.selectMove(self.exploration)
+            node.visits[i] += MCTS_VIRTUAL_LOSS
+            node.values[i] -= MCTS_VIRTUAL_LOSS
+            path.append((node, i))
+            node = node.child(i)
+        return path, node
+
+    def backup(self, path, value):
+        """
+        Remove the virtual loss on a path, and add the value found at the end of it to each move
+        :param path: The path from selectLeaf
+        :param value: The value of the final node of the path, for the player whose turn it is there,
+            or None to only remove the virtual loss
+        """
+        for node, i in reversed(path):
+            node.visits[i] -= MCTS_VIRTUAL_LOSS
+            node.values[i] += MCTS_VIRTUAL_LOSS
+            if value is None:
+                continue
+
+            # after a jump the same player moves again, otherwise the value is from the opponent's perspective
+            if not node.children[i].redTurn == node.redTurn:
+                value = -value
+            node.visits[i] += 1
+            node.values[i] += value
+
+    def evaluate(self, nodes):
+        """
+        Find the priors and values of a list of nodes, with one call to each network
+        :param nodes: The list of MCTSNode objects, where the game is not over
+        :return: A list of the value of each node, for the player whose turn it is
+        """
+        gameOutputs = self.env.gameNetwork.batchOutputs(
+            np.concatenate([gameToNetInput(n.game, None) for n in nodes])).astype(np.float64)
+
+        # find the squares with a piece that can move in each position, and their piece network inputs
+        squares = []
+        pieceInputs = []
+        for n in nodes:
+            nodeSquares = sorted({n.game.toSinglePos(*pos) for pos, modifiers in n.moves})
+            squares.append(nodeSquares)
+            pieceInputs.extend(gameToNetInput(n.game, n.game.singlePos(s)) for s in nodeSquares)
+        pieceOutputs = self.env.internalNetwork.batchOutputs(np.concatenate(pieceInputs)).astype(np.float64)
+
+        values = []
+        row = 0
+        for n, nodeGame, nodeSquares in zip(nodes, gameOutputs, squares):
+            squareQ = nodeGame[nodeSquares]
+            squarePriors = softmax(squareQ / MCTS_PRIOR_TEMPERATURE)
+            squareIndexes = {s: j for j, s in enumerate(nodeSquares)}
+
+            # the prior of a move is the prior of its square, times the prior of the move, out of the moves of that piece
+            moveSquares = np.array([squareIndexes[n.game.toSinglePos(*pos)] for pos, modifiers in n.moves])
+            moveQ = pieceOutputs[row + moveSquares, [boolListToInt(modifiers) for pos, modifiers in n.moves]]
+            movePriors = np.exp((moveQ - moveQ.max()) / MCTS_PRIOR_TEMPERATURE)
+            pieceTotals = np.bincount(moveSquares, movePriors, len(nodeSquares))
+            n.priors = squarePriors[moveSquares] * movePriors / pieceTotals[moveSquares]
+
+            n.expanded = True
+            n.pending = False
+            values.append(float(np.tanh(squareQ.max() * MCTS_VALUE_SCALE)))
+            row += len(nodeSquares)
+
+        return values
+
+
+def softmax(x):
+    """
+    Find the softmax of a numpy array
+    :param x: The 1D numpy array
+    :return: The probabilities, a numpy array of the same shape
+    """
+    e = np.exp(x - x.max())
+    return e / e.sum()
@@ -0,0 +1,597 @@
+from Checkers.Environments import *
+
+import abc
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+
+# constants for scoring positions in a search, always relative to the player whose turn it is
+# the score for winning the game, winning in fewer moves gives a slightly higher score
+S_WIN_SCORE = 100000
+# scores at least this high, or this low when negative, are for a won or lost game, rather than an evaluation
+S_WIN_THRESHOLD = S_WIN_SCORE - 1000
+# the score of each normal piece
+S_PIECE_SCORE = 100
+# the score of each king
+S_KING_SCORE = 160
+# the score for each row a normal piece has moved forward
+S_ADVANCE_SCORE = 3
+# the value that Q values of a network are multiplied by to get a score
+S_NETWORK_SCALE = 1000
+
+# constants for the state of a search
+# the number of nodes searched between checks of the time limit
+S_TIME_CHECK_NODES = 256
+# the maximum number of positions kept in the transposition table before it is cleared
+S_MAX_TABLE_SIZE = 1000000
+# flags for the type of score stored in the transposition table
+S_EXACT = 0
+S_LOWER = 1
+S_UPPER = 2
+
+# the Event which stops the searches of a RootParallelPlayer, in one of its worker processes
+searchStopEvent = None
+
+
+class Player:
+    """
+    A generic object for something which picks the moves for one side of a Checkers Game,
+        without needing an Environment to make the move
+    """
+
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self, game):
+        """
+        Create a Player for the given Game
+        :param game: The Game this Player will make moves in
+        """
+        self.game = game
+
+        # True when a search running on another thread should finish as soon as it can
+        self.stopped = False
+
+    @abc.abstractmethod
+    def selectMove(self, game):
+        """
+        Pick the move to make for the current player of the given Game. The Game is not modified
+        :param game: The Game to pick a move in
+        :return: A 2-tuple (pos, modifiers) in the same form used by Game.play, or None if no move can be made
+        """
+        return None
+
+    def makeMove(self):
+        """
+        Pick a move in the Game of this Player, and play it
+        :return: True if a move was made, False otherwise
+        """
+        if not self.game.win == E_PLAYING:
+            return False
+
+        move = self.selectMove(self.game)
+        if move is None:
+            self.game.checkWinConditions()
+            return False
+
+        self.game.play(move[0], move[1])
+        return True
+
+    def reset(self):
+        """
+        Clear any information this Player keeps between moves, should be called when a new game starts
+        """
+
+    def close(self):
+        """
+        Release any resources used by this Player, such as worker processes. The Player can still be used after
+        """
+
+    def stop(self):
+        """
+        Ask a search running on another thread to return as soon as it can.
+        stopped must be set back to False before the next search
+        """
+        self.stopped = True
+
+
+class AlphaBetaPlayer(Player):
+    """
+    A Player which picks moves with an iterative deepening alpha-beta search over a Game
+    """
+
+    def __init__(self, game, maxDepth=20, timeLimit=1.0, evaluate=None, stopEvent=None):
+        """
+        Create an AlphaBetaPlayer
+        :param game: The Game this Player will make moves in
+        :param maxDepth: The maximum number of moves to search ahead, default 20
+        :param timeLimit: The number of seconds to search for each move, or None to always search to maxDepth,
+            default 1.0. The deepest completed search is used, the first depth is always completed
+        :param evaluate: A function taking a Game, and returning the score of that Game, for the player whose turn
+            it is. None to use materialEvaluation, default None
+        :param stopEvent: An Event which stops a search in the same way as stop when it is set, used when the search
+            runs in another process, or None to only use stop, default None
+        """
+        super().__init__(game)
+        self.maxDepth = maxDepth
+        self.timeLimit = timeLimit
+        self.evaluate = materialEvaluation if evaluate is None else evaluate
+        self.stopEvent = stopEvent
+
+        # the transposition table, mapping position keys to 4-tuples (depth, score, flag, best move)
+        self.table = {}
+        # the history heuristic, mapping moves to how often they caused a cutoff
+        self.history = {}
+
+        # variables for tracking the current search
+        self.nodes = 0
+        self.endTime = None
+        self.depthReached = 0
+        self.bestScore = 0
+
+    def reset(self):
+        self.table = {}
+        self.history = {}
+
+    def selectMove(self, game):
+        return self.search(game)
+
+    def search(self, game, rootMoves=None):
+        """
+        Run an iterative deepening search from the given Game
+        :param game: The Game to search, it is not modified
+        :param rootMoves: A list of the moves to consider for the first move, or None to consider all moves,
+            default None
+        :return: The best move found, in the same form as Player.selectMove, or None if no move can be made.
+            After the search, depthReached and bestScore store the depth and score of that move
+        """
+        if rootMoves is None:
+            rootMoves = game.allMoves()
+        if not game.win == E_PLAYING or len(rootMoves) == 0:
+            return None
+
+        if len(self.table) > S_MAX_TABLE_SIZE:
+            self.table = {}
+
+        self.nodes = 0
+        self.endTime = None if self.timeLimit is None else time.time() + self.timeLimit
+        self.depthReached = 0
+        self.bestScore = 0
+
+        bestMove = rootMoves[0]
+        for depth in range(1, self.maxDepth + 1):
+            try:
+                score, move = self.searchRoot(game, rootMoves, depth)
+            except SearchTimeout:
+                break
+
+            bestMove, self.bestScore, self.depthReached = move, score, depth
+
+            # the score of a finished game can't change with a deeper search
+            if abs(score) >= S_WIN_SCORE - self.maxDepth:
+                break
+
+        return bestMove
+
+    def searchRoot(self, game, rootMoves, depth):
+        """
+        Search every move from the root of the search
+        :param game: The Game at the root of the search
+        :param rootMoves: The moves to consider
+        :param depth: The number of moves to search ahead
+        :return: A 2-tuple (score, move) of the best move and its score
+        """
+        alpha, beta = -S_WIN_SCORE - 1, S_WIN_SCORE + 1
+        bestMove = None
+        for move in self.orderMoves(game, rootMoves, 0):
+            score = self.searchMove(game, move, depth, alpha, beta, 0, depth > 1)
+            if bestMove is None or score > alpha:
+                alpha, bestMove = score, move
+
+        self.table[game.toKey(True)] = (depth, alpha, S_EXACT, bestMove)
+        return alpha, bestMove
+
+    def searchMove(self, game, move, depth, alpha, beta, ply, timed):
+        """
+        Find the score of making a move
+        :param game: The Game to make the move in, it is not modified
+        :param move: A 2-tuple (pos, modifiers) of the move to make
+        :param depth: The number of moves to search ahead, including this move
+        :param alpha: The lowest score the current player is already guaranteed
+        :param beta: The highest score the opponent will allow
+        :param ply: The number of moves made since the root of the search
+        :param timed: True if the search can stop when the time runs out, False otherwise
+        :return: The score of the move, for the player making it
+        """
+        child = game.makeCopy()
+        child.play(move[0], move[1])
+
+        # after a jump the same player moves again, otherwise the score is from the opponent's perspective
+        if child.redTurn == game.redTurn:
+            return self.negamax(child, depth - 1, alpha, beta, ply + 1, timed)
+        return -self.negamax(child, depth - 1, -beta, -alpha, ply + 1, timed)
+
+    def negamax(self, game, depth, alpha, beta, ply, timed):
+        """
+        Find the score of a Game with an alpha-beta search
+        :param game: The Game to search
+        :param depth: The number of moves to search ahead
+        :param alpha: The lowest score the current player is already guaranteed
+        :param beta: The highest score the opponent will allow
+        :param ply: The number of moves made since the root of the search
+        :param timed: True if the search can stop when the time runs out, False otherwise
+        :return: The score of the Game, for the player whose turn it is
+        """
+        self.nodes += 1
+        if timed and self.nodes % S_TIME_CHECK_NODES == 0 and \
+                (self.stopped or self.stopEvent is not None and self.stopEvent.is_set() or
+                 self.endTime is not None and time.time() > self.endTime):
+            raise SearchTimeout()
+
+        if not game.win == E_PLAYING:
+            return terminalScore(game, ply)
+        if depth <= 0:
+            return self.evaluate(game)
+
+        # use the transposition table to skip the search, or find the best move to search first
+        key = game.toKey(True)
+        entry = self.table.get(key)
+        tableMove = None
+        if entry is not None:
+            entryDepth, entryScore, flag, tableMove = entry
+            entryScore = scoreFromTable(entryScore, ply)
+            if entryDepth >= depth and (flag == S_EXACT or
+                                        (flag == S_LOWER and entryScore >= beta) or
+                                        (flag == S_UPPER and entryScore <= alpha)):
+                return entryScore
+
+        moves = game.allMoves()
+        if len(moves) == 0:
+            game.checkWinConditions()
+            return terminalScore(game, ply)
+
+        originalAlpha = alpha
+        bestScore, bestMove = None, None
+        for move in self.orderMoves(game, moves, ply, tableMove):
+            score = self.searchMove(game, move, depth, alpha, beta, ply, timed)
+            if bestScore is None or score > bestScore:
+                bestScore, bestMove = score, move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                historyKey = moveKey(move)
+                self.history[historyKey] = self.history.get(historyKey, 0) + depth * depth
+                break
+
+        if bestScore <= originalAlpha:
+            flag = S_UPPER
+        elif bestScore >= beta:
+            flag = S_LOWER
+        else:
+            flag = S_EXACT
+        self.table[key] = (depth, scoreToTable(bestScore, ply), flag, bestMove)
+
+        return bestScore
+
+    def orderMoves(self, game, moves, ply, tableMove=None):
+        """
+        Sort moves so that the moves most likely to be the best are searched first.
+        The best move from the transposition table is first, then captures, then moves by the history heuristic
+        :param game: The Game the moves are made in
+        :param moves: The list of moves
+        :param ply: The number of moves made since the root of the search
+        :param tableMove: The best move found for this position in a previous search, or None if there is none
+        :return: The sorted list of moves
+        """
+        if tableMove is None and ply == 0:
+            entry = self.table.get(game.toKey(True))
+            tableMove = None if entry is None else entry[3]
+
+        def priority(move):
+            if move == tableMove:
+                return -2 ** 62
+            return -(move[1][2] * 2 ** 61 + self.history.get(moveKey(move), 0))
+
+        return sorted(moves, key=priority)
+
+
+class RootParallelPlayer(Player):
+    """
+    A Player which splits the moves at the root of an alpha-beta search across a pool of processes.
+    Each process searches its moves independently on its own copy of the Game, and the best result is used
+    """
+
+    def __init__(self, game, workers=None, maxDepth=20, timeLimit=1.0, evaluate=None):
+        """
+        Create a RootParallelPlayer
+        :param game: The Game this Player will make moves in
+        :param workers: The number of processes to use, or None to use one for each CPU, default None
+        :param maxDepth: The maximum number of moves to search ahead, default 20
+        :param timeLimit: The number of seconds to search for each move, or None to always search to maxDepth,
+            default 1.0
+        :param evaluate: The evaluation function, in the same form as for AlphaBetaPlayer. It is sent to the worker
+            processes, so it must be a function defined at the top level of a module. None to use materialEvaluation,
+            default None
+        """
+        super().__init__(game)
+        self.workers = os.cpu_count() if workers is None else workers
+        self.maxDepth = maxDepth
+        self.timeLimit = timeLimit
+        self.evaluate = materialEvaluation if evaluate is None else evaluate
+
+        # the pool of processes, only created when the first search happens
+        self.executor = None
+        # the searches running in the pool, and the Event shared with every process, which stops them when it is set
+        self.futures = []
+        self.stopEvent = multiprocessing.Event()
+
+        # the depth and score of the last move found
+        self.depthReached = 0
+        self.bestScore = 0
+
+    def selectMove(self, game):
+        return self.search(game)
+
+    def search(self, game):
+        """
+        Run a search in parallel from the given Game
+        :param game: The Game to search, it is not modified
+        :return: The best move found, in the same form as Player.selectMove, or None if no move can be made
+        """
+        moves = game.allMoves()
+        if not game.win == E_PLAYING or len(moves) == 0:
+            return None
+
+        # order the moves before dealing them out, so that every process gets some of the likely best moves
+        moves = AlphaBetaPlayer(game).orderMoves(game, moves, 0)
+        groups = [moves[i::self.workers] for i in range(min(self.workers, len(moves)))]
+
+        if not self.stopped:
+            self.stopEvent.clear()
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers, initializer=initSearchWorker, initargs=(self.stopEvent,))
+        self.futures = [self.executor.submit(searchRootMoves, game, g, self.maxDepth, self.timeLimit, self.evaluate)
+                        for g in groups]
+
+        # searches which were stopped before they started have no result
+        results = []
+        for f in self.futures:
+            try:
+                results.append(f.result())
+            except CancelledError:
+                pass
+        self.futures = []
+        if len(results) == 0:
+            self.bestScore, self.depthReached = 0, 0
+            return moves[0]
+
+        # use the highest score, and for equal scores, the deepest search
+        best = max(results, key=lambda r: (r[1], r[2]))
+        bestMove, self.bestScore, self.depthReached = best
+        return bestMove
+
+    def stop(self):
+        # the worker processes can't see stopped, so they are stopped with the Event,
+        #   and searches which haven't started are cancelled
+        super().stop()
+        self.stopEvent.set()
+        for f in self.futures:
+            f.cancel()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+class Ponderer:
+    """
+    An object which uses a Player to search on a background thread while the opponent is thinking.
+    Every move the opponent can make is searched, starting with the moves which are best for the opponent,
+        and when the opponent makes one of them, the reply is ready without another search
+    """
+
+    def __init__(self, player):
+        """
+        Create a Ponderer
+        :param player: The Player to search with. The Player must not be used by anything else while pondering
+        """
+        self.player = player
+
+        # the replies found so far, mapping position keys from Game.toKey from red's perspective, to moves
+        self.replies = {}
+        self.thread = None
+        self.stopEvent = threading.Event()
+
+    def start(self, game):
+        """
+        Start searching the replies to each move the opponent can make, stopping any previous search
+        :param game: The Game where it is the opponent's turn, a copy is made, so it can be modified after
+        """
+        self.stop()
+        self.replies = {}
+        positions = predictPositions(game)
+        self.thread = threading.Thread(target=self.ponder, args=(positions,), daemon=True)
+        self.thread.start()
+
+    def ponder(self, positions):
+        """
+        Helper method for start, run on the background thread. Search each position until stopped
+        :param positions: A list of Games to search, in the order they should be searched
+        """
+        for position in positions:
+            if self.stopEvent.is_set():
+                return
+            move = self.player.selectMove(position)
+            if self.stopEvent.is_set():
+                return
+            self.replies[position.toKey(True)] = move
+
+    def stop(self):
+        """
+        Stop the background search, and wait for it to finish. The replies found so far are kept
+        """
+        if self.thread is not None:
+            self.stopEvent.set()
+            self.player.stop()
+            self.thread.join()
+            self.thread = None
+            self.stopEvent.clear()
+            self.player.stopped = False
+
+    def reply(self, game):
+        """
+        Get the reply found while pondering for a position
+        :param game: The Game, where it is the turn of the Player of this Ponderer
+        :return: The move, in the same form as Player.selectMove, or None if the position was not searched
+        """
+        return self.replies.get(game.toKey(True))
+
+
+def predictPositions(game):
+    """
+    Helper function for Ponderer. Find each position the current player can reach when their turn ends
+    :param game: The Game
+    :return: A list of copies of the Game, where the game is not over, and it is the other player's turn,
+        sorted so the positions with the best score for the current player are first
+    """
+    positions = []
+    games = [game]
+    while games:
+        g = games.pop()
+        for pos, modifiers in g.allMoves():
+            newGame = g.makeCopy()
+            newGame.play(pos, modifiers)
+            if not newGame.win == E_PLAYING:
+                continue
+            # after a jump the same player keeps moving
+            if newGame.redTurn == game.redTurn:
+                games.append(newGame)
+            else:
+                positions.append(newGame)
+
+    # the score is for the player whose turn it is after the move, so the lowest scores are best for the mover
+    positions.sort(key=materialEvaluation)
+    return positions
+
+
+def initSearchWorker(stopEvent):
+    """
+    Set up a worker process for a RootParallelPlayer
+    :param stopEvent: The Event which stops the searches of the RootParallelPlayer
+    """
+    global searchStopEvent
+    searchStopEvent = stopEvent
+
+
+def searchRootMoves(game, moves, maxDepth, timeLimit, evaluate):
+    """
+    Helper function for RootParallelPlayer, run in a worker process. Search some of the root moves of a Game
+    :param game: The Game to search
+    :param moves: The list of moves to search
+    :param maxDepth: The maximum number of moves to search ahead
+    :param timeLimit: The number of seconds to search, or None for no limit
+    :param evaluate: The evaluation function
+    :return: A 3-tuple (move, score, depth) of the best move, its score, and the depth the search completed
+    """
+    player = AlphaBetaPlayer(game, maxDepth=maxDepth, timeLimit=timeLimit, evaluate=evaluate,
+                             stopEvent=searchStopEvent)
+    move = player.search(game, moves)
+    return move, player.bestScore, player.depthReached
+
+
+class SearchTimeout(Exception):
+    """
+    Raised when a search runs out of time
+    """
+
+
+def terminalScore(game, ply):
+    """
+    Find the score of a Game which is over, for the player whose turn it is
+    :param game: The Game
+    :param ply: The number of moves made since the root of the search, wins in fewer moves have a higher score
+    :return: The score
+    """
+    if isDraw(game.win):
+        return 0
+    won = (game.win == E_RED_WIN) == game.redTurn
+    return S_WIN_SCORE - ply if won else ply - S_WIN_SCORE
+
+
+def scoreToTable(score, ply):
+    """
+    Convert a score to store in a transposition table. The score of a won or lost game counts the moves from the root
+        of the search, so it is changed to count the moves from the stored position, which may be reached at any ply
+    :param score: The score
+    :param ply: The number of moves made since the root of the search to reach the stored position
+    :return: The score to store
+    """
+    if score >= S_WIN_THRESHOLD:
+        return score + ply
+    if score <= -S_WIN_THRESHOLD:
+        return score - ply
+    return score
+
+
+def scoreFromTable(score, ply):
+    """
+    Convert a score stored in a transposition table back to a score counting the moves from the root of the search.
+    This is the opposite of scoreToTable
+    :param score: The stored score
+    :param ply: The number of moves made since the root of the search to reach the stored position
+    :return: The score
+    """
+    if score >= S_WIN_THRESHOLD:
+        return score - ply
+    if score <= -S_WIN_THRESHOLD:
+        return score + ply
+    return score
+
+
+def materialEvaluation(game):
+    """
+    Find a handcrafted score of a Game, based on the pieces each player has, and how far normal pieces have moved
+    :param game: The Game
+    :return: The score, for the player whose turn it is
+    """
+    score = 0
+    for y, r in enumerate(game.currentGrid()):
+        for c in r:
+            if c is not None:
+                if c[1]:
+                    value = S_KING_SCORE
+                # allies start at the bottom and move up, enemies start at the top and move down
+                elif c[0]:
+                    value = S_PIECE_SCORE + S_ADVANCE_SCORE * (game.height - 1 - y)
+                else:
+                    value = S_PIECE_SCORE + S_ADVANCE_SCORE * y
+                score += value if c[0] else -value
+    return score
+
+
+def networkEvaluation(env):
+    """
+    Create an evaluation function for a search, which uses the game network of a PieceEnvironment
+    :param env: The PieceEnvironment
+    :return: A function taking a Game, returning the highest Q value of the squares that can be moved, scaled by
+        S_NETWORK_SCALE, for the player whose turn it is
+    """
+    def evaluate(game):
+        moves = game.redMoves if game.redTurn else game.blackMoves
+        if len(moves) == 0:
+            return 0
+        values = env.gameNetwork.getActions(gameToNetInput(game, None))
+        return float(max(values[s] for s in moves)) * S_NETWORK_SCALE
+
+    return evaluate
+
+
+def moveKey(move):
+    """
+    Convert a move to a hashable key
+    :param move: A 2-tuple (pos, modifiers)
+    :return: The key
+    """
+    return move[0], tuple(move[1])
@@ -0,0 +1,291 @@
+from Checkers.Game import *
+from Constants import *
+
+import numpy as np
+
+import os.path as path
+import os
+from collections import deque
+
+# constants for the results stored in a tablebase, always relative to the player whose turn it is
+TB_WIN = 1
+TB_DRAW = 0
+TB_LOSS = -1
+# the distance stored for a draw which never ends, because both players can keep moving forever
+TB_NO_DISTANCE = np.iinfo(np.uint16).max
+
+# the layout of each slot in the hash table of a tablebase
+TB_DTYPE = np.dtype([("key", "<u8"), ("result", "i1"), ("distance", "<u2")])
+# the key of a slot in the hash table that has no position
+TB_EMPTY_KEY = np.iinfo(np.uint64).max
+# the multiplier used for hashing keys into a slot
+TB_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+class Tablebase:
+    """
+    A table of the exact result of perfect play, for every position reachable on a small Checkers board.
+    Positions are stored in an open addressing hash table, in one numpy array, so that it can be saved to a file,
+        and memory mapped, with a lookup taking constant time.
+    The results ignore the rule for drawing after too many moves without a capture
+    """
+
+    def __init__(self, table):
+        """
+        Create a Tablebase from an existing hash table. Use build or load to create a Tablebase
+        :param table: A 1D numpy array with the dtype TB_DTYPE, with a length that is a power of 2
+        """
+        self.table = table
+
+        # views of each field, so that a lookup does not need to find the fields every time
+        self.keys = table["key"]
+        self.results = table["result"]
+        self.distances = table["distance"]
+
+        self.bits = len(table).bit_length() - 1
+        self.mask = len(table) - 1
+
+    def __len__(self):
+        """
+        Get the number of positions stored in this Tablebase
+        :return: The number of positions
+        """
+        return int(np.count_nonzero(self.keys != TB_EMPTY_KEY))
+
+    def slot(self, key):
+        """
+        Find the slot in the hash table where a key is stored, or where it would be stored
+        :param key: The key of the position, from Game.toKey from red's perspective
+        :return: The index of the slot
+        """
+        i = ((key * TB_HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> (64 - self.bits) if self.bits > 0 else 0
+        while True:
+            k = self.keys[i]
+            if k == key or k == TB_EMPTY_KEY:
+                return i
+            i = (i + 1) & self.mask
+
+    def lookup(self, game):
+        """
+        Find the result of perfect play from the given position
+        :param game: The Game to look up
+        :return: A 2-tuple (result, distance), the result is TB_WIN, TB_DRAW, or TB_LOSS, for the player whose turn
+            it is, and distance is the number of moves until the game ends, or TB_NO_DISTANCE if the game will not end.
+            None if the position is not in this Tablebase
+        """
+        key = game.toKey(True)
+        i = self.slot(key)
+        if self.keys[i] == TB_EMPTY_KEY:
+            return None
+        return int(self.results[i]), int(self.distances[i])
+
+    def reward(self, game, redSide):
+        """
+        Find the reward for the end of the game, assuming both players play perfectly from the given position
+        :param game: The Game to look up
+        :param redSide: True if the reward is from red's perspective, False for black's perspective
+        :return: The reward for winning, losing, or drawing, or None if the game is already over,
+            or the position is not in this Tablebase
+        """
+        if not game.win == E_PLAYING:
+            return None
+
+        found = self.lookup(game)
+        if found is None:
+            return None
+
+        result = found[0] if game.redTurn == redSide else -found[0]
+        if result == TB_WIN:
+            return Q_PIECE_REWARD_WIN
+        elif result == TB_LOSS:
+            return Q_PIECE_REWARD_LOSE
+        return Q_PIECE_REWARD_DRAW
+
+    def save(self, fileName):
+        """
+        Save this Tablebase to a numpy file
+        :param fileName: The name of the file, relative to Constants.NETWORK_SAVES
+        """
+        if not path.isdir(NETWORK_SAVES):
+            os.mkdir(NETWORK_SAVES)
+        np.save(NETWORK_SAVES + "/" + fileName, self.table)
+
+    @staticmethod
+    def load(fileName):
+        """
+        Load a Tablebase from a numpy file, which is memory mapped rather than read into memory
+        :param fileName: The name of the file, relative to Constants.NETWORK_SAVES
+        :return: The Tablebase, or None if it could not be loaded
+        """
+        try:
+            return Tablebase(np.load(NETWORK_SAVES + "/" + fileName, mmap_mode="r"))
+        except (IOError, OSError, ValueError):
+            return None
+
+    @staticmethod
+    def build(size, startGame=None, maxPositions=None, printProgress=False):
+        """
+        Find the result of every position reachable from a starting position with retrograde analysis
+        :param size: The size of the board, the number of squares on the board must be small enough that
+            every key from Game.toKey fits in 64 bits, which is at most a 6x6 board
+        :param startGame: The Game to start from, or None to start from a normal game, default None
+        :param maxPositions: The maximum number of positions to find before stopping with an error,
+            or None to have no limit, default None
+        :param printProgress: True to print the progress of the search, False otherwise, default False
+        :return: The Tablebase
+        """
+        if 5 ** (size * size // 2) * 2 >= TB_EMPTY_KEY:
+            raise ValueError("A board of size " + str(size) + " has too many squares for a Tablebase")
+
+        # find every reachable position, and the moves between them
+        keys, successors, terminal = enumeratePositions(size, startGame, maxPositions, printProgress)
+        results, distances = retrogradeAnalysis(successors, terminal)
+
+        # place every position in a hash table, with at most half of the slots filled
+        table = np.zeros(max(1, 2 ** (2 * len(keys) - 1).bit_length()), dtype=TB_DTYPE)
+        table["key"] = TB_EMPTY_KEY
+        tablebase = Tablebase(table)
+        for key, result, distance in zip(keys, results, distances):
+            i = tablebase.slot(key)
+            table[i] = (key, result, distance)
+
+        if printProgress:
+            print("Tablebase built with", len(keys), "positions")
+
+        return tablebase
+
+
+def enumeratePositions(size, startGame=None, maxPositions=None, printProgress=False):
+    """
+    Helper method for Tablebase.build. Find every position reachable from a starting position
+    :param size: The size of the board
+    :param startGame: The Game to start from, or None to start from a normal game
+    :param maxPositions: The maximum number of positions to find before stopping with an error, or None for no limit
+    :param printProgress: True to print the progress of the search, False otherwise
+    :return: A 3-tuple (keys, successors, terminal),
+        keys: a list of the key of every position, from Game.toKey from red's perspective
+        successors: a list with a list of 2-tuples (index, sameTurn) for each position, the index of a position that
+            can be reached in one move, and True if the same player moves in that position
+        terminal: a dictionary, mapping the index of each position where the game is over to its result
+    """
+    start = Game(size) if startGame is None else startGame.makeCopy()
+    start.movesSinceLastCapture = 0
+    start.checkWinConditions()
+
+    indexes = {start.toKey(True): 0}
+    keys = [start.toKey(True)]
+    successors = [[]]
+    terminal = {}
+
+    queue = deque([(0, start)])
+    while queue:
+        index, game = queue.popleft()
+
+        # the game is over, so find the result for the player whose turn it is
+        if not game.win == E_PLAYING:
+            terminal[index] = terminalResult(game)
+            continue
+
+        for pos, modifiers in game.allMoves():
+            newGame = game.makeCopy()
+            # positions are found without the rule for too many moves without a capture
+            newGame.movesSinceLastCapture = 0
+            newGame.play(pos, modifiers)
+
+            key = newGame.toKey(True)
+            newIndex = indexes.get(key)
+            if newIndex is None:
+                newIndex = len(keys)
+                indexes[key] = newIndex
+                keys.append(key)
+                successors.append([])
+                queue.append((newIndex, newGame))
+
+                if maxPositions is not None and len(keys) > maxPositions:
+                    raise ValueError("More than " + str(maxPositions) + " positions were found")
+                if printProgress and len(keys) % 100000 == 0:
+                    print("Found", len(keys), "positions")
+
+            successors[index].append((newIndex, newGame.redTurn == game.redTurn))
+
+    return keys, successors, terminal
+
+
+def terminalResult(game):
+    """
+    Helper method for enumeratePositions. Find the result of a game which is over
+    :param game: The Game, which must be over
+    :return: TB_WIN, TB_DRAW, or TB_LOSS, for the player whose turn it is
+    """
+    if isDraw(game.win):
+        return TB_DRAW
+    return TB_WIN if (game.win == E_RED_WIN) == game.redTurn else TB_LOSS
+
+
+def retrogradeAnalysis(successors, terminal):
+    """
+    Helper method for Tablebase.build. Working backwards from the positions where the game is over,
+        find the result of perfect play from every position
+    :param successors: The successors of each position, from enumeratePositions
+    :param terminal: The results of the positions where the game is over, from enumeratePositions
+    :return: A 2-tuple (results, distances) of numpy arrays, the result and distance to the end of the game of each
+        position, in the same form as Tablebase.lookup
+    """
+    count = len(successors)
+    results = np.full(count, TB_DRAW, dtype=np.int8)
+    distances = np.full(count, TB_NO_DISTANCE, dtype=np.uint16)
+    solved = np.zeros(count, dtype=bool)
+
+    # find the positions which can reach each position
+    predecessors = [[] for i in range(count)]
+    for i, succ in enumerate(successors):
+        for s, sameTurn in succ:
+            predecessors[s].append((i, sameTurn))
+
+    # the number of moves of each position which have not been solved, if one of them is a draw,
+    #   and the distance of the first move found which draws
+    remaining = np.array([len(s) for s in successors])
+    draws = np.zeros(count, dtype=bool)
+    drawDistances = np.full(count, TB_NO_DISTANCE, dtype=np.uint16)
+
+    queue = deque()
+    for i, result in terminal.items():
+        results[i] = result
+        distances[i] = 0
+        solved[i] = True
+        queue.append(i)
+
+    while queue:
+        s = queue.popleft()
+        for p, sameTurn in predecessors[s]:
+            if solved[p]:
+                continue
+
+            # the result of the move for the player making it
+            result = results[s] if sameTurn else -results[s]
+
+            # any move that wins makes the position a win
+            if result == TB_WIN:
+                results[p] = TB_WIN
+                distances[p] = min(distances[s] + 1, TB_NO_DISTANCE)
+            else:
+                if result == TB_DRAW and not draws[p]:
+                    draws[p] = True
+                    drawDistances[p] = min(distances[s] + 1, TB_NO_DISTANCE)
+                remaining[p] -= 1
+                # if every move is solved, and none of them win, the position is a draw if any move draws,
+                #   with the distance of that move, otherwise every move loses, and the loss is delayed
+                #   as long as possible
+                if remaining[p] > 0:
+                    continue
+                if draws[p]:
+                    results[p] = TB_DRAW
+                    distances[p] = drawDistances[p]
+                else:
+                    results[p] = TB_LOSS
+                    distances[p] = min(distances[s] + 1, TB_NO_DISTANCE)
+
+            solved[p] = True
+            queue.append(p)
+
+    return results, distances
@@ -1,4 +1,4 @@
-from tensorflow import keras
+from LazyModule import LazyModule
 
 # constants for the dummy game
 # indexes for rewards on grid spaces
@@ -40,23 +40,33 @@ TRACK_MOVE_HISTORY = True
 # True to use a simplified Bellman function, False to use the full version
 SIMPLE_BELLMAN = False
 
-# used to stop importing TensorFlow, should only be used for testing, should be True in any full version
-USE_TENSOR_FLOW = True
-
-# used to stop importing Pygame, should only be used for testing, should be True in any full version
-USE_PY_GAME = True
+# TensorFlow and Pygame are only imported the first time they are used, so code which only needs the Game starts quickly
+tf = LazyModule("tensorflow")
+keras = LazyModule("tensorflow", "keras")
+pygame = LazyModule("pygame")
 
 # used for saving neural Networks
 NETWORK_SAVES = "saves"
 PIECE_NETWORK_NAME = "piece"
 GAME_NETWORK_NAME = "game"
 DUEL_MODEL_NAME = "duel model"
-
-
-# the optimization function used for Q Networks
-OPTIMIZE_FUNCTION = keras.optimizers.Adam
-# the loss function used for Q Networks
-LOSS_FUNCTION = keras.losses.MeanSquaredError
+# the folder, relative to NETWORK_SAVES, where checkpoints saved during training go
+CHECKPOINT_PATH = "checkpoints"
+
+
+# the name of the optimization function in keras.optimizers used for Q Networks
+OPTIMIZE_FUNCTION = "Adam"
+# the name of the loss function in keras.losses used for Q Networks
+LOSS_FUNCTION = "MeanSquaredError"
+# the number of samples in each minibatch when training Q Networks on many samples, the same as the Keras default
+TRAIN_BATCH_SIZE = 32
+# the Keras dtype policy used by Q Networks with mixed precision, bfloat16 is fast on CPUs, and unlike float16,
+#   does not need the loss to be scaled
+MIXED_PRECISION_POLICY = "mixed_bfloat16"
+# the largest number of samples a Network keeps from the Networks sharing samples with it, before it trains on them
+SHARED_SAMPLE_LIMIT = 64
+# the number of transitions sampled from a PrioritizedReplay each time a Network using one trains
+REPLAY_BATCH_SIZE = 32
 
 # the reward given when an action cannot be taken
 Q_REWARD_INVALID_ACTION = -.1
@@ -0,0 +1,52 @@
+import importlib
+
+
+class LazyModule:
+    """
+    A stand in for a module which is only imported the first time one of its attributes is used.
+    Used for TensorFlow and Pygame, which take seconds to import, so that code which never uses them starts quickly
+    """
+
+    def __init__(self, name, attribute=None):
+        """
+        Create a LazyModule, without importing anything
+        :param name: The full name of the module to import, i.e. "tensorflow"
+        :param attribute: The name of an attribute of the module to use instead of the module, i.e. "keras" for
+            "from tensorflow import keras", or None to use the module, default None
+        """
+        self.__dict__["lazyName"] = name
+        self.__dict__["lazyAttribute"] = attribute
+        self.__dict__["lazyModule"] = None
+
+    def load(self):
+        """
+        Import the module, if it has not been imported
+        :return: The module
+        """
+        module = self.__dict__["lazyModule"]
+        if module is None:
+            module = importlib.import_module(self.lazyName)
+            if self.lazyAttribute is not None:
+                module = getattr(module, self.lazyAttribute)
+            self.__dict__["lazyModule"] = module
+        return module
+
+    def loaded(self):
+        """
+        Determine if the module has been imported
+        :return: True if it has, False otherwise
+        """
+        return self.__dict__["lazyModule"] is not None
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.load(), name, value)
+
+    def __dir__(self):
+        return dir(self.load())
+
+    def __repr__(self):
+        name = self.lazyName if self.lazyAttribute is None else self.lazyName + "." + self.lazyAttribute
+        return "<LazyModule " + name + (" (loaded)>" if self.loaded() else ">")
@@ -0,0 +1,273 @@
+import numpy as np
+
+from Constants import *
+
+import abc
+
+# constants for inference backends
+# the number of different batch sizes a NumpyBackend keeps buffers for, all buffers are dropped when there are more
+BACKEND_MAX_BUFFERS = 8
+# the precisions a QuantizedBackend can store weights in
+QUANTIZE_INT8 = "int8"
+QUANTIZE_FLOAT16 = "float16"
+# the largest magnitude of an int8 weight, the same on both sides so that 0 is exact
+QUANTIZE_INT8_MAX = 127
+
+
+class Backend:
+    """
+    A generic object for finding the outputs of the neural network of a Network
+    """
+    __metaclass__ = abc.ABCMeta
+
+    @abc.abstractmethod
+    def predict(self, inputs):
+        """
+        Find the outputs of the network for a batch of inputs
+        :param inputs: A numpy array of inputs, the first dimension is the number of inputs
+        :return: A numpy array of the outputs, in the same shape as the outputs of the Keras model
+        """
+        return np.zeros((0,))
+
+    def invalidate(self):
+        """
+        Called when the weights of the network have changed, i.e. from training, or loading
+        """
+        pass
+
+
+class KerasBackend(Backend):
+    """
+    A Backend which calls the Keras model of a Network directly
+    """
+
+    def __init__(self, network):
+        """
+        Create a KerasBackend
+        :param network: The Network whose model is used
+        """
+        self.network = network
+
+    def predict(self, inputs):
+        return np.array(self.network.net(inputs))
+
+
+class NumpyBackend(Backend):
+    """
+    A Backend which copies the weights out of the Keras model of a Network, and runs the network with numpy.
+    Every layer except the last uses sigmoid activation, and the last layer is linear, the same as Network and
+        ConvNetwork. The arrays for every layer are kept between calls, for each batch size,
+        so a call only allocates the array it returns.
+    The weights are copied again the first time it is used after the Network is trained, so it is best used for
+        Networks which only play
+    """
+
+    def __init__(self, network=None):
+        """
+        Create a NumpyBackend
+        :param network: The Network to copy weights from, or None to only use weights given to load, default None
+        """
+        self.network = network
+
+        # a list of 3-tuples (kernel, bias, convolution), where convolution is None for a Dense layer, or the
+        #   2-tuple (height, width) of the kernel of a Conv2D layer, None if the weights have not been copied
+        self.layers = None
+        # a dictionary mapping the shape of inputs to a list of the buffers used for those inputs
+        self.buffers = {}
+
+    def invalidate(self):
+        if self.network is not None:
+            self.layers = None
+            self.buffers.clear()
+
+    def load(self, weights):
+        """
+        Set the weights used by this NumpyBackend
+        :param weights: A list of numpy arrays, the kernel, then bias, of each layer, in the same form as
+            the Keras get_weights method
+        """
+        self.layers = []
+        for kernel, bias in zip(weights[::2], weights[1::2]):
+            kernel, convolution = flattenKernel(np.asarray(kernel, dtype=np.float32))
+            self.layers.append((kernel, np.asarray(bias, dtype=np.float32), convolution))
+        self.buffers.clear()
+
+    def predict(self, inputs):
+        if self.layers is None:
+            self.load(self.network.net.get_weights())
+
+        inputs = np.asarray(inputs)
+        buffers = self.buffers.get(inputs.shape)
+        if buffers is None:
+            if len(self.buffers) >= BACKEND_MAX_BUFFERS:
+                self.buffers.clear()
+            buffers = self.makeBuffers(inputs.shape)
+            self.buffers[inputs.shape] = buffers
+
+        x = buffers[0]
+        np.copyto(x, inputs, casting="unsafe")
+        for i, ((windows, out), (kernel, bias, convolution)) in enumerate(zip(buffers[1:], self.layers)):
+            kernel = self.kernel(i)
+            if convolution is None:
+                np.matmul(x, kernel, out=out)
+            else:
+                # copy every window of the input into one row each, then multiply them all by the kernel at once
+                np.copyto(windows, np.lib.stride_tricks.sliding_window_view(x, convolution, axis=(1, 2)))
+                np.matmul(windows.reshape((-1, kernel.shape[0])), kernel, out=out.reshape((-1, kernel.shape[1])))
+            out += bias
+
+            # sigmoid, in place, on every layer except the last
+            if i < len(self.layers) - 1:
+                np.negative(out, out=out)
+                np.exp(out, out=out)
+                out += 1
+                np.reciprocal(out, out=out)
+            x = out
+
+        return x.copy()
+
+    def kernel(self, i):
+        """
+        Helper method for predict. Get the kernel of a layer, as a 2D float32 array
+        :param i: The index of the layer
+        :return: The kernel
+        """
+        return self.layers[i][0]
+
+    def weightBytes(self):
+        """
+        Get the memory used by the weights of this NumpyBackend
+        :return: The number of bytes
+        """
+        return sum(a.nbytes for layer in self.layers for a in layer[:-1])
+
+    def makeBuffers(self, shape):
+        """
+        Helper method for predict. Create the arrays used by every layer for inputs of one shape
+        :param shape: The shape of the inputs
+        :return: A list, starting with the array for the inputs, then a 2-tuple (windows, outputs) for each layer,
+            where windows is None for a Dense layer
+        """
+        shape = tuple(shape)
+        buffers = [np.empty(shape, dtype=np.float32)]
+        for kernel, bias, convolution in self.layers:
+            if convolution is None:
+                windows = None
+                shape = shape[:-1] + (kernel.shape[1],)
+            else:
+                height, width = convolution
+                shape = (shape[0], shape[1] - height + 1, shape[2] - width + 1, shape[3])
+                windows = np.empty(shape + convolution, dtype=np.float32)
+                shape = shape[:3] + (kernel.shape[1],)
+            buffers.append((windows, np.empty(shape, dtype=np.float32)))
+        return buffers
+
+
+class QuantizedBackend(NumpyBackend):
+    """
+    A NumpyBackend which stores the kernel of each layer in int8 or float16, to use less memory.
+    An int8 kernel has a scale for each output, so the largest weight of each output is stored exactly.
+    Each kernel is converted back to float32 into one shared array when it is used, because numpy only multiplies
+        int8 and float16 arrays quickly once they are float32. Biases are always float32
+    """
+
+    def __init__(self, network=None, precision=QUANTIZE_INT8):
+        """
+        Create a QuantizedBackend
+        :param network: The Network to copy weights from, or None to only use weights given to load or
+            loadQuantized, default None
+        :param precision: The precision to store weights in, QUANTIZE_INT8 or QUANTIZE_FLOAT16, default QUANTIZE_INT8
+        """
+        super().__init__(network)
+        self.precision = precision
+        # the scale of each output of the kernel of each layer, all 1 for float16
+        self.scales = []
+        # the array each kernel is converted into when it is used, large enough for the largest kernel
+        self.scratch = None
+
+    def load(self, weights):
+        self.loadQuantized(quantizeWeights(weights, self.precision))
+
+    def loadQuantized(self, arrays):
+        """
+        Set the weights used by this QuantizedBackend, from weights which are already quantized
+        :param arrays: The list of numpy arrays from quantizeWeights
+        """
+        self.layers = []
+        for kernel, bias in zip(arrays[::3], arrays[2::3]):
+            kernel, convolution = flattenKernel(np.asarray(kernel))
+            self.layers.append((kernel, np.asarray(bias, dtype=np.float32), convolution))
+        self.scales = [np.asarray(s, dtype=np.float32) for s in arrays[1::3]]
+        self.scratch = np.empty(max(k.size for k, b, c in self.layers), dtype=np.float32)
+        self.buffers.clear()
+
+    def kernel(self, i):
+        quantized = self.layers[i][0]
+        kernel = self.scratch[:quantized.size].reshape(quantized.shape)
+        np.multiply(quantized, self.scales[i], out=kernel)
+        return kernel
+
+    def weightBytes(self):
+        return super().weightBytes() + sum(s.nbytes for s in self.scales)
+
+
+def flattenKernel(kernel):
+    """
+    Convert the kernel of a Keras layer to the 2D array multiplied by the inputs of a NumpyBackend
+    :param kernel: The numpy array of the kernel, 2D for a Dense layer, 4D for a Conv2D layer
+    :return: A 2-tuple (kernel, convolution), the 2D kernel, of the same type, and None for a Dense layer,
+        or the 2-tuple (height, width) of the kernel of a Conv2D layer
+    """
+    if kernel.ndim == 4:
+        # a Conv2D kernel is indexed by [row, column, input channel, output channel], so reorder it to
+        #   multiply the windows of the input, which are indexed by [input channel, row, column]
+        height, width, inChannels, outChannels = kernel.shape
+        return np.ascontiguousarray(kernel.transpose((2, 0, 1, 3)).reshape((-1, outChannels))), (height, width)
+    return np.ascontiguousarray(kernel), None
+
+
+def quantizeWeights(weights, precision):
+    """
+    Convert the weights of a network to a lower precision
+    :param weights: A list of numpy arrays, the kernel, then bias, of each layer, in the same form as
+        the Keras get_weights method
+    :param precision: QUANTIZE_INT8 or QUANTIZE_FLOAT16
+    :return: A list of numpy arrays, the quantized kernel, the float32 scale of each output of the kernel,
+        then the float32 bias, of each layer
+    """
+    arrays = []
+    for kernel, bias in zip(weights[::2], weights[1::2]):
+        kernel = np.asarray(kernel, dtype=np.float32)
+        if precision == QUANTIZE_INT8:
+            # the scale of each output is found from the largest weight of that output
+            largest = np.abs(kernel.reshape((-1, kernel.shape[-1]))).max(axis=0)
+            scale = np.where(largest > 0, largest / QUANTIZE_INT8_MAX, 1).astype(np.float32)
+            quantized = np.clip(np.rint(kernel / scale), -QUANTIZE_INT8_MAX, QUANTIZE_INT8_MAX).astype(np.int8)
+        elif precision == QUANTIZE_FLOAT16:
+            scale = np.ones(kernel.shape[-1], dtype=np.float32)
+            quantized = kernel.astype(np.float16)
+        else:
+            raise ValueError("Unknown precision " + str(precision))
+        arrays.extend([quantized, scale, np.asarray(bias, dtype=np.float32)])
+    return arrays
+
+
+def compareBackends(reference, backend, inputs):
+    """
+    Find how closely the outputs of a Backend match the outputs of another
+    :param reference: The Backend with the expected outputs, i.e. a NumpyBackend
+    :param backend: The Backend to check, i.e. a QuantizedBackend
+    :param inputs: A numpy array of inputs to compare the outputs of
+    :return: A dictionary with the keys,
+        "agreement": the fraction of inputs where both Backends have the same action with the highest output
+        "max error": the largest difference between an output of both Backends
+        "mean error": the mean difference between the outputs of both Backends
+    """
+    expected = reference.predict(inputs).reshape((len(inputs), -1))
+    outputs = backend.predict(inputs).reshape((len(inputs), -1))
+    errors = np.abs(outputs - expected)
+    return {
+        "agreement": float(np.mean(np.argmax(outputs, axis=1) == np.argmax(expected, axis=1))),
+        "max error": float(errors.max()),
+        "mean error": float(errors.mean())
+    }
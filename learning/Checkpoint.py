@@ -0,0 +1,451 @@
+import numpy as np
+
+from Constants import *
+from learning.Backend import *
+
+import json
+import os
+import os.path as path
+import threading
+import time
+
+# constants for saving Networks to checkpoints
+# the version of the checkpoint format, stored in every manifest
+CHECKPOINT_VERSION = 1
+# the extension of the file holding the arrays of a checkpoint
+CHECKPOINT_WEIGHTS_EXTENSION = ".weights"
+# the extension of the manifest file describing a checkpoint
+CHECKPOINT_MANIFEST_EXTENSION = ".json"
+# the number of bytes each array in the weights file is aligned to
+CHECKPOINT_ALIGNMENT = 64
+# the extension added to files while they are being written, they are renamed once they are complete
+CHECKPOINT_TEMP_EXTENSION = ".tmp"
+# the number of digits of the number added to the name of each periodic checkpoint
+CHECKPOINT_INDEX_DIGITS = 6
+# the number of periodic checkpoints kept, older ones are deleted
+CHECKPOINT_KEEP = 3
+# the attributes of a Network which are stored in a checkpoint, and set again when it is loaded
+CHECKPOINT_RATES = ["learnRate", "discountRate", "explorationRate",
+                    "learnDecay", "discountDecay", "explorationDecay",
+                    "optimizerRate", "optimizerRateDecay"]
+
+
+def networkSnapshot(network):
+    """
+    Copy everything needed to save a Network into memory, so that it can be written to a checkpoint later,
+        even while the Network keeps training
+    :param network: The Network
+    :return: A dictionary with the keys,
+        "config": the dictionary from Network.getConfig
+        "rates": a dictionary of the value of each attribute in CHECKPOINT_RATES
+        "weights": a list of numpy arrays of the weights of the network
+        "optimizer": a list of numpy arrays of the state of the optimizer
+    """
+    return {
+        "config": network.getConfig(),
+        "rates": {r: float(getattr(network, r)) for r in CHECKPOINT_RATES},
+        "weights": [np.array(w) for w in network.net.get_weights()],
+        "optimizer": [np.array(v) for v in optimizerVariables(network.net.optimizer)]
+    }
+
+
+def quantizedSnapshot(snapshot, precision):
+    """
+    Convert a snapshot of a Network to one with quantized weights, which can only be used for inference,
+        with a QuantizedBackend
+    :param snapshot: The snapshot, from networkSnapshot
+    :param precision: QUANTIZE_INT8 or QUANTIZE_FLOAT16
+    :return: The new snapshot, the config has the precision added, and there is no optimizer state
+    """
+    config = dict(snapshot["config"])
+    config["precision"] = precision
+    return {
+        "config": config,
+        "rates": dict(snapshot["rates"]),
+        "weights": quantizeWeights(snapshot["weights"], precision),
+        "optimizer": []
+    }
+
+
+def writeCheckpoint(snapshots, fileName):
+    """
+    Write snapshots of Networks to one checkpoint, made of a file with the raw data of every array,
+        and a JSON manifest describing the arrays.
+    Each file is written under a temporary name, and renamed when it is complete, so a crash while writing never
+        leaves a partly written file in place of an old one. Each time a checkpoint is written again, its weights go
+        to a new file, numbered by the revision of the manifest, and the manifest is renamed last, so the manifest
+        always describes the weights file next to it. The weights file of the old manifest is then deleted
+    :param snapshots: A dictionary mapping a name for each Network to its snapshot from networkSnapshot
+    :param fileName: The name of the checkpoint, relative to Constants.NETWORK_SAVES, without an extension
+    """
+    fileName = path.join(NETWORK_SAVES, fileName)
+    directory = path.dirname(fileName)
+    if not path.isdir(directory):
+        os.makedirs(directory)
+
+    old = readManifest(fileName)
+    revision = 0 if old is None else old.get("revision", -1) + 1
+    manifest = {"version": CHECKPOINT_VERSION,
+                "revision": revision,
+                "weights": path.basename(fileName) + "." + str(revision) + CHECKPOINT_WEIGHTS_EXTENSION,
+                "networks": {}}
+
+    weightsFile = path.join(directory, manifest["weights"])
+    with open(weightsFile + CHECKPOINT_TEMP_EXTENSION, "wb") as f:
+        offset = 0
+
+        def writeArrays(arrays):
+            # write each array, in little endian order, aligned to the start of a block, and describe it
+            nonlocal offset
+            described = []
+            for a in arrays:
+                a = np.array(a, dtype=a.dtype.newbyteorder("<"), order="C")
+                padding = -offset % CHECKPOINT_ALIGNMENT
+                f.write(b"\0" * padding)
+                offset += padding
+                described.append({"offset": offset, "dtype": a.dtype.str, "shape": list(a.shape)})
+                f.write(a.tobytes())
+                offset += a.nbytes
+            return described
+
+        for name, snapshot in snapshots.items():
+            manifest["networks"][name] = {
+                "config": snapshot["config"],
+                "rates": snapshot["rates"],
+                "weights": writeArrays(snapshot["weights"]),
+                "optimizer": writeArrays(snapshot["optimizer"])
+            }
+
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(weightsFile + CHECKPOINT_TEMP_EXTENSION, weightsFile)
+
+    manifestFile = fileName + CHECKPOINT_MANIFEST_EXTENSION
+    with open(manifestFile + CHECKPOINT_TEMP_EXTENSION, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(manifestFile + CHECKPOINT_TEMP_EXTENSION, manifestFile)
+
+    # the old weights are only removed once nothing refers to them
+    if old is not None and "weights" in old and not old["weights"] == manifest["weights"]:
+        try:
+            os.remove(path.join(directory, old["weights"]))
+        except OSError:
+            pass
+
+
+def readManifest(fileName):
+    """
+    Read the manifest of a checkpoint, without reading its weights
+    :param fileName: The name of the checkpoint, including Constants.NETWORK_SAVES, without an extension
+    :return: The dictionary from the manifest, or None if it could not be read
+    """
+    try:
+        with open(fileName + CHECKPOINT_MANIFEST_EXTENSION, "r") as f:
+            manifest = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    return manifest if isinstance(manifest, dict) else None
+
+
+def readCheckpoint(fileName):
+    """
+    Read a checkpoint written by writeCheckpoint. The arrays are memory mapped from the weights file,
+        rather than read into memory
+    :param fileName: The name of the checkpoint, relative to Constants.NETWORK_SAVES, without an extension
+    :return: A dictionary mapping the name of each Network to a snapshot, in the same form as networkSnapshot,
+        or None if the checkpoint does not exist, or is from a different version
+    """
+    fileName = path.join(NETWORK_SAVES, fileName)
+    manifest = readManifest(fileName)
+    if manifest is None or not manifest.get("version") == CHECKPOINT_VERSION:
+        return None
+
+    try:
+        weightsFile = path.join(path.dirname(fileName), manifest["weights"])
+        data = np.memmap(weightsFile, dtype=np.uint8, mode="r") if path.getsize(weightsFile) > 0 else None
+    except (IOError, OSError, ValueError, KeyError):
+        return None
+
+    def readArrays(described):
+        return [data[d["offset"]:d["offset"] + int(np.prod(d["shape"])) * np.dtype(d["dtype"]).itemsize]
+                .view(d["dtype"]).reshape(d["shape"]) for d in described]
+
+    return {name: {"config": n["config"],
+                   "rates": n["rates"],
+                   "weights": readArrays(n["weights"]),
+                   "optimizer": readArrays(n["optimizer"])}
+            for name, n in manifest["networks"].items()}
+
+
+def snapshotBackend(snapshot):
+    """
+    Create a Backend which finds outputs with the weights of a snapshot, without a Network or Keras model
+    :param snapshot: The snapshot, in the same form as networkSnapshot, or quantizedSnapshot
+    :return: A QuantizedBackend if the snapshot is quantized, otherwise a NumpyBackend
+    """
+    precision = snapshot["config"].get("precision")
+    if precision is None:
+        backend = NumpyBackend()
+        backend.load(snapshot["weights"])
+    else:
+        backend = QuantizedBackend(precision=precision)
+        backend.loadQuantized(snapshot["weights"])
+    return backend
+
+
+def checkpointBackends(fileName):
+    """
+    Read the weights of every Network in a checkpoint into Backends, only for finding outputs
+    :param fileName: The name of the checkpoint, relative to Constants.NETWORK_SAVES, without an extension
+    :return: A dictionary mapping the name of each Network to its Backend, from snapshotBackend,
+        or None if the checkpoint could not be read
+    """
+    snapshots = readCheckpoint(fileName)
+    if snapshots is None:
+        return None
+    return {name: snapshotBackend(snapshot) for name, snapshot in snapshots.items()}
+
+
+def restoreNetwork(network, snapshot):
+    """
+    Set a Network to the state in a snapshot. If the snapshot has different inner layers,
+        the Network is rebuilt with those layers first
+    :param network: The Network
+    :param snapshot: The snapshot, from networkSnapshot or readCheckpoint
+    :return: True if the Network was restored, False if the snapshot is for a different kind of Network,
+        a different number of inputs or outputs, or has quantized weights
+    """
+    config = snapshot["config"]
+    current = network.getConfig()
+    # quantized weights can't be put back in a Keras model
+    if "precision" in config:
+        return False
+    if any(not config.get(k) == v for k, v in current.items() if not k == "inner"):
+        return False
+
+    # rebuild the network if the layers are different
+    if not list(config["inner"]) == list(current["inner"]):
+        network.inner = list(config["inner"])
+        network.initNetwork()
+
+    network.net.set_weights(snapshot["weights"])
+
+    for r, value in snapshot["rates"].items():
+        setattr(network, r, value)
+    network.updateOptimizerRate(network.optimizerRate)
+
+    # the optimizer only creates its variables when it is first used, so build them before setting them
+    arrays = snapshot["optimizer"]
+    optimizer = network.net.optimizer
+    variables = optimizerVariables(optimizer)
+    if not len(variables) == len(arrays) and hasattr(optimizer, "build"):
+        optimizer.build(network.net.trainable_variables)
+        variables = optimizerVariables(optimizer)
+    if len(variables) == len(arrays):
+        for v, a in zip(variables, arrays):
+            v.assign(np.asarray(a))
+
+    network.backend.invalidate()
+    return True
+
+
+def optimizerVariables(optimizer):
+    """
+    Get the variables of a Keras optimizer, which are a list in newer versions of Keras, and a method in older ones
+    :param optimizer: The optimizer
+    :return: The list of variables
+    """
+    variables = optimizer.variables
+    return variables() if callable(variables) else variables
+
+
+def checkpointIndexes(fileName):
+    """
+    Find the numbers of the periodic checkpoints which exist for a name, written by a Checkpointer
+    :param fileName: The name of the checkpoints, relative to Constants.NETWORK_SAVES, without a number or extension
+    :return: A sorted list of the numbers
+    """
+    fileName = path.join(NETWORK_SAVES, fileName)
+    directory = path.dirname(fileName)
+    prefix = path.basename(fileName) + " "
+    if not path.isdir(directory):
+        return []
+
+    indexes = []
+    for f in os.listdir(directory):
+        if f.startswith(prefix) and f.endswith(CHECKPOINT_MANIFEST_EXTENSION):
+            number = f[len(prefix):-len(CHECKPOINT_MANIFEST_EXTENSION)]
+            if number.isdigit():
+                indexes.append(int(number))
+    return sorted(indexes)
+
+
+def periodicCheckpointName(fileName, index):
+    """
+    Get the name of one periodic checkpoint written by a Checkpointer
+    :param fileName: The name of the checkpoints, without a number or extension
+    :param index: The number of the checkpoint
+    :return: The name, which can be given to readCheckpoint
+    """
+    return fileName + " " + str(index).zfill(CHECKPOINT_INDEX_DIGITS)
+
+
+def latestCheckpoint(fileName):
+    """
+    Get the name of the newest periodic checkpoint for a name
+    :param fileName: The name of the checkpoints, relative to Constants.NETWORK_SAVES, without a number or extension
+    :return: The name of the checkpoint, which can be given to readCheckpoint, or None if there are none
+    """
+    indexes = checkpointIndexes(fileName)
+    return None if len(indexes) == 0 else periodicCheckpointName(fileName, indexes[-1])
+
+
+def removeCheckpoint(fileName):
+    """
+    Delete a checkpoint written by writeCheckpoint, if it exists
+    :param fileName: The name of the checkpoint, relative to Constants.NETWORK_SAVES, without an extension
+    """
+    fileName = path.join(NETWORK_SAVES, fileName)
+    files = [fileName + CHECKPOINT_MANIFEST_EXTENSION]
+    manifest = readManifest(fileName)
+    if manifest is not None and "weights" in manifest:
+        files.append(path.join(path.dirname(fileName), manifest["weights"]))
+
+    # remove the manifest first, so a checkpoint is never found without its weights
+    for f in files:
+        try:
+            os.remove(f)
+        except OSError:
+            pass
+
+
+class Checkpointer:
+    """
+    An object which writes numbered checkpoints in the background, every number of games, or number of minutes.
+    Snapshots are taken in memory by the training thread, then written by a separate thread, so training only waits
+        for the copy, not for the disk. If a snapshot is still waiting to be written when another is taken,
+        only the newest is kept
+    """
+
+    def __init__(self, fileName, everyGames=None, everyMinutes=None, keep=CHECKPOINT_KEEP):
+        """
+        Create a Checkpointer
+        :param fileName: The name of the checkpoints, relative to Constants.NETWORK_SAVES, each checkpoint has a number
+            added to the end of this name
+        :param everyGames: The number of games between checkpoints, None to not count games, default None
+        :param everyMinutes: The number of minutes between checkpoints, None to not count time, default None
+        :param keep: The number of checkpoints to keep, default CHECKPOINT_KEEP
+        """
+        self.fileName = fileName
+        self.everyGames = everyGames
+        self.everyMinutes = everyMinutes
+        self.keep = keep
+
+        # the number of the next checkpoint, continuing from checkpoints of an earlier run
+        indexes = checkpointIndexes(fileName)
+        self.nextIndex = indexes[-1] + 1 if len(indexes) > 0 else 0
+
+        self.games = 0
+        self.lastTime = time.time()
+
+        # the 2-tuple (index, snapshots) waiting to be written, and True while the thread is writing one
+        self.pending = None
+        self.writing = False
+        self.closing = False
+        # the last exception raised while writing, or None if every write worked
+        self.error = None
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def due(self):
+        """
+        Determine if it is time for another checkpoint
+        :return: True if a checkpoint should be taken, False otherwise
+        """
+        if self.everyGames is not None and self.games >= self.everyGames:
+            return True
+        return self.everyMinutes is not None and time.time() - self.lastTime >= self.everyMinutes * 60
+
+    def gameFinished(self, snapshot):
+        """
+        Count a finished game, and take a checkpoint if one is due
+        :param snapshot: A function which returns the snapshots to write, only called if a checkpoint is due
+        :return: True if a checkpoint was taken, False otherwise
+        """
+        self.games += 1
+        if not self.due():
+            return False
+        self.save(snapshot())
+        return True
+
+    def save(self, snapshots):
+        """
+        Give snapshots to the background thread to be written as the next checkpoint, without waiting for them
+        :param snapshots: The dictionary of snapshots, in the same form given to writeCheckpoint
+        """
+        self.games = 0
+        self.lastTime = time.time()
+
+        with self.condition:
+            self.pending = (self.nextIndex, snapshots)
+            self.nextIndex += 1
+            self.condition.notify_all()
+
+            if self.thread is None:
+                self.closing = False
+                self.thread = threading.Thread(target=self.writeLoop, daemon=True)
+                self.thread.start()
+
+    def writeLoop(self):
+        """
+        Helper method for save. Write each checkpoint given to the background thread, until the Checkpointer is closed
+        """
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closing:
+                    self.condition.wait()
+                if self.pending is None:
+                    return
+                (index, snapshots), self.pending = self.pending, None
+                self.writing = True
+
+            # any error is kept instead of stopping the thread, and the write is always finished,
+            #   so wait and close never block on a write which failed
+            try:
+                writeCheckpoint(snapshots, periodicCheckpointName(self.fileName, index))
+                self.rotate()
+            except Exception as e:
+                self.error = e
+            finally:
+                with self.condition:
+                    self.writing = False
+                    self.condition.notify_all()
+
+    def rotate(self):
+        """
+        Helper method for writeLoop. Delete the oldest checkpoints, so only the newest are kept
+        """
+        indexes = checkpointIndexes(self.fileName)
+        for index in indexes[:max(0, len(indexes) - self.keep)]:
+            removeCheckpoint(periodicCheckpointName(self.fileName, index))
+
+    def wait(self):
+        """
+        Wait until every checkpoint given to the background thread is written
+        """
+        with self.condition:
+            while self.pending is not None or self.writing:
+                self.condition.wait()
+
+    def close(self):
+        """
+        Write any waiting checkpoint, then stop the background thread
+        """
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            thread.join()
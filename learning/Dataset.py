@@ -0,0 +1,181 @@
+import numpy as np
+
+from Constants import *
+
+import os
+import os.path as path
+
+# constants for streaming training data
+# the extension of each shard of a dataset
+DATASET_SHARD_EXTENSION = ".npz"
+# the number of digits of the number in the name of each shard
+DATASET_SHARD_DIGITS = 6
+# the number of samples in each shard written by a ShardWriter
+DATASET_SHARD_SIZE = 4096
+# the number of samples shuffled together, on top of reading the shards in a random order
+DATASET_SHUFFLE_BUFFER = 8192
+# the number of shards read at the same time
+DATASET_PARALLEL_SHARDS = 4
+
+
+def encodeInputs(inputs):
+    """
+    Encode the inputs of a network to store them compactly, one bit for each value
+    :param inputs: A numpy array of inputs, the first dimension is the number of inputs, every value must be 0 or 1
+    :return: A 2D uint8 numpy array, with one row for each input
+    """
+    inputs = np.asarray(inputs)
+    return np.packbits(inputs.reshape((len(inputs), -1)) > 0.5, axis=1)
+
+
+def decodeInputs(encoded, inputShape):
+    """
+    Decode inputs from encodeInputs, with TensorFlow operations, so that it can run in parallel in a tf.data pipeline
+    :param encoded: A uint8 tensor of encoded inputs, with one row for each input
+    :param inputShape: The shape of one input, not including the number of inputs
+    :return: A float32 tensor of the inputs, with the shape (number of inputs,) + inputShape
+    """
+    size = int(np.prod(inputShape))
+    # the bits of each byte, the highest bit first, the same order as np.packbits
+    shifts = tf.constant([7, 6, 5, 4, 3, 2, 1, 0], dtype=tf.uint8)
+    bits = tf.bitwise.bitwise_and(tf.bitwise.right_shift(encoded[:, :, tf.newaxis], shifts), 1)
+    bits = tf.reshape(bits, (tf.shape(encoded)[0], -1))[:, :size]
+    return tf.reshape(tf.cast(bits, tf.float32), (-1,) + tuple(inputShape))
+
+
+class ShardWriter:
+    """
+    An object for writing training samples to shards on disk, so a dataset larger than memory can be streamed with
+        shardDataset. Inputs are stored with encodeInputs, and outputs are stored as float32
+    """
+
+    def __init__(self, directory, shardSize=DATASET_SHARD_SIZE):
+        """
+        Create a ShardWriter
+        :param directory: The folder to write shards to, relative to Constants.NETWORK_SAVES. Shards already in the
+            folder are kept, and new shards are numbered after them
+        :param shardSize: The number of samples in each shard, default DATASET_SHARD_SIZE
+        """
+        self.directory = path.join(NETWORK_SAVES, directory)
+        self.shardSize = shardSize
+        if not path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self.nextIndex = len(shardFiles(directory))
+
+        # the samples which have not been written yet
+        self.inputs = []
+        self.outputs = []
+        self.inputShape = None
+
+    def add(self, inputs, outputs):
+        """
+        Add samples, writing a shard each time there are enough samples
+        :param inputs: A numpy array of inputs, the first dimension is the number of samples, every value must be
+            0 or 1
+        :param outputs: A numpy array of the expected outputs, the first dimension is the number of samples
+        """
+        inputs = np.asarray(inputs)
+        self.inputShape = inputs.shape[1:]
+        self.inputs.extend(encodeInputs(inputs))
+        self.outputs.extend(np.asarray(outputs, dtype=np.float32))
+        while len(self.inputs) >= self.shardSize:
+            self.writeShard(self.shardSize)
+
+    def close(self):
+        """
+        Write every sample which has not been written yet
+        """
+        if len(self.inputs) > 0:
+            self.writeShard(len(self.inputs))
+
+    def writeShard(self, count):
+        """
+        Helper method for add and close. Write the oldest samples to a new shard
+        :param count: The number of samples to write
+        """
+        fileName = path.join(self.directory, str(self.nextIndex).zfill(DATASET_SHARD_DIGITS))
+        np.savez(fileName + DATASET_SHARD_EXTENSION, inputs=np.array(self.inputs[:count]),
+                 outputs=np.array(self.outputs[:count]), inputShape=np.array(self.inputShape, dtype=np.int64))
+        self.nextIndex += 1
+        del self.inputs[:count]
+        del self.outputs[:count]
+
+
+def shardFiles(directory):
+    """
+    Find the shards in a folder
+    :param directory: The folder, relative to Constants.NETWORK_SAVES
+    :return: A sorted list of the full file names of the shards
+    """
+    directory = path.join(NETWORK_SAVES, directory)
+    if not path.isdir(directory):
+        return []
+    return sorted(path.join(directory, f) for f in os.listdir(directory) if f.endswith(DATASET_SHARD_EXTENSION))
+
+
+def readShard(fileName):
+    """
+    Helper function for shardDataset. Read the encoded inputs and outputs of one shard
+    :param fileName: The full file name of the shard, as bytes or a string
+    :return: A generator yielding one 2-tuple (encoded inputs, outputs) with every sample of the shard
+    """
+    with np.load(fileName.decode() if isinstance(fileName, bytes) else fileName) as shard:
+        yield shard["inputs"], shard["outputs"]
+
+
+def shardDataset(directory, batchSize=TRAIN_BATCH_SIZE, shuffle=True, seed=None):
+    """
+    Create a tf.data pipeline which streams the samples written by a ShardWriter.
+    Shards are read in parallel, in a random order, then the samples are shuffled, decoded in parallel, batched,
+        and prefetched, so only a few shards are in memory at once
+    :param directory: The folder of the shards, relative to Constants.NETWORK_SAVES
+    :param batchSize: The number of samples in each batch, default TRAIN_BATCH_SIZE
+    :param shuffle: True to shuffle the samples each time the dataset is iterated, False to read one shard at a time,
+        keeping the samples in order, default True
+    :param seed: The seed for shuffling, or None to use a random seed, default None
+    :return: The tf.data.Dataset of 2-tuples (inputs, outputs) of float32 batches, which can be given to
+        Network.trainDataset
+    """
+    files = shardFiles(directory)
+    if len(files) == 0:
+        raise ValueError("No shards in " + path.join(NETWORK_SAVES, directory))
+
+    with np.load(files[0]) as shard:
+        inputShape = tuple(int(s) for s in shard["inputShape"])
+        encodedSize = shard["inputs"].shape[1]
+        outputShape = shard["outputs"].shape[1:]
+
+    signature = (tf.TensorSpec((None, encodedSize), tf.uint8), tf.TensorSpec((None,) + outputShape, tf.float32))
+    dataset = tf.data.Dataset.from_tensor_slices(files)
+    if shuffle:
+        dataset = dataset.shuffle(len(files), seed=seed)
+    dataset = dataset.interleave(
+        lambda f: tf.data.Dataset.from_generator(readShard, output_signature=signature, args=(f,)).unbatch(),
+        cycle_length=DATASET_PARALLEL_SHARDS if shuffle else 1, num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=not shuffle)
+    if shuffle:
+        dataset = dataset.shuffle(DATASET_SHUFFLE_BUFFER, seed=seed)
+
+    # decode whole batches at once, which is much faster than decoding each sample
+    dataset = dataset.batch(batchSize)
+    dataset = dataset.map(lambda i, o: (decodeInputs(i, inputShape), o), num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def generatorDataset(generator, inputShape, outputShape, batchSize=TRAIN_BATCH_SIZE, shuffle=True, seed=None):
+    """
+    Create a tf.data pipeline which streams samples from a generator, i.e. positions from games as they are played
+    :param generator: A function with no parameters, returning an iterable of 2-tuples (input, output) of numpy
+        arrays for one sample each, it is called again each time the dataset is iterated
+    :param inputShape: The shape of one input
+    :param outputShape: The shape of one output
+    :param batchSize: The number of samples in each batch, default TRAIN_BATCH_SIZE
+    :param shuffle: True to shuffle the samples, False to keep them in order, default True
+    :param seed: The seed for shuffling, or None to use a random seed, default None
+    :return: The tf.data.Dataset of 2-tuples (inputs, outputs) of float32 batches
+    """
+    signature = (tf.TensorSpec(tuple(inputShape), tf.float32), tf.TensorSpec(tuple(outputShape), tf.float32))
+    dataset = tf.data.Dataset.from_generator(generator, output_signature=signature)
+    if shuffle:
+        dataset = dataset.shuffle(DATASET_SHUFFLE_BUFFER, seed=seed)
+    return dataset.batch(batchSize).prefetch(tf.data.AUTOTUNE)
@@ -1,15 +1,13 @@
 import numpy as np
 
 from Constants import *
-
-if USE_TENSOR_FLOW:
-    from tensorflow import keras
-    import tensorflow as tf
-
-    tf.CUDA_VISIBLE_DEVICES = 0, 1
+from learning.Backend import *
+from learning.Replay import *
 
 import random
 import abc
+import os.path as path
+from collections import OrderedDict
 
 
 class QModel:
@@ -46,6 +44,10 @@ class QModel:
         self.discountDecay = discountDecay
         self.explorationDecay = explorationDecay
 
+        # the source of random numbers for choosing actions, the random module, or a random.Random to keep the
+        #   choices separate from everything else using random numbers
+        self.rng = random
+
     def decayRates(self):
         """
         Apply decay to the learning rate, exploration rate, and discount rate
@@ -71,10 +73,10 @@ class QModel:
         if takeAction is None:
             # randomly choose to either pick the index of the action with the highest value,
             #   or a random new action, thus selecting the direction
-            if random.random() > self.explorationRate:
+            if self.rng.random() > self.explorationRate:
                 action = actions.index(max(actions))
             else:
-                action = random.randint(0, self.actions - 1)
+                action = self.rng.randint(0, self.actions - 1)
         else:
             # get a list of all the valid actions
             actions = chooseElements(actions, keep=takeAction)
@@ -82,12 +84,12 @@ class QModel:
                 return None
 
             # randomly choose to pick a random action, or the best available action
-            if random.random() > self.explorationRate:
+            if self.rng.random() > self.explorationRate:
                 # find the remaining action with the highest reward
                 action = chooseHighestFromTuple(actions)[0]
             else:
                 # randomly select an index of the remaining actions, then select the ID of that action
-                action = actions[random.randint(0, len(actions) - 1)][0]
+                action = actions[self.rng.randint(0, len(actions) - 1)][0]
 
         return action
 
@@ -98,7 +100,14 @@ class QModel:
         """
         a = [0] * self.actions
         a = chooseElements(a, self.environment.canTakeAction)
-        return None if a is None or len(a) == 0 else a[random.randint(0, len(a) - 1)][0]
+        return None if a is None or len(a) == 0 else a[self.rng.randint(0, len(a) - 1)][0]
+
+    def endEpisode(self):
+        """
+        Called at the end of each game, to train on anything from the game which has not been trained on yet.
+        By default there is nothing to train on
+        """
+        pass
 
     @abc.abstractmethod
     def getActions(self, s):
@@ -138,7 +147,8 @@ class Table(QModel):
     A Q model that learns based on a Q Table
     """
 
-    def __init__(self, actions, environment, learnRate=0.5, discountRate=0.5, explorationRate=0.5):
+    def __init__(self, actions, environment, learnRate=0.5, discountRate=0.5, explorationRate=0.5,
+                 dtype=np.float64, memmapFile=None):
         """
         Create a Q table that will keep track of all of the Q values for actions and states
         :param actions: The number of actions
@@ -146,17 +156,40 @@ class Table(QModel):
             and potential reward. This environment determines the number of states used by this table
         :param learnRate: The learning rate of the table
         :param discountRate: The discount rate of the table
+        :param dtype: The numpy data type used to store the Q values, default np.float64.
+            Use np.float32 or np.float16 for a more compact table
+        :param memmapFile: The path to a file used to store the table as a numpy memory map, or None to keep the
+            table in memory, default None. If the file already exists, the values in it are used, and must have
+            the same shape and dtype as this table, otherwise a new file is created with all zeros
         """
         super().__init__(environment.numStates(), actions, environment, learnRate, discountRate, explorationRate)
 
+        self.dtype = dtype
+        self.memmapFile = memmapFile
+
         self.qTable = None
-        self.reset()
+        if self.memmapFile is not None and path.isfile(self.memmapFile):
+            self.qTable = np.memmap(self.memmapFile, dtype=self.dtype, mode="r+", shape=(self.states, self.actions))
+        else:
+            self.reset()
 
     def reset(self):
         """
         Reset the QTable to all zeros
         """
-        self.qTable = np.zeros((self.states, self.actions))
+        if self.memmapFile is None:
+            self.qTable = np.zeros((self.states, self.actions), dtype=self.dtype)
+        elif self.qTable is None:
+            self.qTable = np.memmap(self.memmapFile, dtype=self.dtype, mode="w+", shape=(self.states, self.actions))
+        else:
+            self.qTable[:] = 0
+
+    def flush(self):
+        """
+        Write any changes to the QTable to its memory mapped file. Does nothing if the table is only in memory
+        """
+        if isinstance(self.qTable, np.memmap):
+            self.qTable.flush()
 
     def train(self, state, action, takeAction=None):
         """
@@ -182,8 +215,181 @@ class Table(QModel):
 
         return True
 
+    def trainBatch(self, states, actions, rewards, newStates, done=None):
+        """
+        Apply the bellman function to many entries of the QTable at once.
+        Unlike train, this does not take any actions in the environment, all of the transitions must be given.
+        If the same state and action pair appears more than once, it is updated once, using the average of the
+            expected Q values from each of them
+        :param states: A 1D array of the states before each action was taken
+        :param actions: A 1D array of the actions taken
+        :param rewards: A 1D array of the reward for taking each action
+        :param newStates: A 1D array of the states after each action was taken
+        :param done: A 1D array of booleans, True if the corresponding action ended the game,
+            so no future reward is used for it, or None if no actions ended the game, default None
+        """
+        states = np.asarray(states)
+        actions = np.asarray(actions)
+        rewards = np.asarray(rewards, dtype=np.float64)
+
+        # find the highest Q value of each new state, no future reward exists after the game ends
+        maxOutputs = self.qTable[np.asarray(newStates)].max(axis=1)
+        if done is not None:
+            maxOutputs = np.where(done, 0, maxOutputs)
+
+        # find the expected Q value for each action, averaged for each state and action pair
+        if SIMPLE_BELLMAN:
+            expected = rewards + maxOutputs * self.learnRate
+        else:
+            expected = rewards + self.discountRate * maxOutputs
+        flat = states * self.actions + actions
+        pairs, inverse = np.unique(flat, return_inverse=True)
+        expected = np.bincount(inverse, weights=expected) / np.bincount(inverse)
+        states, actions = pairs // self.actions, pairs % self.actions
+
+        # apply bellman function to update QTable
+        if SIMPLE_BELLMAN:
+            self.qTable[states, actions] = expected
+        else:
+            current = self.qTable[states, actions]
+            self.qTable[states, actions] = current + self.learnRate * (expected - current)
+
+    def chooseActions(self, states, valid=None):
+        """
+        Choose an action for many states at once, in the same way as chooseAction
+        :param states: A 1D numpy array of the states to choose actions for
+        :param valid: A 2D boolean numpy array indexed by [state index, action], True if that action can be taken
+            in the corresponding state, or None to allow all actions, default None
+        :return: A 1D numpy array of the chosen actions, -1 for each state where no action can be taken
+        """
+        values = self.qTable[states].astype(np.float64)
+        if valid is None:
+            valid = np.ones(values.shape, dtype=bool)
+        values[~valid] = -np.inf
+
+        # randomly pick between the highest valued action, or a random valid action
+        explore = np.random.random(len(states)) <= self.explorationRate
+        randomActions = np.argmax(np.random.random(values.shape) * valid, axis=1)
+        actions = np.where(explore, randomActions, np.argmax(values, axis=1))
+
+        return np.where(valid.any(axis=1), actions, -1)
+
+    def getActions(self, s):
+        return self.qTable[s].tolist()
+
+    def usesNetwork(self):
+        return False
+
+
+class HashTable(QModel):
+    """
+    A Q model that learns based on a sparse Q Table, only storing Q values for states which have been seen.
+    States are found with Environment.currentKey, so any environment with a hashable key can be used,
+        even if the number of states is too large for a Table
+    """
+
+    def __init__(self, actions, environment, learnRate=0.5, discountRate=0.5, explorationRate=0.5,
+                 maxEntries=None, dtype=np.float32):
+        """
+        Create a sparse Q table that will keep track of the Q values for actions in each state that has been seen
+        :param actions: The number of actions
+        :param environment: The model to use with this table for determining when actions can happen,
+            and potential reward. The keys of states come from this environment
+        :param learnRate: The learning rate of the table
+        :param discountRate: The discount rate of the table
+        :param explorationRate: The probability that a random action will be taken, rather than the optimal one
+        :param maxEntries: The maximum number of states to store, or None to have no limit, default None.
+            When the limit is reached, the least recently used state is removed
+        :param dtype: The numpy data type used to store the Q values, default np.float32
+        """
+        super().__init__(None, actions, environment, learnRate, discountRate, explorationRate)
+
+        self.maxEntries = maxEntries
+        self.dtype = dtype
+
+        self.qTable = None
+        self.reset()
+
+    def reset(self):
+        """
+        Remove all the states from the table
+        """
+        self.qTable = OrderedDict()
+
+    def values(self, key, create=True):
+        """
+        Get the Q values for the state with the given key, marking the state as the most recently used
+        :param key: The key of the state
+        :param create: True to add the state to the table if it does not exist, False otherwise, default True
+        :return: A numpy array of the Q values, all zeros if the state has not been seen
+        """
+        row = self.qTable.get(key)
+        if row is not None:
+            self.qTable.move_to_end(key)
+            return row
+
+        row = np.zeros(self.actions, dtype=self.dtype)
+        if create:
+            self.qTable[key] = row
+            if self.maxEntries is not None and len(self.qTable) > self.maxEntries:
+                self.qTable.popitem(last=False)
+        return row
+
+    def train(self, state, action, takeAction=None):
+        return self.trainReward(state, action, None, takeAction)
+
+    def trainReward(self, state, action, reward, takeAction=None):
+        """
+        Same as normal train function, but the reward can be given, rather than calculated.
+        This method will take an action in the environment
+        :param state: The state of the environment before the action is made
+        :param action: The action to make
+        :param reward: The reward for taking the action, or None to calculate the reward
+        :param takeAction: Function to determine if an action can be taken, or None, default None
+        :return: True if the training was successful, False otherwise
+        """
+        # find the reward and key of the state before the action changes it
+        if reward is None:
+            reward = self.environment.rewardFunc(state, action)
+        row = self.values(self.environment.currentKey())
+
+        # take the action
+        self.environment.takeAction(action)
+
+        # find the Q values of the new state, without storing a new state
+        nextRow = self.values(self.environment.currentKey(), create=False)
+
+        success = True
+        if takeAction is None:
+            maxOutput = nextRow.max()
+        else:
+            availableActions = chooseElements(nextRow, takeAction)
+            if len(availableActions) == 0:
+                maxOutput = 0
+                success = False
+            else:
+                maxOutput = chooseHighestFromTuple(availableActions)[1]
+
+        # apply bellman function to update the table
+        if SIMPLE_BELLMAN:
+            row[action] = reward + maxOutput * self.learnRate
+        else:
+            row[action] = row[action] + self.learnRate * (reward - row[action] + self.discountRate * maxOutput)
+
+        return success
+
     def getActions(self, s):
-        return [self.qTable[s, i] for i in range(self.actions)]
+        """
+        Note: The Q values are always for the current state of the environment, so s is not used
+        """
+        return self.values(self.environment.currentKey(), create=False).tolist()
+
+    def getOutputs(self):
+        """
+        Get the Q values of the current state of the environment
+        :return: The Q values as a numpy array, in the same shape as Network.getOutputs
+        """
+        return self.values(self.environment.currentKey(), create=False).reshape((1, self.actions))
 
     def usesNetwork(self):
         return False
@@ -218,6 +424,26 @@ class Network(QModel):
 
         self.net = None
         self.optimizer = None
+        # the Backend used to find the outputs of the network
+        self.backend = KerasBackend(self)
+
+        # settings for training with a compiled train step, see enableFastTraining
+        self.fastTraining = False
+        self.jitCompile = False
+        self.mixedPrecision = False
+        self.stepsPerExecution = 1
+        self.trainFunction = None
+
+        # the Networks which are given a copy of each sample this Network trains on, see shareSamples
+        self.sampleTwins = []
+        # the transitions from other Networks not yet trained on, in the same form as PrioritizedReplay.add
+        self.sharedTransitions = []
+
+        # the PrioritizedReplay this Network stores transitions in and trains from, None to train on each move
+        self.replay = None
+        self.replayBatchSize = REPLAY_BATCH_SIZE
+        # the NStepBuffer combining the moves of each episode into n-step transitions, None to use each move alone
+        self.nStep = None
 
         self.optimizerRate = optimizerRate
         self.optimizerRateDecay = optimizerRateDecay
@@ -235,22 +461,165 @@ class Network(QModel):
         """
         # create a list of layers, initialized with the input layer as the input shape
         layers = [keras.layers.Dense(self.states, activation="sigmoid", use_bias=True,
-                                     input_shape=(self.states,))]
+                                     input_shape=(self.states,), dtype=self.layerPolicy())]
 
         # add all remaining hidden layers
         if len(self.inner) > 0:
             for lay in self.inner:
-                layers.append(keras.layers.Dense(lay, activation="sigmoid", use_bias=True))
+                layers.append(keras.layers.Dense(lay, activation="sigmoid", use_bias=True, dtype=self.layerPolicy()))
 
-        # create the output layer
-        layers.append(keras.layers.Dense(self.actions, activation="linear", use_bias=True))
+        # create the output layer, always in float32 so the outputs are float32
+        layers.append(keras.layers.Dense(self.actions, activation="linear", use_bias=True, dtype="float32"))
 
         # create the network object
         self.net = keras.Sequential(layers)
 
         # compile and finish building network
         self.net.compile(optimizer=self.optimizer,
-                         loss=LOSS_FUNCTION())
+                         loss=getattr(keras.losses, LOSS_FUNCTION)())
+        self.trainFunction = None
+
+    def layerPolicy(self):
+        """
+        Get the dtype policy for the hidden layers of the network
+        :return: MIXED_PRECISION_POLICY if mixed precision is enabled, otherwise None for the default of float32
+        """
+        return MIXED_PRECISION_POLICY if self.mixedPrecision else None
+
+    def enableFastTraining(self, jitCompile=True, mixedPrecision=False, stepsPerExecution=1):
+        """
+        Train this Network with a custom train step in a tf.function, instead of with Keras fit.
+        Changing mixed precision rebuilds the network, keeping its weights
+        :param jitCompile: True to compile the train step with XLA, False otherwise, default True
+        :param mixedPrecision: True to compute the hidden layers with MIXED_PRECISION_POLICY,
+            False to use float32, default False
+        :param stepsPerExecution: The number of minibatches trained in each call to the train step, default 1
+        """
+        self.fastTraining = True
+        self.jitCompile = jitCompile
+        self.stepsPerExecution = stepsPerExecution
+        self.trainFunction = None
+
+        if not mixedPrecision == self.mixedPrecision:
+            self.mixedPrecision = mixedPrecision
+            weights = self.net.get_weights()
+            # the optimizer only works with the variables it was built for, so the new network needs a new one
+            self.updateOptimizerRate(self.optimizerRate)
+            self.initNetwork()
+            self.net.set_weights(weights)
+            self.backend.invalidate()
+
+    def disableFastTraining(self):
+        """
+        Train this Network with Keras fit again, this does not turn off mixed precision
+        """
+        self.fastTraining = False
+        self.trainFunction = None
+
+    def makeTrainFunction(self):
+        """
+        Helper method for fitNetwork. Create the compiled train step used when fast training is enabled
+        :return: The tf.function, taking inputs and expected outputs, each with the shape
+            (minibatches, samples, values...), and the weight of each sample, with the shape (minibatches, samples),
+            and training on each minibatch in order.
+            The loop over minibatches is unrolled, so it is traced once for each number of minibatches
+        """
+        net = self.net
+        optimizer = net.optimizer
+        loss = getattr(keras.losses, LOSS_FUNCTION)()
+        variables = net.trainable_variables
+        # the optimizer must create its variables before the step is compiled
+        if hasattr(optimizer, "build"):
+            optimizer.build(variables)
+
+        def step(inputs, outputs, weights):
+            for i in range(inputs.shape[0]):
+                with tf.GradientTape() as tape:
+                    error = loss(outputs[i], net(inputs[i], training=True), sample_weight=weights[i])
+                optimizer.apply_gradients(zip(tape.gradient(error, variables), variables))
+
+        return tf.function(step, jit_compile=self.jitCompile)
+
+    def shareSamples(self, twin):
+        """
+        Give a copy of every sample this Network trains on with trainReward to another Network, with the same inputs
+            and actions, i.e. the Network of the same kind for the other side of a game, where the inputs are always
+            from the perspective of the player making the move
+        :param twin: The Network
+        """
+        if twin not in self.sampleTwins:
+            self.sampleTwins.append(twin)
+
+    def receiveSample(self, transition):
+        """
+        Keep a transition from another Network, to train on it with the next sample this Network trains on,
+            or add it to the PrioritizedReplay of this Network if it has one.
+        Only the experience is shared, the target Q value is found with this Network's own outputs when it trains,
+            the same way as transitionTargets, not with the other Network's estimates
+        :param transition: A tuple with the parameters of PrioritizedReplay.add, including steps
+        """
+        if self.replay is not None:
+            self.replay.add(*transition)
+            return
+        if len(self.sharedTransitions) >= SHARED_SAMPLE_LIMIT:
+            del self.sharedTransitions[0]
+        self.sharedTransitions.append(transition)
+
+    def addSharedSamples(self, inputs, outputs):
+        """
+        Helper method for trainReward. Add the transitions from other Networks to a batch, finding the expected
+            outputs of all of them with transitionTargets
+        :param inputs: The numpy array of inputs of the batch
+        :param outputs: The numpy array of expected outputs of the batch
+        :return: A 2-tuple (inputs, outputs) of the new batch, the outputs have the shape (samples, actions)
+        """
+        outputs = outputs.reshape((len(outputs), self.actions))
+        if len(self.sharedTransitions) == 0:
+            return inputs, outputs
+
+        shared = stackTransitions(self.sharedTransitions)
+        sharedOutputs = self.transitionTargets(*shared)[0]
+        self.sharedTransitions = []
+
+        return (np.concatenate([inputs, shared[0].astype(inputs.dtype)]),
+                np.concatenate([outputs, sharedOutputs.astype(outputs.dtype)]))
+
+    def fitNetwork(self, inputs, outputs, epochs, weights=None):
+        """
+        Train the network on inputs and expected outputs, with Keras fit, or the compiled train step
+            if fast training is enabled
+        :param inputs: A numpy array of the inputs
+        :param outputs: A numpy array of the expected outputs, the same length as inputs
+        :param epochs: The number of times to train on every sample
+        :param weights: A numpy array of the weight of each sample in the loss, or None to weigh them equally,
+            default None
+        """
+        # the expected outputs have the same shape as the outputs of the network, so the loss compares each sample
+        outputs = np.asarray(outputs).reshape((len(outputs),) + tuple(self.net.output_shape[1:]))
+        if not self.fastTraining:
+            self.net.fit(inputs, outputs, sample_weight=weights, verbose=0, epochs=epochs, batch_size=TRAIN_BATCH_SIZE)
+        else:
+            if self.trainFunction is None:
+                self.trainFunction = self.makeTrainFunction()
+            inputs = np.asarray(inputs, dtype=np.float32)
+            outputs = np.asarray(outputs, dtype=np.float32)
+            weights = np.ones(len(inputs), dtype=np.float32) if weights is None else np.asarray(weights, np.float32)
+
+            # train stepsPerExecution full minibatches in each call, then the rest in one minibatch
+            size = TRAIN_BATCH_SIZE * self.stepsPerExecution
+            whole = len(inputs) - len(inputs) % TRAIN_BATCH_SIZE
+            for e in range(epochs):
+                for start in range(0, whole, size):
+                    end = min(start + size, whole)
+                    steps = (end - start) // TRAIN_BATCH_SIZE
+                    self.trainFunction(inputs[start:end].reshape((steps, TRAIN_BATCH_SIZE) + inputs.shape[1:]),
+                                       outputs[start:end].reshape((steps, TRAIN_BATCH_SIZE) + outputs.shape[1:]),
+                                       weights[start:end].reshape((steps, TRAIN_BATCH_SIZE)))
+                if whole < len(inputs):
+                    self.trainFunction(inputs[np.newaxis, whole:], outputs[np.newaxis, whole:],
+                                       weights[np.newaxis, whole:])
+
+        self.backend.invalidate()
 
     def train(self, state, action, takeAction=None):
         return self.trainReward(state, action, None, takeAction)
@@ -275,6 +644,9 @@ class Network(QModel):
         if reward is None:
             reward = self.environment.rewardFunc(state, action)
 
+        # the player making the move, found before the move, which can change whose turn it is
+        player = self.environment.turnKey()
+
         # make next step in environment, meaning take the action
         self.environment.takeAction(action)
 
@@ -306,8 +678,25 @@ class Network(QModel):
             expectedOut[0, action] = expectedOut[0, action] + self.learnRate * (
                 reward - expectedOut[0, action] +
                 self.discountRate * maxOutput)
-        # train the network on the newly expected Q values
-        self.net.fit(inputs, expectedOut, verbose=0, use_multiprocessing=True, epochs=1, batch_size=None)
+        # the transition is needed for the replay, to combine it with the moves after it, or for other Networks
+        if self.replay is not None or self.nStep is not None or len(self.sampleTwins) > 0:
+            nextValid = [takeAction is None or takeAction(a) for a in range(self.actions)]
+            transition = (inputs, action, reward, self.getInputs(), nextValid, 0 if success else maxOutput)
+
+            # store the transition, to train on a batch from the replay, or once it is combined with the moves after it
+            if self.replay is not None or self.nStep is not None:
+                if self.nStep is None:
+                    self.storeTransitions([transition + (1,)])
+                else:
+                    self.storeTransitions(self.nStep.add(*transition, self.discountRate, player))
+                return success
+
+            for twin in self.sampleTwins:
+                twin.receiveSample(transition + (1,))
+
+        # train the network on the newly expected Q values, and any samples shared by other Networks
+        inputs, expectedOut = self.addSharedSamples(inputs, expectedOut)
+        self.fitNetwork(inputs, expectedOut, 1)
 
         # return that the training happened successfully
         return success
@@ -318,15 +707,171 @@ class Network(QModel):
         :param inputs: The input data
         :param outputs: The expected output data
         """
-        self.net.fit(np.array(inputs), np.array(outputs),
-                     verbose=0, use_multiprocessing=True, epochs=10, batch_size=None)
+        self.fitNetwork(np.array(inputs), np.array(outputs), 10)
+
+    def trainDataset(self, dataset, epochs=1):
+        """
+        Train this Network on batches streamed from a tf.data pipeline, so the samples do not all need to be in memory
+        :param dataset: A tf.data.Dataset of 2-tuples (inputs, outputs) of batches, i.e. from
+            learning.Dataset.shardDataset
+        :param epochs: The number of times to train on every batch, default 1
+        """
+        if not self.fastTraining:
+            self.net.fit(dataset, verbose=0, epochs=epochs)
+        else:
+            if self.trainFunction is None:
+                self.trainFunction = self.makeTrainFunction()
+
+            # train stepsPerExecution batches in each call, only grouping batches of the same size
+            for e in range(epochs):
+                inputs, outputs = [], []
+                for i, o in dataset:
+                    if len(inputs) > 0 and not i.shape == inputs[0].shape:
+                        self.trainStacked(inputs, outputs)
+                        inputs, outputs = [], []
+                    inputs.append(i)
+                    outputs.append(o)
+                    if len(inputs) == self.stepsPerExecution:
+                        self.trainStacked(inputs, outputs)
+                        inputs, outputs = [], []
+                if len(inputs) > 0:
+                    self.trainStacked(inputs, outputs)
+
+        self.backend.invalidate()
+
+    def trainStacked(self, inputs, outputs):
+        """
+        Helper method for trainDataset. Train on a list of batches of the same size with one call to the
+            compiled train step
+        :param inputs: A list of the tensors of inputs of each batch
+        :param outputs: A list of the tensors of expected outputs of each batch
+        """
+        self.trainFunction(tf.stack(inputs), tf.stack(outputs), tf.ones((len(inputs), inputs[0].shape[0])))
+
+    def enableReplay(self, capacity, batchSize=REPLAY_BATCH_SIZE, alpha=REPLAY_ALPHA, beta=REPLAY_BETA):
+        """
+        Store every transition from trainReward in a PrioritizedReplay, and train on a batch sampled from it
+            each move, instead of only the newest transition
+        :param capacity: The largest number of transitions stored
+        :param batchSize: The number of transitions trained on each move, default REPLAY_BATCH_SIZE
+        :param alpha: How much priorities change the probability of sampling, default REPLAY_ALPHA
+        :param beta: The starting amount of importance sampling correction, default REPLAY_BETA
+        """
+        self.replay = PrioritizedReplay(capacity, alpha, beta)
+        self.replayBatchSize = batchSize
+
+    def disableReplay(self):
+        """
+        Stop using a PrioritizedReplay, and train on each transition as it happens
+        """
+        self.replay = None
+
+    def trainReplay(self):
+        """
+        Train on a batch of transitions sampled from the PrioritizedReplay of this Network, weighted by their
+            importance sampling weights, then update their priorities with their new TD errors.
+            Nothing happens until the PrioritizedReplay has at least one batch of transitions
+        """
+        if self.replay is None or len(self.replay) < self.replayBatchSize:
+            return
+        sample = self.replay.sample(self.replayBatchSize)
+        indexes, inputs, weights = sample[0], sample[1], sample[-1]
+        outputs, errors = self.transitionTargets(*sample[1:-1])
+        self.replay.updatePriorities(indexes, errors)
+        self.fitNetwork(inputs, outputs, 1, weights)
+
+    def transitionTargets(self, inputs, actions, rewards, nextInputs, nextValid, fallbacks, steps):
+        """
+        Find the expected outputs for a batch of transitions, the same way as trainReward, with one call to the
+            network for the inputs, and one for the next inputs
+        :param inputs: A numpy array of the inputs of each transition
+        :param actions: A numpy array of the actions taken
+        :param rewards: A numpy array of the rewards, the discounted sum of the rewards of every move for an n-step
+            transition
+        :param nextInputs: A numpy array of the inputs after each transition
+        :param nextValid: A 2D numpy array of booleans, True for each action which can be taken after each transition
+        :param fallbacks: A numpy array of the values used in place of the highest Q value after each transition,
+            when no action can be taken
+        :param steps: A numpy array of the number of moves in each transition
+        :return: A 2-tuple (outputs, errors), the expected outputs, with the shape (transitions, actions),
+            and the TD error of each transition
+        """
+        outputs = self.batchOutputs(inputs)
+        nextOutputs = self.batchOutputs(nextInputs)
+        anyValid = nextValid.any(axis=1)
+        maxOutputs = np.where(anyValid, np.where(nextValid, nextOutputs, -np.inf).max(axis=1), fallbacks)
+
+        # the Q value after n moves is discounted once for each move
+        rows = np.arange(len(actions))
+        current = outputs[rows, actions]
+        steps = np.asarray(steps)
+        discounts = self.discountRate ** steps
+        if SIMPLE_BELLMAN:
+            outputs[rows, actions] = rewards + maxOutputs * self.learnRate * self.discountRate ** (steps - 1)
+        else:
+            outputs[rows, actions] = current + self.learnRate * (rewards - current + discounts * maxOutputs)
+        return outputs, rewards + discounts * maxOutputs - current
+
+    def storeTransitions(self, transitions):
+        """
+        Helper method for trainReward and endEpisode. Train on new transitions, by adding them to the
+            PrioritizedReplay of this Network, or directly if it has none. Any Networks sharing samples with this
+            Network also get the transitions
+        :param transitions: A list of tuples, each with the parameters of PrioritizedReplay.add
+        """
+        if len(transitions) == 0:
+            return
+        for twin in self.sampleTwins:
+            for transition in transitions:
+                twin.receiveSample(transition)
+
+        if self.replay is not None:
+            for transition in transitions:
+                self.replay.add(*transition)
+            self.trainReplay()
+        else:
+            stacked = stackTransitions(transitions)
+            outputs = self.transitionTargets(*stacked)[0]
+            inputs, outputs = self.addSharedSamples(stacked[0], outputs)
+            self.fitNetwork(inputs, outputs, 1)
+
+    def enableNStep(self, steps):
+        """
+        Combine the moves of each episode into n-step transitions with an NStepBuffer, so rewards reach earlier moves
+            in fewer updates. A move is only trained on once the following moves are known,
+            or the episode ends with endEpisode
+        :param steps: The number of moves combined into each transition
+        """
+        self.nStep = NStepBuffer(steps)
+
+    def disableNStep(self):
+        """
+        Stop combining moves into n-step transitions, any moves not yet combined are not trained on
+        """
+        self.nStep = None
+
+    def endEpisode(self):
+        """
+        Train on every move of the episode which has not been trained on yet, called at the end of each game
+        """
+        if self.nStep is not None:
+            self.storeTransitions(self.nStep.finish(self.discountRate))
 
     def getOutputs(self):
         """
         Get the output values of the model
         :return: The output values as a numpy array
         """
-        return self.net(self.getInputs())
+        return self.backend.predict(self.getInputs())
+
+    def batchOutputs(self, inputs):
+        """
+        Get the output values of the model for many inputs, with one call to the network
+        :param inputs: A numpy array of inputs, the first dimension is the number of inputs, and the remaining
+            dimensions are the same as the inputs from getInputs
+        :return: A 2D numpy array of the output values, indexed by [input, action]
+        """
+        return self.backend.predict(inputs).reshape((len(inputs), self.actions))
 
     def getInputs(self):
         """
@@ -338,13 +883,69 @@ class Network(QModel):
 
     def getActions(self, s):
         # get the actions
-        actions = self.net.predict(s, verbose=0)
+        actions = self.backend.predict(s)
         # convert the actions to a list
         return [a for a in actions[0]]
 
+    def setBackend(self, backend):
+        """
+        Set the Backend used to find the outputs of the network. Training always uses the Keras model
+        :param backend: The Backend, i.e. KerasBackend(self) or NumpyBackend(self)
+        """
+        self.backend = backend
+
+    def getConfig(self):
+        """
+        Get the values which determine the architecture of this Network, used to rebuild it from a checkpoint
+        :return: A dictionary of the values, which can be stored as JSON
+        """
+        return {"type": type(self).__name__, "states": self.states, "actions": self.actions,
+                "inner": list(self.inner)}
+
     def updateOptimizerRate(self, newRate):
         self.optimizerRate = newRate
-        self.optimizer = OPTIMIZE_FUNCTION(learning_rate=self.optimizerRate)
+        self.optimizer = getattr(keras.optimizers, OPTIMIZE_FUNCTION)(learning_rate=self.optimizerRate)
+
+    def usesNetwork(self):
+        return True
+
+
+class BackendNetwork(QModel):
+    """
+    A Q model which only plays, finding its Q values with a Backend, such as a NumpyBackend loaded from a checkpoint,
+        without a Keras model. It is used in place of a Network when a Network does not need to be trained
+    """
+
+    def __init__(self, actions, environment, backend, explorationRate=0.5, rng=None):
+        """
+        Create a BackendNetwork
+        :param actions: The number of actions
+        :param environment: The environment to use for determining when actions can happen
+        :param backend: The Backend which finds the outputs, it must already have its weights
+        :param explorationRate: The probability that a random action will be taken, rather than the optimal one
+        :param rng: The random.Random used to choose actions, None to use the random module, default None
+        """
+        super().__init__(environment.networkInputs(), actions, environment, explorationRate=explorationRate)
+        self.backend = backend
+        if rng is not None:
+            self.rng = rng
+
+    def train(self, state, action, takeAction=None):
+        """
+        Note: A BackendNetwork has no model to train, so this only takes the action
+        """
+        self.environment.takeAction(action)
+        return False
+
+    def getActions(self, s):
+        return self.backend.predict(s).reshape(-1).tolist()
+
+    def getOutputs(self):
+        """
+        Get the output values of the model
+        :return: The output values as a 2D numpy array, with one row
+        """
+        return self.backend.predict(self.environment.toNetInput()).reshape((1, self.actions))
 
     def usesNetwork(self):
         return True
@@ -380,6 +981,22 @@ class Environment:
         """
         return 0
 
+    def currentKey(self):
+        """
+        Get a hashable key which uniquely identifies the current state of this model, used by a HashTable.
+        By default, this is the current state
+        :return: The key
+        """
+        return self.currentState()
+
+    def turnKey(self):
+        """
+        Get a key for the player whose turn it is, so that the moves of each player can be kept apart.
+        By default, there is only one player
+        :return: The key
+        """
+        return 0
+
     @abc.abstractmethod
     def numStates(self):
         """
@@ -449,7 +1066,20 @@ class DummyGame(Environment):
         self.defaultPos = pos
         self.x, self.y = pos
 
-        self.moveHistory = []
+        # the set of all (x, y) positions visited in the current game
+        self.moveHistory = set()
+
+        # the network input when not using sizeStates only depends on the grid, so it is found once
+        self.gridInput = None
+        self.updateGridInput()
+
+    def updateGridInput(self):
+        """
+        Find the network input used when sizeStates is False, based on the current grid
+        """
+        # there are NUM_REWARD_SQUARES possibilities for each grid position, a layer of ones and zeros for each
+        self.gridInput = (self.grid[np.newaxis] == np.arange(NUM_REWARD_SQUARES)[:, np.newaxis, np.newaxis])
+        self.gridInput = self.gridInput.reshape((1, -1)).astype(np.float64)
 
     def pos(self, s):
         """
@@ -504,6 +1134,7 @@ class DummyGame(Environment):
         :param a: The given value
         """
         self.grid[y, x] = a
+        self.updateGridInput()
 
     def takeAction(self, direction):
         """
@@ -535,22 +1166,7 @@ class DummyGame(Environment):
             inputs[0][self.currentState()] = 1
             return inputs
         else:
-            # create an array of appropriate size
-            arr = np.zeros((1, self.networkInputs()))
-            size = self.width() * self.height()
-
-            # there are NUM_ACTIONS possibilities for each grid position
-            for c in range(NUM_REWARD_SQUARES):
-                # go through each row
-                for i, y in enumerate(self.grid):
-                    # go through each position in the row
-                    for j, x in enumerate(y):
-                        # get the position in the array
-                        pos = c * size + i * self.width() + j
-                        # if the id of the grid position matches the current grid position,
-                        #   set the array to 1, 0 otherwise
-                        arr[0][pos] = 1 if x == c else 0
-            return arr
+            return self.gridInput.copy()
 
     def numStates(self):
         s = self.width() * self.height()
@@ -605,10 +1221,7 @@ class DummyGame(Environment):
                 pos[0] -= 1
             elif action == RIGHT:
                 pos[0] += 1
-            for h in self.moveHistory:
-                if h[0] == pos[0] and h[1] == pos[1]:
-                    return False
-            return True
+            return (pos[0], pos[1]) not in self.moveHistory
 
         else:
             return canMove
@@ -617,12 +1230,37 @@ class DummyGame(Environment):
         action = qModel.chooseAction(self.currentState(), takeAction=self.canTakeAction)
         self.takeAction(action)
 
+    def transitions(self):
+        """
+        Find the result of taking every action in every state, ignoring the move history.
+        Every action in this game is deterministic, so this fully describes the game
+        :return: A 2-tuple (newStates, rewards) of 2D numpy arrays, both indexed by [state, action],
+            the state after taking each action, and the reward for taking it
+        """
+        width, height = self.width(), self.height()
+        states = np.arange(width * height)
+        x, y = states % width, states // width
+
+        # the position after each action, in the same order as the action indexes
+        newX = np.stack([x, x + 1, x, x - 1, x], axis=1)
+        newY = np.stack([y - 1, y, y + 1, y, y], axis=1)
+
+        # only moves that stay in the grid, and are not the action for not moving, change the state
+        moved = (newX >= 0) & (newX < width) & (newY >= 0) & (newY < height)
+        moved[:, CANT_MOVE] = False
+
+        newStates = np.where(moved, newX + newY * width, states[:, np.newaxis])
+        squareRewards = np.asarray(self.rewards)[self.grid.ravel()] - MOVE_COST
+        rewards = np.where(moved, squareRewards[newStates], self.rewards[DO_NOTHING])
+
+        return newStates, rewards
+
     def reset(self):
         """
         Reset the game to a default state
         """
         self.x, self.y = self.defaultPos
-        self.moveHistory = []
+        self.moveHistory = set()
 
     def playGame(self, qModel, learn=False, printPos=False):
         """
@@ -644,7 +1282,7 @@ class DummyGame(Environment):
         while not square == WIN and not square == DEAD and moves < MAX_MOVES:
             # add to the move history
             if TRACK_MOVE_HISTORY:
-                self.moveHistory.append((self.x, self.y))
+                self.moveHistory.add((self.x, self.y))
 
             # get the state before making an action
             state = self.state(self.x, self.y)
@@ -682,6 +1320,111 @@ class DummyGame(Environment):
         return total
 
 
+class DummyGameBatch:
+    """
+    Many independent copies of a DummyGame, played all at once with numpy arrays.
+    Each game follows the same rules as DummyGame.playGame, but a game with no valid moves ends immediately.
+    """
+
+    def __init__(self, grid, games, rewards=None, pos=(0, 0), sizeStates=True):
+        """
+        Create a batch of dummy games, all on the same grid
+        :param grid: A 2D numpy array containing the values for entering the corresponding square.
+        :param games: The number of games to play at once
+        :param rewards: A list of the rewards for a corresponding action, none for default values,
+            [move, good, bad, dead, win, do nothing]
+        :param pos: A 2-tuple, (x, y), the starting position of every game in the grid, default: (0, 0)
+        :param sizeStates: The same as for DummyGame, default True
+        """
+        self.env = DummyGame(grid, rewards, pos, sizeStates)
+        self.games = games
+
+        # the result of every action, and which squares end the game
+        self.newStates, self.rewards = self.env.transitions()
+        self.ends = np.isin(self.env.grid.ravel(), (WIN, DEAD))
+
+        # the network input for each state
+        if sizeStates:
+            self.inputs = np.eye(self.env.numStates())
+        else:
+            self.inputs = np.repeat(self.env.gridInput, self.env.width() * self.env.height(), axis=0)
+
+        self.states = None
+        self.visited = None
+        self.done = None
+        self.totals = None
+        self.reset()
+
+    def reset(self):
+        """
+        Reset all the games to a default state
+        """
+        self.states = np.full(self.games, self.env.state(*self.env.defaultPos))
+        self.visited = np.zeros((self.games, len(self.newStates)), dtype=bool)
+        self.done = self.ends[self.states].copy()
+        self.totals = np.zeros(self.games)
+
+    def validActions(self):
+        """
+        Determine which actions can be taken in each game
+        :return: A 2D boolean numpy array indexed by [game, action]
+        """
+        newStates = self.newStates[self.states]
+        if ENABLE_DO_NOTHING:
+            return np.ones(newStates.shape, dtype=bool)
+
+        valid = newStates != self.states[:, np.newaxis]
+        if TRACK_MOVE_HISTORY:
+            valid &= ~np.take_along_axis(self.visited, newStates, axis=1)
+        return valid
+
+    def toNetInput(self):
+        """
+        Get the network input of every game
+        :return: A 2D numpy array, one row for each game
+        """
+        return self.inputs[self.states]
+
+    def playGames(self, table, learn=False):
+        """
+        Play every game in the batch using the given Table
+        :param table: The Table to use for making decisions
+        :param learn: True to also update the given Table with Table.trainBatch, False otherwise, default False
+        :return: A 1D numpy array of the total reward gained from each game
+        """
+        self.reset()
+        games = np.arange(self.games)
+
+        for m in range(MAX_MOVES):
+            if self.done.all():
+                break
+
+            # only play the games which have not ended
+            active = games[~self.done]
+            states = self.states[active]
+            if TRACK_MOVE_HISTORY:
+                self.visited[active, states] = True
+
+            valid = self.validActions()[active]
+            actions = table.chooseActions(states, None if ENABLE_DO_NOTHING else valid)
+
+            # a game with no valid moves is stuck, and ends
+            stuck = actions < 0
+            self.done[active[stuck]] = True
+            active, states, actions = active[~stuck], states[~stuck], actions[~stuck]
+
+            newStates = self.newStates[states, actions]
+            rewards = self.rewards[states, actions]
+            if learn:
+                table.trainBatch(states, actions, rewards, newStates, self.ends[newStates])
+
+            self.states[active] = newStates
+            self.totals[active] += rewards
+            self.done[active] |= self.ends[newStates]
+
+        return self.totals.copy()
+
+
 def chooseElements(arr, keep):
     """
     Take a list of elements, and remove certain elements determined by keep.
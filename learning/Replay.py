@@ -0,0 +1,275 @@
+import numpy as np
+
+# constants for prioritized experience replay
+# how much the priorities change the probability of sampling a transition, 0 for uniform sampling
+REPLAY_ALPHA = 0.6
+# how much importance sampling corrects for the priorities at the start of training, 1 for a full correction
+REPLAY_BETA = 0.4
+# the amount beta is increased by each time a batch is sampled, until it reaches 1
+REPLAY_BETA_INCREMENT = 0.0001
+# added to the absolute TD error of every transition, so no transition has a priority of 0
+REPLAY_EPSILON = 0.01
+
+
+class SumTree:
+    """
+    A binary tree stored in a numpy array, where each leaf has a priority, and each other node is the sum of its
+        children. Finding the leaf at a point in the running sum of the priorities, and updating priorities,
+        both take O(log n) time, and work on many leaves at once
+    """
+
+    def __init__(self, capacity):
+        """
+        Create a SumTree where every priority is 0
+        :param capacity: The number of leaves
+        """
+        self.capacity = capacity
+        # the number of leaves in the full tree, the smallest power of 2 which fits every leaf
+        self.leaves = 1 << max(0, capacity - 1).bit_length()
+        # node 1 is the root, and the children of node n are 2n and 2n + 1, node 0 is not used
+        self.tree = np.zeros(2 * self.leaves)
+
+    def total(self):
+        """
+        Get the sum of every priority
+        :return: The sum
+        """
+        return self.tree[1]
+
+    def get(self, indexes):
+        """
+        Get the priorities of leaves
+        :param indexes: A numpy array of the indexes of the leaves
+        :return: A numpy array of the priorities
+        """
+        return self.tree[np.asarray(indexes) + self.leaves]
+
+    def update(self, indexes, priorities):
+        """
+        Set the priorities of leaves, and update the sums above them
+        :param indexes: A numpy array of the indexes of the leaves
+        :param priorities: A numpy array of the new priorities
+        """
+        nodes = np.asarray(indexes) + self.leaves
+        self.tree[nodes] = priorities
+        nodes = np.unique(nodes // 2)
+        while nodes[0] >= 1:
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            nodes = np.unique(nodes // 2)
+
+    def find(self, values):
+        """
+        Find the leaves at points in the running sum of the priorities
+        :param values: A numpy array of the points, each in the range [0, total())
+        :return: A numpy array of the indexes of the leaves
+        """
+        values = np.minimum(np.asarray(values, dtype=np.float64), np.nextafter(self.total(), 0))
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self.leaves:
+            left = self.tree[2 * nodes]
+            # go right when the point is past the left child, unless rounding would lead to an empty subtree
+            right = (values >= left) & (self.tree[2 * nodes + 1] > 0)
+            values = values - left * right
+            nodes = 2 * nodes + right
+        return nodes - self.leaves
+
+
+class PrioritizedReplay:
+    """
+    A fixed size store of the transitions seen by a Network, which samples transitions with a probability based on
+        how wrong the Network was about them, the size of their TD error. Once full, the oldest transition is replaced
+    """
+
+    def __init__(self, capacity, alpha=REPLAY_ALPHA, beta=REPLAY_BETA, betaIncrement=REPLAY_BETA_INCREMENT,
+                 epsilon=REPLAY_EPSILON):
+        """
+        Create an empty PrioritizedReplay
+        :param capacity: The largest number of transitions stored
+        :param alpha: How much priorities change the probability of sampling, default REPLAY_ALPHA
+        :param beta: The starting amount of importance sampling correction, default REPLAY_BETA
+        :param betaIncrement: The amount beta increases by for each sampled batch, default REPLAY_BETA_INCREMENT
+        :param epsilon: The amount added to each absolute TD error, default REPLAY_EPSILON
+        """
+        self.capacity = capacity
+        self.alpha = alpha
+        self.beta = beta
+        self.betaIncrement = betaIncrement
+        self.epsilon = epsilon
+
+        self.tree = SumTree(capacity)
+        # the priority given to new transitions, the largest priority seen so far, so they are sampled at least once
+        self.maxPriority = 1.0
+        # the number of transitions stored, and the index where the next one is stored
+        self.size = 0
+        self.next = 0
+
+        # the arrays of each part of the transitions, created when the first transition is added
+        self.inputs = None
+        self.actions = None
+        self.rewards = None
+        self.nextInputs = None
+        self.nextValid = None
+        self.fallbacks = None
+        self.steps = None
+
+    def __len__(self):
+        return self.size
+
+    def add(self, inputs, action, reward, nextInputs, nextValid, fallback=0, steps=1):
+        """
+        Store a transition, with the largest priority so far
+        :param inputs: The inputs of the Network before the action, with a first dimension of 1
+        :param action: The action taken
+        :param reward: The reward for taking the action
+        :param nextInputs: The inputs of the Network after the action, with a first dimension of 1
+        :param nextValid: A list of booleans, True for each action which can be taken after the action,
+            all False if no action can be taken
+        :param fallback: The value used in place of the highest Q value after the action, if no action can be taken,
+            default 0
+        :param steps: The number of moves between the inputs and the next inputs, more than 1 for a transition from
+            an NStepBuffer, default 1
+        """
+        if self.inputs is None:
+            self.inputs = np.zeros((self.capacity,) + inputs.shape[1:], dtype=np.float32)
+            self.nextInputs = np.zeros((self.capacity,) + nextInputs.shape[1:], dtype=np.float32)
+            self.actions = np.zeros(self.capacity, dtype=np.int64)
+            self.rewards = np.zeros(self.capacity, dtype=np.float32)
+            self.nextValid = np.zeros((self.capacity, len(nextValid)), dtype=bool)
+            self.fallbacks = np.zeros(self.capacity, dtype=np.float32)
+            self.steps = np.zeros(self.capacity, dtype=np.int64)
+
+        i = self.next
+        self.inputs[i] = inputs[0]
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.nextInputs[i] = nextInputs[0]
+        self.nextValid[i] = nextValid
+        self.fallbacks[i] = fallback
+        self.steps[i] = steps
+        self.tree.update([i], [self.maxPriority ** self.alpha])
+
+        self.next = (self.next + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batchSize):
+        """
+        Pick transitions, with a probability proportional to their priority. The sum of the priorities is split into
+            equal ranges, and one transition is picked from each, so high and low priorities are both sampled
+        :param batchSize: The number of transitions to pick
+        :return: A 9-tuple (indexes, inputs, actions, rewards, nextInputs, nextValid, fallbacks, steps, weights) of
+            numpy arrays, where weights are the importance sampling weights of each transition, with the largest
+            weight being 1
+        """
+        total = self.tree.total()
+        values = (np.arange(batchSize) + np.random.random(batchSize)) * (total / batchSize)
+        indexes = self.tree.find(values)
+
+        # correct for the transitions with high priorities being sampled more often
+        probabilities = self.tree.get(indexes) / total
+        weights = (self.size * probabilities) ** -self.beta
+        weights /= weights.max()
+        self.beta = min(1.0, self.beta + self.betaIncrement)
+
+        return (indexes, self.inputs[indexes], self.actions[indexes], self.rewards[indexes],
+                self.nextInputs[indexes], self.nextValid[indexes], self.fallbacks[indexes], self.steps[indexes],
+                weights.astype(np.float32))
+
+    def updatePriorities(self, indexes, errors):
+        """
+        Set the priorities of transitions from their new TD errors
+        :param indexes: A numpy array of the indexes from sample
+        :param errors: A numpy array of the TD errors of each transition
+        """
+        priorities = np.abs(errors) + self.epsilon
+        self.maxPriority = max(self.maxPriority, float(priorities.max()))
+        self.tree.update(indexes, priorities ** self.alpha)
+
+
+def stackTransitions(transitions):
+    """
+    Combine a list of transitions into one numpy array for each part
+    :param transitions: A list of tuples, each with the parameters of PrioritizedReplay.add, including steps
+    :return: A 7-tuple (inputs, actions, rewards, nextInputs, nextValid, fallbacks, steps) of numpy arrays
+    """
+    inputs, actions, rewards, nextInputs, nextValid, fallbacks, steps = zip(*transitions)
+    return (np.concatenate(inputs), np.array(actions), np.array(rewards, dtype=np.float32),
+            np.concatenate(nextInputs), np.array(nextValid, dtype=bool), np.array(fallbacks, dtype=np.float32),
+            np.array(steps))
+
+
+class NStepBuffer:
+    """
+    Holds the newest transitions of one episode, and combines each with the transitions after it into one n-step
+        transition, where the reward is the discounted sum of the rewards of the next n moves, and the next inputs are
+        the inputs after the nth move, so a reward reaches the moves before it in fewer updates.
+    The transitions of each player are kept apart, so only the moves of one player are combined,
+        i.e. when one Network plays both sides of a game
+    """
+
+    def __init__(self, steps):
+        """
+        Create an empty NStepBuffer
+        :param steps: The number of moves combined into each transition, 1 to use each transition unchanged
+        """
+        self.steps = steps
+        # a dictionary mapping the key of each player to a list of their 6-tuples
+        #   (inputs, action, reward, nextInputs, nextValid, fallback) not yet combined
+        self.episodes = {}
+
+    def __len__(self):
+        return sum(len(t) for t in self.episodes.values())
+
+    def add(self, inputs, action, reward, nextInputs, nextValid, fallback, discountRate, player=0):
+        """
+        Add a transition, combining the oldest transition of the same player once there are enough after it.
+            The parameters are the same as PrioritizedReplay.add
+        :param discountRate: The amount the reward of each later move is multiplied by, compounded for each move
+        :param player: The key of the player who made the move, from Environment.turnKey, default 0
+        :return: A list of the combined transitions, the parameters for PrioritizedReplay.add, empty until the
+            buffer holds the given number of steps for the player, then the oldest transition each time
+        """
+        transitions = self.episodes.setdefault(player, [])
+        transitions.append((inputs, action, reward, nextInputs, nextValid, fallback))
+        if len(transitions) < self.steps:
+            return []
+        return self.combine(transitions, 1, discountRate)
+
+    def finish(self, discountRate):
+        """
+        Combine every remaining transition, at the end of an episode. The transitions near the end combine fewer moves,
+            and use the inputs after the last move of the same player
+        :param discountRate: The amount the reward of each later move is multiplied by, compounded for each move
+        :return: A list of the combined transitions, the parameters for PrioritizedReplay.add
+        """
+        combined = []
+        for transitions in self.episodes.values():
+            combined.extend(self.combine(transitions, len(transitions), discountRate))
+        self.episodes.clear()
+        return combined
+
+    def combine(self, transitions, count, discountRate):
+        """
+        Helper method for add and finish. Remove the oldest transitions of one player, combining each with the
+            transitions after it
+        :param transitions: The list of transitions of the player
+        :param count: The number of transitions to remove
+        :param discountRate: The amount the reward of each later move is multiplied by, compounded for each move
+        :return: A list of the combined transitions, the parameters for PrioritizedReplay.add
+        """
+        size = len(transitions)
+        rewards = np.array([t[2] for t in transitions], dtype=np.float64)
+
+        # the discounted rewards of every combined transition at once, each row holds the powers of the discount rate
+        #   for the moves in the window of one transition, and 0 outside of it
+        offsets = np.arange(size)[np.newaxis, :] - np.arange(count)[:, np.newaxis]
+        window = (offsets >= 0) & (offsets < self.steps)
+        returns = np.where(window, discountRate ** np.maximum(offsets, 0), 0) @ rewards
+
+        combined = []
+        for i in range(count):
+            last = min(i + self.steps, size) - 1
+            inputs, action = transitions[i][:2]
+            nextInputs, nextValid, fallback = transitions[last][3:]
+            combined.append((inputs, action, float(returns[i]), nextInputs, nextValid, fallback, last - i + 1))
+        del transitions[:count]
+        return combined
@@ -0,0 +1,115 @@
+from learning.QLearn import *
+
+
+def solverArrays(env):
+    """
+    Find all the arrays describing a DummyGame needed to solve it exactly
+    :param env: The DummyGame to solve, the move history is not considered
+    :return: A 4-tuple (newStates, rewards, ends, valid),
+        newStates: a 2D numpy array indexed by [state, action] of the state after taking each action
+        rewards: a 2D numpy array indexed by [state, action] of the reward for taking each action
+        ends: a 1D boolean numpy array, True for each state which ends the game when it is entered
+        valid: a 2D boolean numpy array indexed by [state, action], True if the action can be chosen in that state
+    """
+    newStates, rewards = env.transitions()
+    ends = np.isin(env.grid.ravel(), (WIN, DEAD))
+
+    # when doing nothing is not enabled, only actions which move can be picked
+    if ENABLE_DO_NOTHING:
+        valid = np.ones(newStates.shape, dtype=bool)
+    else:
+        valid = newStates != np.arange(len(newStates))[:, np.newaxis]
+
+    return newStates, rewards, ends, valid
+
+
+def stateValues(q, ends, valid):
+    """
+    Find the value of each state, meaning the highest Q value of the actions which can be chosen in that state
+    :param q: A 2D numpy array of Q values, indexed by [state, action]
+    :param ends: A 1D boolean numpy array, True for each state which ends the game
+    :param valid: A 2D boolean numpy array indexed by [state, action], True if the action can be chosen
+    :return: A 1D numpy array of the value of each state, 0 for states which end the game, or have no actions
+    """
+    values = np.where(valid, q, -np.inf).max(axis=1)
+    return np.where(ends | ~valid.any(axis=1), 0, values)
+
+
+def valueIteration(env, discountRate, tolerance=1e-9, maxIterations=10000):
+    """
+    Find the optimal Q values of a DummyGame with value iteration
+    :param env: The DummyGame to solve
+    :param discountRate: The discount rate of future reward, should be less than 1
+    :param tolerance: Stop once no Q value changes by more than this amount in one iteration, default 1e-9
+    :param maxIterations: The maximum number of iterations to run, default 10000
+    :return: A 2-tuple (q, iterations), a 2D numpy array of the optimal Q values indexed by [state, action],
+        and the number of iterations used
+    """
+    newStates, rewards, ends, valid = solverArrays(env)
+
+    q = np.zeros(rewards.shape)
+    iterations = 0
+    for iterations in range(1, maxIterations + 1):
+        newQ = rewards + discountRate * stateValues(q, ends, valid)[newStates]
+        change = np.abs(newQ - q).max()
+        q = newQ
+        if change <= tolerance:
+            break
+
+    return q, iterations
+
+
+def policyIteration(env, discountRate, maxIterations=1000):
+    """
+    Find the optimal Q values and policy of a DummyGame with policy iteration,
+        solving for the exact value of each policy at every step
+    :param env: The DummyGame to solve
+    :param discountRate: The discount rate of future reward, must be less than 1
+    :param maxIterations: The maximum number of iterations to run, default 1000
+    :return: A 2-tuple (q, policy), a 2D numpy array of the optimal Q values indexed by [state, action],
+        and a 1D numpy array of the best action in each state
+    """
+    newStates, rewards, ends, valid = solverArrays(env)
+    states = np.arange(len(newStates))
+
+    # states where the game continues after each action
+    continues = ~ends[newStates]
+    # states which end the game, or have no actions to choose, have no value, the same as in valueIteration
+    terminal = ends | ~valid.any(axis=1)
+
+    # start with the first valid action in every state
+    policy = np.argmax(valid, axis=1)
+    q = rewards
+    for i in range(maxIterations):
+        # solve v = r + discount * P * v for the values of the current policy
+        nextStates = newStates[states, policy]
+        transition = np.zeros((len(states), len(states)))
+        transition[states, nextStates] = continues[states, policy]
+        transition[terminal] = 0
+        policyRewards = np.where(terminal, 0, rewards[states, policy])
+        values = np.linalg.solve(np.eye(len(states)) - discountRate * transition, policyRewards)
+
+        # improve the policy based on those values
+        q = rewards + discountRate * np.where(continues, values[newStates], 0)
+        newPolicy = np.argmax(np.where(valid, q, -np.inf), axis=1)
+        if np.array_equal(newPolicy, policy):
+            break
+        policy = newPolicy
+
+    return q, policy
+
+
+def qError(q, optimalQ, env):
+    """
+    Find how far a Q table is from the optimal Q values, only considering actions which can be chosen,
+        in states which do not end the game
+    :param q: A 2D numpy array of Q values, indexed by [state, action], usually Table.qTable
+    :param optimalQ: A 2D numpy array of the optimal Q values, from valueIteration or policyIteration
+    :param env: The DummyGame used to find the optimal Q values
+    :return: The largest absolute difference between the Q values
+    """
+    newStates, rewards, ends, valid = solverArrays(env)
+    check = valid & ~ends[:, np.newaxis]
+    if not check.any():
+        return 0
+    return np.abs(np.asarray(q) - optimalQ)[check].max()
@@ -14,6 +14,12 @@ In Environments
 from Checkers.Gui import *
 from Checkers.DuelModel import *
 from Checkers.PlayerTrainer import *
+from learning.Solver import *
+from Checkers.Tablebase import *
+from Checkers.Search import *
+from Checkers.MCTS import *
+from Checkers.Arena import *
+from Checkers.League import *
 
 
 # center pygame window
@@ -24,6 +30,8 @@ os.environ['SDL_VIDEO_CENTERED'] = "1"
 
 # True to run the checkers test code, False to run the DummyModel test code
 checkers = True
+# True to rate saved models in an arena instead of running either test code
+arena = False
 
 
 def setRates(model):
@@ -72,18 +80,86 @@ def testCheckers():
     playerTrainerSide = False
     # reset the rates for learning and exploration every this number of games
     resetRatesInterval = 100
+    # True to give the exact result of the game as reward with a tablebase, only practical for a 4x4 game
+    useTablebase = False
+    # Side to play with an alpha-beta search instead of the networks, True for red, False for black, None for neither
+    searchSide = None
+    # the number of seconds the search can use for each move
+    searchTime = 1.0
+    # the number of processes the search splits the first moves across, 1 to search in one process
+    searchWorkers = 1
+    # Side to play with a Monte Carlo tree search using that side's networks, True for red, False for black,
+    #   None for neither
+    mctsSide = None
+    # the number of simulations the tree search runs for each move
+    mctsSimulations = 200
+    # True to find the outputs of the networks with numpy instead of Keras, which is much faster for small networks
+    numpyBackend = False
+    # True to train the networks with a compiled train step instead of Keras fit
+    fastTraining = False
+    # True to also train the networks of each side on the moves made by the other side
+    shareSamples = False
+    # True for both sides to use one game network and one piece network, False for each side to have its own
+    sharedNetworks = False
+    # the number of moves kept by each network to train on again, prioritized by how wrong the network was about them,
+    #   None to only train on each move once
+    replayCapacity = None
+    # the number of moves of each side combined into one transition, so rewards reach earlier moves sooner,
+    #   None to train on each move alone
+    nSteps = None
+    # the number of games to train against a pool of frozen past versions of the model, played in worker processes,
+    #   after the normal training games
+    leagueGames = 0
+    # the number of league games played in each round, between each update of the model used by the worker processes
+    leagueRound = 16
+    # save a checkpoint in the background every this number of training games, None to not count games
+    checkpointGames = None
+    # save a checkpoint in the background every this number of minutes of training, None to not count time
+    checkpointMinutes = None
+    # True to load the newest checkpoint saved during training, instead of the model saved from the Gui
+    resumeCheckpoint = False
 
     # make game
     game = Game(gameSize)
 
     # create the model
     env = DuelModel(game, rPieceInner=[30] * 3, rGameInner=[60] * 3,
-                    bPieceInner=[30] * 3, bGameInner=[60] * 3)
+                    bPieceInner=[30] * 3, bGameInner=[60] * 3, sharedNetworks=sharedNetworks)
     resetRates(env)
+    if numpyBackend:
+        env.setBackend(NumpyBackend)
+    if fastTraining:
+        env.enableFastTraining()
+    env.shareSamples(shareSamples)
+    if replayCapacity is not None:
+        env.enableReplay(replayCapacity)
+    if nSteps is not None:
+        env.enableNStep(nSteps)
 
     # load in the model if applicable
     if loadModel:
-        env.load("", DUEL_MODEL_NAME)
+        if not (resumeCheckpoint and env.loadLatest(CHECKPOINT_PATH, DUEL_MODEL_NAME)):
+            env.load("", DUEL_MODEL_NAME)
+
+    # load the tablebase, or build and save it if it doesn't exist
+    if useTablebase:
+        tablebaseName = "tablebase " + str(gameSize) + ".npy"
+        tablebase = Tablebase.load(tablebaseName)
+        if tablebase is None:
+            tablebase = Tablebase.build(gameSize, printProgress=True)
+            tablebase.save(tablebaseName)
+        env.redEnv.tablebase = tablebase
+        env.blackEnv.tablebase = tablebase
+
+    # set up the search player
+    if searchSide is not None:
+        if searchWorkers > 1:
+            env.setPlayer(searchSide, RootParallelPlayer(game, workers=searchWorkers, timeLimit=searchTime))
+        else:
+            env.setPlayer(searchSide, AlphaBetaPlayer(game, timeLimit=searchTime))
+    if mctsSide is not None:
+        env.setPlayer(mctsSide, MCTSPlayer(game, env.redEnv if mctsSide else env.blackEnv,
+                                           simulations=mctsSimulations))
 
     # set up a default game
     defaultGame = Game(gameSize)
@@ -114,6 +190,10 @@ def testCheckers():
     else:
         defaultGame = None
 
+    # save checkpoints while training, so a long run can be resumed
+    if checkpointGames is not None or checkpointMinutes is not None:
+        env.enableCheckpoints(CHECKPOINT_PATH, DUEL_MODEL_NAME, checkpointGames, checkpointMinutes)
+
     # train the appropriate number of times
     for i in range(trainGames):
         currentTime = time.time()
@@ -133,6 +213,16 @@ def testCheckers():
         else:
             env.decayModels()
 
+    # train against past versions of the model
+    if leagueGames > 0:
+        league = League(env, CHECKPOINT_PATH, DUEL_MODEL_NAME)
+        for i in range(0, leagueGames, leagueRound):
+            summary = league.playRound(min(leagueRound, leagueGames - i))
+            print("League games", i, "to", i + len(summary), "outcomes:", [E_TEXT[s[2]] for s in summary])
+            env.decayModels()
+        league.close()
+    env.closeCheckpoints()
+
     # train games where random moves are taken
     env.trainCollective(collectiveGames, printGames=True)
 
@@ -255,8 +345,42 @@ def testDummyGame():
         print()
         print(qTable.qTable)
 
+        # compare the q table to the optimal q values, only when the move history is not used,
+        #   because the solver does not consider the move history
+        print()
+        if TRACK_MOVE_HISTORY:
+            print("Not comparing to the optimal Q values, the solver does not consider the move history")
+        else:
+            optimalQ, iterations = valueIteration(env, qTable.discountRate)
+            print("Optimal Q values found in " + str(iterations) + " iterations:")
+            print(optimalQ)
+            print("Largest difference from optimal: " + str(qError(qTable.qTable, optimalQ, env)))
+
+
+def rateCheckpoints():
+    """
+    Play saved DuelModels against each other without the Gui, and save their ratings
+    """
+    # the DuelModels to rate, as (loadPath, name), relative to saves
+    checkpoints = [("", DUEL_MODEL_NAME), ("old", DUEL_MODEL_NAME)]
+    # the number of games each pair of DuelModels plays
+    gamesPerPair = 1000
+
+    results = Arena(checkpoints, size=8).run(gamesPerPair, printProgress=True)
+    saveResults(results, "arena results.json")
+    for rating in results["ratings"]:
+        if rating["low"] is None:
+            print(rating["checkpoint"], "Elo: not rated, it did not play anyone connected to the first checkpoint")
+        else:
+            print(rating["checkpoint"], "Elo:", round(rating["elo"]), "(" + str(round(rating["low"])) + " to " +
+                  str(round(rating["high"])) + ")")
+    print(results["outcomes"])
+    print(results["random moves"], "of", results["moves"], "moves were made randomly, not by the networks")
+
 
-if checkers:
+if arena:
+    rateCheckpoints()
+elif checkers:
     testCheckers()
 else:
     testDummyGame()
@@ -0,0 +1,61 @@
+import timeit
+
+from learning.Solver import *
+
+# the grid used by main.testDummyGame
+grid = np.zeros((6, 4), dtype=np.int32)
+grid[5, 3] = WIN
+grid[3, 3] = DEAD
+grid[1, 0] = BAD
+grid[2, 0] = GOOD
+grid[3, 0] = GOOD
+grid[3, 1] = GOOD
+grid[3, 2] = GOOD
+grid[0, 1] = GOOD
+grid[0, 2] = GOOD
+grid[0, 3] = GOOD
+grid[1, 3] = GOOD
+grid[2, 3] = GOOD
+
+# number of episodes to train each Table with
+episodes = 2000
+batchSize = 1000
+
+env = DummyGame(grid)
+optimalQ, iterations = valueIteration(env, 0.7)
+print("value iteration:", timeit.timeit(lambda: valueIteration(env, 0.7), number=100) / 100, "seconds,",
+      iterations, "iterations")
+
+table = Table(NUM_ACTIONS, env, learnRate=0.5, discountRate=0.7, explorationRate=1)
+
+
+def trainSingle():
+    """
+    Train the Table one episode at a time
+    """
+    for i in range(episodes):
+        env.playGame(table, learn=True)
+
+
+batch = DummyGameBatch(grid, batchSize)
+batchTable = Table(NUM_ACTIONS, batch.env, learnRate=0.5, discountRate=0.7, explorationRate=1)
+
+
+def trainBatch():
+    """
+    Train the Table with a batch of episodes at a time
+    """
+    for i in range(episodes // batchSize):
+        batch.playGames(batchTable, learn=True)
+
+
+singleTime = timeit.timeit(trainSingle, number=1)
+batchTime = timeit.timeit(trainBatch, number=1)
+# the solver does not consider the move history, so the error from optimal is only meaningful without it
+if TRACK_MOVE_HISTORY:
+    print("single episodes:", singleTime, "seconds")
+    print("batched episodes:", batchTime, "seconds")
+    print("not comparing to the optimal Q values, the solver does not consider the move history")
+else:
+    print("single episodes:", singleTime, "seconds, error from optimal:", qError(table.qTable, optimalQ, env))
+    print("batched episodes:", batchTime, "seconds, error from optimal:", qError(batchTable.qTable, optimalQ, env))
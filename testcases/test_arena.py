@@ -0,0 +1,103 @@
+from unittest import TestCase
+
+from Checkers.Arena import *
+
+import tempfile
+
+
+class TestArena(TestCase):
+
+    def test_bradleyTerry(self):
+        # equal players have equal ratings
+        wins = np.array([[5., 5.], [5., 5.]])
+        ratings, errors = bradleyTerry(wins, np.zeros((2, 2)))
+        self.assertAlmostEqual(ratings[1], 0)
+        self.assertEqual(errors[0], 0)
+        self.assertGreater(errors[1], 0)
+
+        # a player who scores 3 to 1 is about 190 points stronger, the prior draw pulls it slightly closer
+        wins = np.array([[0., 300.], [900., 0.]])
+        ratings, errors = bradleyTerry(wins, np.zeros((2, 2)))
+        self.assertAlmostEqual(ratings[1], 400 * np.log10(3), delta=1)
+        self.assertLess(ratings[1], 400 * np.log10(3))
+
+        # a player who won every game has a finite rating, and a player who never played is not rated
+        wins = np.array([[0., 10., 0.], [0., 0., 0.], [0., 0., 0.]])
+        ratings, errors = bradleyTerry(wins, np.zeros((3, 3)))
+        self.assertTrue(np.isfinite(ratings[1]))
+        self.assertLess(ratings[1], 0)
+        self.assertEqual(ratings[2], 0)
+        self.assertEqual(errors[2], np.inf)
+
+    def test_summarize(self):
+        arena = Arena([("a", "one"), ("b", "two")])
+        games = [(4, 0, 1, 0, 0), (4, 1, 0, 1, 0), (4, 0, 1, 2, 0), (4, 1, 0, 3, 0)]
+        results = [(E_RED_WIN, 10, 0), (E_RED_WIN, 12, 2), (E_DRAW_TOO_MANY_MOVES, 50, 1), (E_BLACK_WIN, 8, 0)]
+        summary = arena.summarize(games, results)
+
+        self.assertEqual(summary["games"], 4)
+        pair = summary["pairs"][0]
+        self.assertEqual((pair["first wins"], pair["second wins"], pair["draws"]), (2, 1, 1))
+        self.assertEqual(pair["moves"], 80)
+        # the random moves made when the networks could not pick a move are counted
+        self.assertEqual(pair["random moves"], 3)
+        self.assertEqual((summary["moves"], summary["random moves"]), (80, 3))
+        self.assertEqual(summary["outcomes"], {E_TEXT[E_RED_WIN]: 2, E_TEXT[E_BLACK_WIN]: 1,
+                                               E_TEXT[E_DRAW_TOO_MANY_MOVES]: 1})
+        self.assertGreater(summary["ratings"][0]["elo"], summary["ratings"][1]["elo"])
+        rating = summary["ratings"][1]
+        self.assertLess(rating["low"], rating["elo"])
+        self.assertGreater(rating["high"], rating["elo"])
+        json.dumps(summary)
+
+        # a player which never played has no bounds, which is written as null, not as Infinity
+        arena = Arena([("a", "one"), ("b", "two"), ("c", "three")])
+        summary = arena.summarize(games, results)
+        rating = summary["ratings"][2]
+        self.assertIsNone(rating["low"])
+        self.assertIsNone(rating["high"])
+        self.assertIsNone(json.loads(json.dumps(summary, allow_nan=False))["ratings"][2]["high"])
+
+    def test_playEnvironmentMove(self):
+        game = Game(4)
+        env = PieceEnvironment(Game(4))
+        envGame = env.game
+        self.assertTrue(playEnvironmentMove(env, game, 0))
+        self.assertFalse(game.redTurn)
+        self.assertIs(env.game, envGame)
+        self.assertIs(env.gameEnv.game, envGame)
+
+    def test_playArenaGame(self):
+        # a board larger than 4x4 needs a checkpoint with enough inner layers for its networks
+        directory = tempfile.TemporaryDirectory()
+        try:
+            np.random.seed(0)
+            model = DuelModel(Game(6), [8] * 6, [8] * 6, [8] * 6, [8] * 6)
+            self.assertTrue(model.save(directory.name, "one"))
+            shared = DuelModel(Game(6), [4] * 6, [4] * 6, sharedNetworks=True)
+            self.assertTrue(shared.save(directory.name, "two"))
+
+            initArenaWorker([(directory.name, "one"), (directory.name, "two")])
+            win, moves, randomMoves = playArenaGame((6, 0, 1, 3, 0.05))
+            self.assertNotEqual(win, E_PLAYING)
+            self.assertGreater(moves, 0)
+            self.assertLessEqual(randomMoves, moves)
+            self.assertEqual(playArenaGame((6, 0, 1, 3, 0.05)), (win, moves, randomMoves))
+
+            # only the weights are loaded, no Keras models are made
+            self.assertEqual(sorted(arenaBackends), [0, 1])
+            self.assertIsInstance(arenaBackends[0]["red " + GAME_NETWORK_NAME], NumpyBackend)
+
+            # the moves are the same as the moves of the networks of the DuelModel
+            game = Game(6)
+            env = backendEnvironment(game, arenaBackends[0], True)
+            self.assertTrue(playEnvironmentMove(env, game, 0))
+            expected = Game(6)
+            self.assertTrue(playEnvironmentMove(model.redEnv, expected, 0))
+            self.assertEqual(game.toList(), expected.toList())
+
+            initArenaWorker([(directory.name, "missing")])
+            with self.assertRaises(ValueError):
+                playArenaGame((6, 0, 0, 0, 0.05))
+        finally:
+            directory.cleanup()
@@ -0,0 +1,73 @@
+from unittest import TestCase
+
+from Checkers.Environments import *
+
+
+class TestBackend(TestCase):
+
+    def assertSameOutputs(self, net, inputs):
+        expected = KerasBackend(net).predict(inputs)
+        outputs = NumpyBackend(net).predict(inputs)
+        self.assertEqual(outputs.shape, expected.shape)
+        np.testing.assert_allclose(outputs, expected, rtol=1e-5, atol=1e-5)
+
+    def test_dense(self):
+        grid = np.zeros((2, 3), dtype=np.int32)
+        net = Network(NUM_ACTIONS, DummyGame(grid), inner=[7, 5])
+        inputs = np.random.default_rng(0).random((4, net.states))
+        self.assertSameOutputs(net, inputs)
+
+    def test_conv(self):
+        for size in (4, 6, 8):
+            env = PieceEnvironment(Game(size), gameInner=[6] * size, pieceInner=[5] * size)
+            game = env.game
+            self.assertSameOutputs(env.gameNetwork, np.concatenate(
+                [gameToNetInput(game, None)] * 3))
+            self.assertSameOutputs(env.internalNetwork, np.concatenate(
+                [gameToNetInput(game, game.singlePos(s)) for s in range(2)]))
+
+    def test_invalidate(self):
+        env = PieceEnvironment(Game(4), gameInner=[3])
+        net = env.gameNetwork
+        net.setBackend(NumpyBackend(net))
+        inputs = gameToNetInput(env.game, None)
+        before = net.batchOutputs(inputs)
+
+        # the weights are copied again after they change
+        net.net.set_weights([w + 1 for w in net.net.get_weights()])
+        np.testing.assert_allclose(net.batchOutputs(inputs), before)
+        net.backend.invalidate()
+        np.testing.assert_allclose(net.batchOutputs(inputs), KerasBackend(net).predict(inputs).reshape((1, -1)),
+                                   rtol=1e-5)
+
+        # a NumpyBackend without a Network only uses the weights it is given
+        backend = NumpyBackend()
+        backend.load(net.net.get_weights())
+        np.testing.assert_allclose(backend.predict(inputs), KerasBackend(net).predict(inputs), rtol=1e-5)
+
+    def test_quantized(self):
+        env = PieceEnvironment(Game(6), gameInner=[8] * 6, pieceInner=[8] * 6)
+        net = env.gameNetwork
+        inputs = np.concatenate([gameToNetInput(env.game, None)] * 2)
+        reference = NumpyBackend(net)
+
+        for precision, tolerance in ((QUANTIZE_INT8, 0.1), (QUANTIZE_FLOAT16, 0.01)):
+            backend = QuantizedBackend(net, precision)
+            np.testing.assert_allclose(backend.predict(inputs), reference.predict(inputs), atol=tolerance)
+            self.assertLess(backend.weightBytes(), reference.weightBytes())
+
+            report = compareBackends(reference, backend, inputs)
+            self.assertEqual(report["agreement"], 1)
+            self.assertLess(report["max error"], tolerance)
+
+        with self.assertRaises(ValueError):
+            quantizeWeights(net.net.get_weights(), "int4")
+
+    def test_quantizeWeights(self):
+        kernel = np.array([[1, -0.5], [0.25, 2]], dtype=np.float32)
+        quantized, scale, bias = quantizeWeights([kernel, np.zeros(2)], QUANTIZE_INT8)
+        self.assertEqual(quantized.dtype, np.int8)
+        # the largest weight of each output is exact
+        self.assertEqual(quantized[0, 0] * scale[0], 1)
+        self.assertEqual(quantized[1, 1] * scale[1], 2)
+        np.testing.assert_allclose(quantized * scale, kernel, atol=scale.max() / 2)
@@ -0,0 +1,174 @@
+from unittest import TestCase
+
+from Checkers.DuelModel import *
+from Checkers.Search import *
+
+import tempfile
+from unittest import mock
+
+
+class TestCheckpoint(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.fileName = path.join(self.directory.name, "checkpoint")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_writeCheckpoint(self):
+        env = PieceEnvironment(Game(4), gameInner=[5], pieceInner=[6])
+        net = env.gameNetwork
+        net.explorationRate = 0.25
+        net.learnDecay = 0.9
+        inputs = gameToNetInput(env.game, None)
+        expected = np.array(net.batchOutputs(inputs))
+
+        writeCheckpoint({"game": networkSnapshot(net)}, self.fileName)
+        snapshots = readCheckpoint(self.fileName)
+        self.assertEqual(list(snapshots.keys()), ["game"])
+        self.assertIsInstance(snapshots["game"]["weights"][0], np.memmap)
+        for a, b in zip(snapshots["game"]["weights"], net.net.get_weights()):
+            np.testing.assert_array_equal(a, b)
+
+        # a network with different layers is rebuilt, and gets the same weights and rates
+        other = PieceEnvironment(Game(4), gameInner=[3, 3]).gameNetwork
+        self.assertTrue(restoreNetwork(other, snapshots["game"]))
+        self.assertEqual(other.inner, [5])
+        self.assertEqual(other.explorationRate, 0.25)
+        self.assertEqual(other.learnDecay, 0.9)
+        np.testing.assert_allclose(other.batchOutputs(inputs), expected, rtol=1e-6)
+
+        # a network with a different number of outputs can't be restored
+        self.assertFalse(restoreNetwork(env.internalNetwork, snapshots["game"]))
+
+    def test_readCheckpoint(self):
+        self.assertIsNone(readCheckpoint(self.fileName))
+
+        writeCheckpoint({}, self.fileName)
+        self.assertEqual(readCheckpoint(self.fileName), {})
+
+        # a checkpoint from a different version is not read
+        with open(self.fileName + CHECKPOINT_MANIFEST_EXTENSION, "w") as f:
+            json.dump({"version": CHECKPOINT_VERSION + 1}, f)
+        self.assertIsNone(readCheckpoint(self.fileName))
+
+    def test_rewriteCheckpoint(self):
+        net = PieceEnvironment(Game(4), gameInner=[5]).gameNetwork
+        snapshot = networkSnapshot(net)
+        writeCheckpoint({"game": snapshot}, self.fileName)
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ["checkpoint.0.weights", "checkpoint.json"])
+
+        # writing again uses a new weights file, and removes the old one once the manifest refers to the new one
+        changed = dict(snapshot, weights=[w + 1 for w in snapshot["weights"]])
+        writeCheckpoint({"game": changed}, self.fileName)
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ["checkpoint.1.weights", "checkpoint.json"])
+        np.testing.assert_array_equal(readCheckpoint(self.fileName)["game"]["weights"][0], changed["weights"][0])
+
+        # a crash before the manifest is replaced leaves the old manifest with its own weights
+        replace = os.replace
+
+        def crash(source, destination):
+            if destination.endswith(CHECKPOINT_MANIFEST_EXTENSION):
+                raise OSError("crash")
+            replace(source, destination)
+
+        with mock.patch("os.replace", crash):
+            with self.assertRaises(OSError):
+                writeCheckpoint({"game": snapshot}, self.fileName)
+        np.testing.assert_array_equal(readCheckpoint(self.fileName)["game"]["weights"][0], changed["weights"][0])
+
+        # the next write continues from the manifest, and every file of the checkpoint can be removed
+        writeCheckpoint({"game": snapshot}, self.fileName)
+        np.testing.assert_array_equal(readCheckpoint(self.fileName)["game"]["weights"][0], snapshot["weights"][0])
+        removeCheckpoint(self.fileName)
+        self.assertIsNone(readCheckpoint(self.fileName))
+        self.assertNotIn("checkpoint.json", os.listdir(self.directory.name))
+        self.assertNotIn("checkpoint.2.weights", os.listdir(self.directory.name))
+
+    def test_duelModel(self):
+        model = DuelModel(Game(4), rGameInner=[4], bPieceInner=[3])
+        self.assertTrue(model.save(self.directory.name, "duel"))
+
+        loaded = DuelModel(Game(4))
+        self.assertTrue(loaded.load(self.directory.name, "duel"))
+        inputs = gameToNetInput(loaded.game, None)
+        for name, net in model.networks().items():
+            other = loaded.networks()[name]
+            self.assertEqual(other.inner, net.inner)
+            if name.endswith(GAME_NETWORK_NAME):
+                np.testing.assert_allclose(other.batchOutputs(inputs), net.batchOutputs(inputs), rtol=1e-6)
+
+        self.assertFalse(loaded.load(self.directory.name, "missing"))
+
+    def test_checkpointer(self):
+        checkpointer = Checkpointer(self.fileName, everyGames=2, keep=2)
+        snapshot = lambda: {}
+        self.assertFalse(checkpointer.gameFinished(snapshot))
+        self.assertTrue(checkpointer.gameFinished(snapshot))
+        for i in range(4):
+            checkpointer.save({})
+            checkpointer.wait()
+        checkpointer.close()
+        self.assertIsNone(checkpointer.error)
+
+        # only the newest checkpoints are kept, with no temporary files left behind
+        self.assertEqual(checkpointIndexes(self.fileName), [3, 4])
+        self.assertEqual(sorted(os.listdir(self.directory.name)),
+                         ["checkpoint 000003.0.weights", "checkpoint 000003.json",
+                          "checkpoint 000004.0.weights", "checkpoint 000004.json"])
+        self.assertEqual(latestCheckpoint(self.fileName), self.fileName + " 000004")
+
+        # a new Checkpointer continues the numbering
+        self.assertEqual(Checkpointer(self.fileName).nextIndex, 5)
+
+    def test_checkpointerError(self):
+        # an error which is not from the disk is kept, and the Checkpointer can still wait, close, and write again
+        checkpointer = Checkpointer(self.fileName)
+        with mock.patch("learning.Checkpoint.writeCheckpoint", side_effect=ValueError("bad snapshot")):
+            checkpointer.save({})
+            waiting = threading.Thread(target=checkpointer.wait, daemon=True)
+            waiting.start()
+            waiting.join(10)
+            self.assertFalse(waiting.is_alive())
+        self.assertIsInstance(checkpointer.error, ValueError)
+
+        checkpointer.save({})
+        checkpointer.close()
+        self.assertEqual(checkpointIndexes(self.fileName), [1])
+
+    def test_duelModelCheckpoints(self):
+        model = DuelModel(Game(4), rGameInner=[4])
+        model.enableCheckpoints(self.directory.name, "duel", everyGames=1)
+        # both sides play with a search, so the game ends quickly without training
+        model.setPlayer(True, AlphaBetaPlayer(model.game, maxDepth=1))
+        model.setPlayer(False, AlphaBetaPlayer(model.game, maxDepth=1))
+        model.playGame()
+        model.closeCheckpoints()
+        self.assertIsNone(model.checkpointer)
+
+        loaded = DuelModel(Game(4))
+        self.assertTrue(loaded.loadLatest(self.directory.name, "duel"))
+        self.assertEqual(loaded.redEnv.gameNetwork.inner, [4])
+        self.assertFalse(loaded.loadLatest(self.directory.name, "missing"))
+
+    def test_quantized(self):
+        model = DuelModel(Game(4), rGameInner=[4])
+        self.assertTrue(model.exportQuantized(self.directory.name, "quantized", QUANTIZE_FLOAT16))
+
+        # a quantized checkpoint can only be used for inference
+        loaded = DuelModel(Game(4))
+        self.assertFalse(loaded.load(self.directory.name, "quantized"))
+        self.assertTrue(loaded.loadQuantized(self.directory.name, "quantized"))
+        self.assertIsInstance(loaded.redEnv.gameNetwork.backend, QuantizedBackend)
+        inputs = gameToNetInput(loaded.game, None)
+        np.testing.assert_allclose(loaded.redEnv.gameNetwork.batchOutputs(inputs),
+                                   model.redEnv.gameNetwork.batchOutputs(inputs), atol=0.01)
+
+        self.assertTrue(model.save(self.directory.name, "float"))
+        self.assertFalse(loaded.loadQuantized(self.directory.name, "float"))
+
+        report = model.quantizationReport(QUANTIZE_INT8, positions=10)
+        self.assertEqual(set(report.keys()), set(model.networks().keys()))
+        for result in report.values():
+            self.assertLess(result["quantized bytes"], result["float bytes"])
@@ -0,0 +1,69 @@
+from unittest import TestCase
+
+from Checkers.Environments import *
+from learning.Dataset import *
+
+import tempfile
+
+
+class TestDataset(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.inputs = (rng.random((50, 4, 2, 4)) > 0.7).astype(np.float32)
+        self.outputs = rng.random((50, 1, 1, 8)).astype(np.float32)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_encodeInputs(self):
+        encoded = encodeInputs(self.inputs)
+        self.assertEqual(encoded.shape, (50, 4))
+        np.testing.assert_array_equal(decodeInputs(tf.constant(encoded), (4, 2, 4)).numpy(), self.inputs)
+
+    def test_shardDataset(self):
+        writer = ShardWriter(self.directory.name, shardSize=20)
+        writer.add(self.inputs[:30], self.outputs[:30])
+        writer.add(self.inputs[30:], self.outputs[30:])
+        writer.close()
+        self.assertEqual(len(shardFiles(self.directory.name)), 3)
+
+        # every sample is read once, in order when not shuffled
+        batches = list(shardDataset(self.directory.name, batchSize=16, shuffle=False))
+        self.assertEqual([len(i) for i, o in batches], [16, 16, 16, 2])
+        np.testing.assert_array_equal(np.concatenate([i for i, o in batches]), self.inputs)
+        np.testing.assert_array_equal(np.concatenate([o for i, o in batches]), self.outputs)
+
+        # shuffling keeps every sample
+        outputs = np.concatenate([o for i, o in shardDataset(self.directory.name, batchSize=16, seed=1)])
+        self.assertFalse(np.array_equal(outputs, self.outputs))
+        np.testing.assert_array_equal(np.sort(outputs, axis=None), np.sort(self.outputs, axis=None))
+
+        # a new writer numbers its shards after the existing ones
+        self.assertEqual(ShardWriter(self.directory.name).nextIndex, 3)
+
+        with self.assertRaises(ValueError):
+            shardDataset(path.join(self.directory.name, "missing"))
+
+    def test_generatorDataset(self):
+        dataset = generatorDataset(lambda: zip(self.inputs, self.outputs), (4, 2, 4), (1, 1, 8), shuffle=False)
+        batches = list(dataset)
+        self.assertEqual([len(i) for i, o in batches], [TRAIN_BATCH_SIZE, 50 - TRAIN_BATCH_SIZE])
+        np.testing.assert_array_equal(np.concatenate([o for i, o in batches]), self.outputs)
+
+    def test_trainDataset(self):
+        net = PieceEnvironment(Game(4), gameInner=[6]).gameNetwork
+        dataset = generatorDataset(lambda: zip(self.inputs, self.outputs), (4, 2, 4), (1, 1, 8), batchSize=8)
+
+        def error():
+            return float(np.mean((net.batchOutputs(self.inputs) - self.outputs.reshape((50, -1))) ** 2))
+
+        before = error()
+        net.trainDataset(dataset, epochs=3)
+        middle = error()
+        self.assertLess(middle, before)
+
+        net.enableFastTraining(jitCompile=False, stepsPerExecution=4)
+        net.trainDataset(dataset, epochs=3)
+        self.assertLess(error(), middle)
@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from Checkers.DuelModel import *
+
+import tempfile
+
+
+class TestDuelModel(TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.directory = tempfile.TemporaryDirectory()
+        self.model = DuelModel(Game(4), rGameInner=[6], rPieceInner=[6], sharedNetworks=True)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_sharedNetworks(self):
+        # both sides use the same networks, which are only listed once
+        self.assertIs(self.model.redEnv, self.model.blackEnv)
+        self.assertIsNone(self.model.redEnv.enemyEnv)
+        self.assertEqual(sorted(self.model.networks().keys()),
+                         ["red " + GAME_NETWORK_NAME, "red " + PIECE_NETWORK_NAME])
+        self.model.shareSamples()
+        self.assertEqual(self.model.redEnv.gameNetwork.sampleTwins, [])
+
+        # the networks train on the moves of both sides
+        self.model.enableReplay(100, batchSize=1000)
+        redMoves, blackMoves = self.model.playGame()[2:]
+        self.assertEqual(len(self.model.redEnv.gameNetwork.replay), redMoves + blackMoves)
+
+    def test_load(self):
+        self.assertTrue(self.model.save(self.directory.name, "shared"))
+
+        # a DuelModel with a network for each side uses the shared networks for both sides
+        duel = DuelModel(Game(4), rGameInner=[6], rPieceInner=[6], bGameInner=[6], bPieceInner=[6])
+        self.assertTrue(duel.load(self.directory.name, "shared"))
+        expected = self.model.redEnv.gameNetwork.net.get_weights()
+        for net in (duel.redEnv.gameNetwork, duel.blackEnv.gameNetwork):
+            for a, b in zip(net.net.get_weights(), expected):
+                np.testing.assert_array_equal(a, b)
+
+        # and a DuelModel with shared networks loads the red networks of a DuelModel without
+        self.assertTrue(duel.save(self.directory.name, "duel"))
+        shared = DuelModel(Game(4), sharedNetworks=True)
+        self.assertTrue(shared.load(self.directory.name, "duel"))
+
+    def test_sideEntry(self):
+        entries = {"red game": 1, "black piece": 2}
+        self.assertEqual(sideEntry(entries, "black game"), 1)
+        self.assertEqual(sideEntry(entries, "black piece"), 2)
+        self.assertIsNone(sideEntry(entries, "red piece"))
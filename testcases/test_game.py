@@ -164,6 +164,29 @@ class TestGame(TestCase):
         actual = game.toList()
         self.assertEqual(expected, actual)
 
+    def test_toKey(self):
+        # create Game and set pieces
+        game = Game(4)
+        game.clearBoard()
+        game.spot(0, 0, (True, True), True)
+        game.spot(1, 1, (False, False), True)
+
+        # verify the digits of the key from both perspectives
+        game.redTurn = True
+        self.assertEqual(game.toKey(), (2 + 3 * 5 ** 3) * 2 + 1)
+        self.assertEqual(game.toKey(True), game.toKey())
+        self.assertEqual(game.toKey(False), (1 * 5 ** 4 + 4 * 5 ** 7) * 2)
+
+        # verify the key changes only in the turn bit when the turn changes
+        game.redTurn = False
+        self.assertEqual(game.toKey(True), (2 + 3 * 5 ** 3) * 2)
+        self.assertEqual(game.toKey(), (1 * 5 ** 4 + 4 * 5 ** 7) * 2 + 1)
+
+        # verify different positions give different keys
+        copy = game.makeCopy()
+        copy.spot(1, 3, (True, False), True)
+        self.assertNotEqual(game.toKey(), copy.toKey())
+
     def test_singlePos(self):
         # create a Game
         game = Game(6)
@@ -694,6 +717,33 @@ class TestGame(TestCase):
         for i in range(4):
             self.assertEqual(moves[i], None)
 
+    def test_allMoves(self):
+        # create a Game
+        game = Game(8)
+
+        # test the starting moves for red, each of the 4 front pieces can move, except the rightmost, which
+        #   can only move left
+        moves = game.allMoves()
+        self.assertEqual(len(moves), 7)
+        for pos, modifiers in moves:
+            self.assertTrue(game.canPlay(pos, modifiers, game.redTurn))
+            self.assertEqual(pos[1], 5)
+
+        # test moves are from the perspective of black, after red moves
+        game.play((1, 5), (True, True, False))
+        moves = game.allMoves()
+        self.assertEqual(len(moves), 7)
+        for pos, modifiers in moves:
+            self.assertTrue(game.canPlay(pos, modifiers, False))
+
+        # test a king can move in all directions, and no moves are found with no pieces
+        game.clearBoard()
+        game.redTurn = True
+        game.spot(1, 3, (True, True), True)
+        self.assertEqual(len(game.allMoves()), 4)
+        game.spot(1, 3, None, True)
+        self.assertEqual(game.allMoves(), [])
+
     def test_canMovePos(self):
         # create a Game
         game = Game(8)
@@ -0,0 +1,27 @@
+from unittest import TestCase
+
+from LazyModule import *
+
+import os
+import subprocess
+import sys
+
+
+class TestLazyModule(TestCase):
+
+    def test_load(self):
+        module = LazyModule("json")
+        self.assertFalse(module.loaded())
+        self.assertEqual(module.dumps([1]), "[1]")
+        self.assertTrue(module.loaded())
+
+        attribute = LazyModule("os", "path")
+        self.assertIs(attribute.join, os.path.join)
+
+    def test_gameImport(self):
+        # the game, and the models, can be imported without TensorFlow or Pygame
+        code = ("import sys, Checkers.Game, Checkers.DuelModel, Checkers.Gui; "
+                "print('tensorflow' in sys.modules, 'pygame' in sys.modules)")
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(result.stdout.strip(), "False False", result.stderr)
@@ -0,0 +1,96 @@
+from unittest import TestCase
+
+from Checkers.League import *
+
+import tempfile
+
+
+class TestLeague(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.model = DuelModel(Game(4))
+        self.league = League(self.model, self.directory.name, "league", poolSize=2, snapshotGames=4, workers=0)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_freeze(self):
+        # the first opponent is the DuelModel when the League is created
+        self.assertEqual([o["index"] for o in self.league.pool], [0])
+        self.league.freeze()
+        self.league.pool[0].update(games=4, wins=4)
+        self.league.pool[1].update(games=4, losses=4)
+
+        # the opponent beaten most often is removed once the pool is full, but never the newest
+        self.league.freeze()
+        self.assertEqual([o["index"] for o in self.league.pool], [1, 2])
+        self.assertEqual(checkpointIndexes(self.league.poolName), [1, 2])
+
+        # a new League continues with the saved opponents
+        league = League(self.model, self.directory.name, "league", workers=0)
+        self.assertEqual([o["index"] for o in league.pool], [1, 2])
+
+    def test_opponentWeights(self):
+        self.league.freeze()
+        self.assertAlmostEqual(self.league.winRate(self.league.pool[0]), 0.5)
+        self.league.pool[0].update(games=8, wins=8)
+        self.league.pool[1].update(games=8, wins=2, losses=4)
+        self.assertAlmostEqual(self.league.winRate(self.league.pool[0]), 0.9)
+        self.assertAlmostEqual(self.league.winRate(self.league.pool[1]), 0.4)
+
+        # the opponent which wins more is sampled more, but every opponent can be sampled
+        weights = self.league.opponentWeights()
+        self.assertAlmostEqual(weights.sum(), 1)
+        self.assertGreater(weights[1], weights[0])
+        self.assertGreater(weights[0], 0)
+
+    def test_playLeagueGame(self):
+        writeCheckpoint(inferenceSnapshot(self.model), self.league.learnerName)
+        rates = {n: 0.5 for n in self.model.networks()}
+        task = (4, self.league.learnerName, 1, periodicCheckpointName(self.league.poolName, 0), False, 3, rates)
+        random.seed(1)
+        np.random.seed(1)
+        randomState, npState = random.getstate(), np.random.get_state()
+        win, moves = playLeagueGame(task)
+        self.assertNotEqual(win, E_PLAYING)
+        self.assertEqual(playLeagueGame(task), (win, moves))
+        self.assertTrue(any(m[2] for m in moves))
+
+        # the game does not use or change the random numbers of the process playing it
+        self.assertEqual(random.getstate(), randomState)
+        np.testing.assert_array_equal(np.random.get_state()[1], npState[1])
+
+        # replaying the moves for training ends the game the same way
+        weights = self.model.blackEnv.gameNetwork.net.get_weights()
+        self.league.trainGame(False, moves)
+        self.assertEqual(self.model.game.win, win)
+        self.assertFalse(all(np.array_equal(a, b) for a, b in
+                             zip(self.model.blackEnv.gameNetwork.net.get_weights(), weights)))
+
+    def test_playLeagueGameLarger(self):
+        # games on larger boards are played without a DuelModel of the same size in the worker
+        model = DuelModel(Game(6), [8] * 6, [8] * 6, [8] * 6, [8] * 6)
+        league = League(model, self.directory.name, "larger", workers=0)
+        writeCheckpoint(inferenceSnapshot(model), league.learnerName)
+        rates = {n: 0.5 for n in model.networks()}
+        task = (6, league.learnerName, 1, periodicCheckpointName(league.poolName, 0), True, 5, rates)
+        win, moves = playLeagueGame(task)
+        self.assertNotEqual(win, E_PLAYING)
+        self.assertEqual(playLeagueGame(task), (win, moves))
+
+        # replaying the moves for training ends the game the same way
+        league.trainGame(True, moves)
+        self.assertEqual(model.game.win, win)
+
+    def test_playRound(self):
+        summary = self.league.playRound(4)
+        self.assertEqual([s[1] for s in summary], [True, False, True, False])
+        opponent = self.league.pool[0]
+        self.assertEqual(opponent["games"], 4)
+        self.assertEqual(opponent["wins"], sum(1 for s in summary if s[2] == (E_RED_WIN if s[1] else E_BLACK_WIN)))
+
+        # the DuelModel is frozen again after enough games
+        self.assertEqual(len(self.league.pool), 2)
+        self.assertEqual(self.league.gamesPlayed, 4)
+        self.league.close()
@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from Checkers.MCTS import *
+
+
+class TestMCTS(TestCase):
+
+    def setUp(self):
+        self.game = Game(4)
+        self.env = PieceEnvironment(self.game)
+
+    def test_selectMove(self):
+        # red can capture the last black piece, or move somewhere else
+        self.game.clearBoard()
+        self.game.spot(0, 3, (True, False), True)
+        self.game.spot(0, 2, (False, False), True)
+        player = MCTSPlayer(self.game, self.env, simulations=50, batchSize=8)
+
+        self.assertEqual(player.selectMove(self.game), ((0, 3), (False, True, True)))
+        self.assertTrue(player.makeMove())
+        self.assertEqual(self.game.win, E_RED_WIN)
+        self.assertFalse(player.makeMove())
+
+    def test_search(self):
+        player = MCTSPlayer(self.game, self.env, simulations=40, batchSize=8)
+        root = MCTSNode(self.game.makeCopy())
+        player.search(root)
+
+        self.assertTrue(root.expanded)
+        self.assertEqual(len(root.priors), len(self.game.allMoves()))
+        self.assertAlmostEqual(root.priors.sum(), 1)
+        # every simulation either visits the tree, or stops a batch early, and no virtual loss is left
+        self.assertLessEqual(root.visits.sum(), 40)
+        self.assertGreater(root.visits.sum(), 0)
+        self.assertTrue(np.all(np.abs(root.values) <= root.visits))
+
+    def test_findRoot(self):
+        player = MCTSPlayer(self.game, self.env, simulations=40)
+        self.assertTrue(player.makeMove())
+        searched = player.root
+        self.assertIsNotNone(searched)
+
+        # the position after the move is reused, including the visits it already has
+        self.assertIs(player.findRoot(self.game), searched)
+        player.reset()
+        self.assertIsNot(player.findRoot(self.game), searched)
+
+    def test_batchOutputs(self):
+        inputs = np.concatenate([gameToNetInput(self.game, None)] * 3)
+        outputs = self.env.gameNetwork.batchOutputs(inputs)
+        self.assertEqual(outputs.shape, (3, self.game.area()))
+        np.testing.assert_allclose(outputs[0], outputs[2])
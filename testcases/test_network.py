@@ -0,0 +1,91 @@
+from unittest import TestCase
+
+from Checkers.Environments import *
+
+
+class TestNetwork(TestCase):
+
+    def setUp(self):
+        self.env = PieceEnvironment(Game(4), gameInner=[6], pieceInner=[6])
+        rng = np.random.default_rng(0)
+        self.net = self.env.gameNetwork
+        self.inputs = rng.random((TRAIN_BATCH_SIZE * 3 + 5,) + gameToNetInput(self.env.game, None).shape[1:])
+        self.outputs = rng.random((len(self.inputs), 1, 1, self.net.actions)) * 0.1
+
+    def error(self):
+        return float(np.mean((self.net.batchOutputs(self.inputs) - self.outputs.reshape((len(self.inputs), -1))) ** 2))
+
+    def test_fitNetwork(self):
+        before = self.error()
+        self.net.fitNetwork(self.inputs, self.outputs, 5)
+        self.assertLess(self.error(), before)
+
+    def test_fastTraining(self):
+        self.net.enableFastTraining(jitCompile=False, stepsPerExecution=2)
+        before = self.error()
+        self.net.fitNetwork(self.inputs, self.outputs, 5)
+        self.assertLess(self.error(), before)
+
+        # a single sample is trained as one minibatch
+        self.net.fitNetwork(self.inputs[:1], self.outputs[:1], 1)
+
+        self.net.disableFastTraining()
+        self.assertFalse(self.net.fastTraining)
+
+    def test_mixedPrecision(self):
+        weights = self.net.net.get_weights()
+        self.net.enableFastTraining(jitCompile=False, mixedPrecision=True)
+
+        # the network is rebuilt with the same weights, and still gives float32 outputs
+        for a, b in zip(self.net.net.get_weights(), weights):
+            np.testing.assert_array_equal(a, b)
+        self.assertEqual(KerasBackend(self.net).predict(self.inputs[:1]).dtype, np.float32)
+
+        before = self.error()
+        self.net.fitNetwork(self.inputs, self.outputs, 5)
+        self.assertLess(self.error(), before)
+
+    def test_shareSamples(self):
+        twin = PieceEnvironment(Game(4), gameInner=[6]).gameNetwork
+        self.net.shareSamples(twin)
+        self.net.shareSamples(twin)
+        self.assertEqual(self.net.sampleTwins, [twin])
+
+        # the twin finds the target of a shared transition with its own network, not the network which shared it
+        nextValid = [True] * twin.actions
+        transition = (self.inputs[:1], 2, 0.5, self.inputs[1:2], nextValid, 0, 1)
+        twin.receiveSample(transition)
+        inputs, outputs = twin.addSharedSamples(self.inputs[2:3], self.outputs[2:3])
+        np.testing.assert_array_equal(inputs, self.inputs[[2, 0]])
+        self.assertEqual(outputs.shape, (2, twin.actions))
+        expected = twin.transitionTargets(*stackTransitions([transition]))[0][0]
+        np.testing.assert_allclose(outputs[1], expected, rtol=1e-6)
+        own = twin.batchOutputs(self.inputs[:1])[0]
+        np.testing.assert_allclose(np.delete(outputs[1], 2), np.delete(own, 2), rtol=1e-6)
+        self.assertNotAlmostEqual(outputs[1, 2], self.net.transitionTargets(*stackTransitions([transition]))[0][0, 2])
+        self.assertEqual(twin.sharedTransitions, [])
+
+        # only the newest transitions are kept
+        for i in range(SHARED_SAMPLE_LIMIT + 3):
+            twin.receiveSample((self.inputs[:1], 0, float(i), self.inputs[1:2], nextValid, 0, 1))
+        self.assertEqual(len(twin.sharedTransitions), SHARED_SAMPLE_LIMIT)
+        self.assertEqual(twin.sharedTransitions[0][2], 3)
+
+        # a twin with a replay stores the transitions in it
+        twin.enableReplay(10)
+        twin.receiveSample(transition)
+        self.assertEqual(len(twin.replay), 1)
+
+    def test_trainRewardShared(self):
+        twin = PieceEnvironment(Game(4), gameInner=[6]).gameNetwork
+        self.net.shareSamples(twin)
+
+        # each move is given to the twin as a transition, which it trains on with its next move
+        state = self.env.currentState()
+        self.net.trainReward(state, self.env.gameEnv.selectAction(), 1.0, self.env.gameEnv.canTakeAction)
+        self.assertEqual(len(twin.sharedTransitions), 1)
+        inputs, action, reward, nextInputs, nextValid, fallback, steps = twin.sharedTransitions[0]
+        self.assertEqual(reward, 1.0)
+        self.assertEqual(steps, 1)
+        self.assertEqual(len(nextValid), twin.actions)
+        np.testing.assert_array_equal(nextInputs, self.net.getInputs())
@@ -42,8 +42,15 @@ class TestPieceEnvironment(TestCase):
         pass
 
     def test_playGame(self):
-        # TODO
-        pass
+        # a game can be played with Q models which are not Networks, which have nothing to train at the end of a game
+        random.seed(0)
+        np.random.seed(0)
+        env = PieceEnvironment(Game(4), createNetworks=False)
+        env.gameNetwork = HashTable(env.game.area(), env.gameEnv)
+        env.internalNetwork = HashTable(Q_PIECE_NUM_ACTIONS, env)
+        env.playGame()
+        self.assertNotEqual(env.game.win, E_PLAYING)
+        self.assertGreater(len(env.gameNetwork.qTable), 0)
 
     def test_saveNetworks(self):
         # TODO
@@ -0,0 +1,250 @@
+from unittest import TestCase
+
+from learning.QLearn import *
+
+import tempfile
+
+
+class TestTable(TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.env = DummyGame(np.array([[MOVE, GOOD], [BAD, WIN]]))
+        self.table = Table(NUM_ACTIONS, self.env, learnRate=0.5, discountRate=0.5, explorationRate=0)
+
+    def test_trainBatch(self):
+        self.table.qTable[1] = [0, 2, 0, 0, 0]
+        other = Table(NUM_ACTIONS, self.env, learnRate=0.5, discountRate=0.5)
+        other.qTable[:] = self.table.qTable
+
+        # repeated state and action pairs are updated once, with the average of their expected values
+        self.table.trainBatch([0, 0, 2], [RIGHT, RIGHT, UP], [1.0, 3.0, -1.0], [1, 1, 0])
+        other.trainBatch([0, 2], [RIGHT, UP], [2.0, -1.0], [1, 0])
+        np.testing.assert_array_equal(self.table.qTable, other.qTable)
+        if not SIMPLE_BELLMAN:
+            self.assertEqual(self.table.qTable[0, RIGHT], 0.5 * (2 + 0.5 * 2))
+            self.assertEqual(self.table.qTable[2, UP], 0.5 * -1)
+
+        # every other entry is unchanged
+        changed = np.zeros(self.table.qTable.shape, dtype=bool)
+        changed[[0, 2], [RIGHT, UP]] = True
+        changed[1, 1] = True
+        self.assertTrue(np.all(self.table.qTable[~changed] == 0))
+
+    def test_trainBatchDone(self):
+        self.table.qTable[1] = [0, 2, 0, 0, 0]
+        other = Table(NUM_ACTIONS, self.env, learnRate=0.5, discountRate=0.5)
+
+        # an action which ends the game uses no future reward, the same as moving to a state with no value
+        self.table.trainBatch([0], [RIGHT], [1.0], [1], [True])
+        other.trainBatch([0], [RIGHT], [1.0], [1])
+        np.testing.assert_array_equal(self.table.qTable[0], other.qTable[0])
+
+    def test_memmap(self):
+        with tempfile.TemporaryDirectory() as directory:
+            fileName = path.join(directory, "table")
+            table = Table(NUM_ACTIONS, self.env, dtype=np.float32, memmapFile=fileName)
+            self.assertIsInstance(table.qTable, np.memmap)
+            self.assertEqual(table.qTable.dtype, np.float32)
+            self.assertTrue(np.all(table.qTable == 0))
+
+            table.trainBatch([0, 1, 3], [RIGHT, DOWN, LEFT], [1.0, 2.0, 3.0], [1, 3, 2])
+            table.flush()
+            values = np.array(table.qTable)
+            del table
+
+            # a table using an existing file starts with the values saved in it
+            loaded = Table(NUM_ACTIONS, self.env, dtype=np.float32, memmapFile=fileName)
+            self.assertEqual(loaded.qTable.dtype, np.float32)
+            np.testing.assert_array_equal(loaded.qTable, values)
+
+            # resetting keeps using the same file
+            loaded.reset()
+            loaded.flush()
+            self.assertIsInstance(loaded.qTable, np.memmap)
+            self.assertTrue(np.all(loaded.qTable == 0))
+            del loaded
+            np.testing.assert_array_equal(np.fromfile(fileName, dtype=np.float32), np.zeros(4 * NUM_ACTIONS))
+
+    def test_dtype(self):
+        table = Table(NUM_ACTIONS, self.env, dtype=np.float16)
+        self.assertEqual(table.qTable.dtype, np.float16)
+        table.trainBatch([0], [RIGHT], [1.0], [1])
+        self.assertEqual(table.qTable.dtype, np.float16)
+        self.assertEqual(table.qTable[0, RIGHT], self.table.learnRate if not SIMPLE_BELLMAN else 1)
+
+    def test_chooseActions(self):
+        self.table.qTable[0] = [1, 3, 2, 0, 0]
+        self.table.qTable[1] = [0, 0, 0, 5, 0]
+        states = np.array([0, 1, 0])
+
+        # with no exploration, the highest valued valid action is picked
+        np.testing.assert_array_equal(self.table.chooseActions(states), [RIGHT, LEFT, RIGHT])
+        valid = np.array([[True, False, True, False, False],
+                          [True, True, False, False, True],
+                          [False] * NUM_ACTIONS])
+        np.testing.assert_array_equal(self.table.chooseActions(states, valid), [DOWN, UP, -1])
+
+        # exploring only picks valid actions
+        self.table.explorationRate = 1
+        valid = np.tile([False, True, False, True, False], (200, 1))
+        actions = self.table.chooseActions(np.zeros(200, dtype=int), valid)
+        self.assertEqual(set(actions.tolist()), {RIGHT, LEFT})
+
+
+class TestHashTable(TestCase):
+
+    def setUp(self):
+        self.env = DummyGame(np.array([[MOVE, GOOD], [BAD, WIN]]))
+        self.table = HashTable(NUM_ACTIONS, self.env, learnRate=0.5, discountRate=0.5, maxEntries=2)
+
+    def test_values(self):
+        self.table.values(0)
+        self.table.values(1)
+        # using a state makes it the most recently used, so the other state is removed first
+        self.table.values(0)
+        self.table.values(2)
+        self.assertEqual(list(self.table.qTable.keys()), [0, 2])
+
+        # finding a state without creating it does not remove any states
+        self.assertTrue(np.all(self.table.values(3, create=False) == 0))
+        self.assertEqual(list(self.table.qTable.keys()), [0, 2])
+        self.table.values(2, create=False)
+        self.table.values(0, create=False)
+        self.table.values(3)
+        self.assertEqual(list(self.table.qTable.keys()), [0, 3])
+
+    def test_trainRewardPresent(self):
+        self.table.values(1)[:] = [0, 0, 4, 0, 0]
+
+        # the value of the next state is used when it is stored, and it becomes the most recently used state
+        self.assertTrue(self.table.trainReward(0, RIGHT, 1.0))
+        self.assertEqual(self.env.currentState(), 1)
+        self.assertEqual(list(self.table.qTable.keys()), [0, 1])
+        expected = 0.5 * (1 + 0.5 * 4) if not SIMPLE_BELLMAN else 1 + 4 * 0.5
+        self.assertEqual(self.table.values(0, create=False)[RIGHT], expected)
+
+        # a stored state keeps its value when it is trained again
+        self.table.trainReward(1, DOWN, 2.0)
+        self.assertNotIn(3, self.table.qTable)
+        self.assertEqual(self.table.values(1, create=False)[DOWN], 4 + 0.5 * (2 - 4) if not SIMPLE_BELLMAN else 2)
+        self.assertEqual(self.table.values(1, create=False)[LEFT], 0)
+
+    def test_trainRewardEvicted(self):
+        self.table.values(1)[:] = [0, 0, 4, 0, 0]
+        self.table.values(2)
+        self.table.values(3)
+        self.assertNotIn(1, self.table.qTable)
+
+        # a removed next state has no value, and is not stored again
+        self.table.trainReward(0, RIGHT, 1.0)
+        self.assertEqual(list(self.table.qTable.keys()), [3, 0])
+        self.assertEqual(self.table.values(0, create=False)[RIGHT], 0.5 if not SIMPLE_BELLMAN else 1)
+
+        # training a removed state starts again from no value
+        self.table.trainReward(1, DOWN, 2.0)
+        self.assertEqual(list(self.table.qTable.keys()), [0, 1])
+        self.env.x, self.env.y = 0, 1
+        self.table.trainReward(2, UP, 1.0)
+        self.assertNotIn(0, self.table.qTable)
+        self.env.reset()
+        self.assertTrue(np.all(self.table.getOutputs() == 0))
+        self.table.trainReward(0, RIGHT, 1.0)
+        self.assertEqual(self.table.values(0, create=False)[RIGHT], 0.5 if not SIMPLE_BELLMAN else 1)
+
+
+class TestDummyGame(TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.grid = np.array([[MOVE, GOOD, BAD],
+                              [BAD, MOVE, GOOD],
+                              [MOVE, DEAD, WIN]])
+        self.env = DummyGame(self.grid.copy())
+
+    def test_transitions(self):
+        # every transition is the same as taking the action in the game
+        newStates, rewards = self.env.transitions()
+        self.assertEqual(newStates.shape, (9, NUM_ACTIONS))
+        for s in range(9):
+            for a in range(NUM_ACTIONS):
+                self.env.x, self.env.y = self.env.pos(s)
+                self.env.takeAction(a)
+                self.assertEqual(newStates[s, a], self.env.currentState())
+                self.assertEqual(rewards[s, a], self.env.rewardFunc(s, a))
+
+    def test_gridInput(self):
+        env = DummyGame(self.grid.copy(), sizeStates=False)
+
+        def loopInput():
+            # the network input found one grid position at a time
+            arr = np.zeros((1, env.networkInputs()))
+            size = env.width() * env.height()
+            for c in range(NUM_REWARD_SQUARES):
+                for i, y in enumerate(env.grid):
+                    for j, x in enumerate(y):
+                        arr[0][c * size + i * env.width() + j] = 1 if x == c else 0
+            return arr
+
+        np.testing.assert_array_equal(env.toNetInput(), loopInput())
+        # changing the grid changes the input
+        env.setGrid(0, 0, WIN)
+        np.testing.assert_array_equal(env.toNetInput(), loopInput())
+
+        # the input is a copy, so changing it does not change the game
+        env.toNetInput()[0, 0] = 5
+        np.testing.assert_array_equal(env.toNetInput(), loopInput())
+
+    def test_moveHistory(self):
+        if not TRACK_MOVE_HISTORY:
+            return
+        visited = [(0, 0), (1, 0), (1, 1)]
+        for pos in visited:
+            self.env.moveHistory.add(pos)
+
+        # a move can be made only to a position which has not been visited
+        for x in range(3):
+            for y in range(3):
+                self.env.x, self.env.y = x, y
+                for a, (dx, dy) in enumerate([(0, -1), (1, 0), (0, 1), (-1, 0)]):
+                    newPos = (x + dx, y + dy)
+                    inGrid = 0 <= newPos[0] < 3 and 0 <= newPos[1] < 3
+                    self.assertEqual(self.env.canTakeAction(a), inGrid and newPos not in visited)
+                self.assertFalse(self.env.canTakeAction(CANT_MOVE))
+
+        self.env.reset()
+        self.assertEqual(self.env.moveHistory, set())
+
+    def test_batch(self):
+        table = Table(NUM_ACTIONS, self.env, explorationRate=0)
+        table.qTable[:] = np.random.random(table.qTable.shape)
+
+        # with no exploration, every game in the batch is the same as playing one game
+        for pos in [(0, 0), (2, 0), (0, 2)]:
+            self.env.defaultPos = pos
+            total = self.env.playGame(table)
+            batch = DummyGameBatch(self.grid.copy(), 4, pos=pos)
+            np.testing.assert_array_equal(batch.playGames(table), [total] * 4)
+            self.assertTrue(batch.done.all())
+
+    def test_batchValidActions(self):
+        batch = DummyGameBatch(self.grid.copy(), 2, pos=(1, 1))
+        batch.states[1] = 0
+        if TRACK_MOVE_HISTORY:
+            batch.visited[0, 1] = True
+
+        # the valid actions of each game are the same as the valid actions of a single game
+        for g, pos in enumerate([(1, 1), (0, 0)]):
+            self.env.x, self.env.y = pos
+            self.env.moveHistory = {self.env.pos(s) for s in np.flatnonzero(batch.visited[g])}
+            expected = [self.env.canTakeAction(a) for a in range(NUM_ACTIONS)]
+            np.testing.assert_array_equal(batch.validActions()[g], expected)
+
+        np.testing.assert_array_equal(batch.toNetInput(), np.eye(9)[[4, 0]])
+
+    def test_batchLearn(self):
+        table = Table(NUM_ACTIONS, self.env, explorationRate=1)
+        batch = DummyGameBatch(self.grid.copy(), 8)
+        totals = batch.playGames(table, learn=True)
+        self.assertEqual(totals.shape, (8,))
+        self.assertTrue(np.any(table.qTable != 0))
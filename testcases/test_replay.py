@@ -0,0 +1,188 @@
+from unittest import TestCase
+
+from Checkers.Environments import *
+from learning.Replay import *
+
+
+class TestSumTree(TestCase):
+
+    def test_update(self):
+        tree = SumTree(5)
+        self.assertEqual(tree.leaves, 8)
+        tree.update([0, 2, 4], [1.0, 2.0, 3.0])
+        self.assertEqual(tree.total(), 6)
+        tree.update([2], [0.5])
+        self.assertEqual(tree.total(), 4.5)
+        np.testing.assert_array_equal(tree.get([0, 1, 2, 4]), [1, 0, 0.5, 3])
+
+    def test_find(self):
+        tree = SumTree(4)
+        tree.update([0, 1, 2, 3], [1.0, 0.0, 2.0, 3.0])
+        np.testing.assert_array_equal(tree.find([0, 0.99, 1, 2.5, 3, 5.99]), [0, 0, 2, 2, 3, 3])
+        # points at the end of the sum, or past it, find the last leaf with a priority
+        np.testing.assert_array_equal(tree.find([6, 7]), [3, 3])
+
+        tree.update([3], [0.0])
+        np.testing.assert_array_equal(tree.find([3, 10]), [2, 2])
+
+
+class TestPrioritizedReplay(TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.replay = PrioritizedReplay(4, alpha=1, beta=1, betaIncrement=0, epsilon=0)
+        for i in range(6):
+            self.replay.add(np.full((1, 2), i), i % 3, i, np.full((1, 2), i + 1), [True, False, True], -i)
+
+    def test_add(self):
+        # the oldest transitions are replaced once the replay is full
+        self.assertEqual(len(self.replay), 4)
+        np.testing.assert_array_equal(self.replay.inputs[:, 0], [4, 5, 2, 3])
+        np.testing.assert_array_equal(self.replay.rewards, [4, 5, 2, 3])
+        np.testing.assert_array_equal(self.replay.fallbacks, [-4, -5, -2, -3])
+        self.assertEqual(self.replay.tree.total(), 4)
+
+    def test_sample(self):
+        self.replay.updatePriorities([0, 1, 2, 3], [1.0, 0.0, -3.0, 0.0])
+        indexes, inputs, actions, rewards, nextInputs, nextValid, fallbacks, steps, weights = self.replay.sample(100)
+
+        # transitions are sampled in proportion to their priority, and never with a priority of 0
+        counts = np.bincount(indexes, minlength=4)
+        np.testing.assert_array_equal(counts, [25, 0, 75, 0])
+        np.testing.assert_array_equal(inputs[:, 0], self.replay.inputs[indexes, 0])
+        np.testing.assert_array_equal(nextInputs[:, 0], inputs[:, 0] + 1)
+        self.assertEqual(nextValid.shape, (100, 3))
+
+        # rarely sampled transitions have larger weights
+        self.assertEqual(weights.max(), 1)
+        np.testing.assert_allclose(weights[indexes == 2], 1 / 3)
+        np.testing.assert_allclose(weights[indexes == 0], 1)
+
+    def test_maxPriority(self):
+        self.replay.updatePriorities([0], [5.0])
+        self.assertEqual(self.replay.maxPriority, 5)
+        self.replay.add(np.zeros((1, 2)), 0, 0, np.zeros((1, 2)), [True, True, True])
+        self.assertEqual(self.replay.tree.get([2])[0], 5)
+
+
+class TestNStepBuffer(TestCase):
+
+    def setUp(self):
+        self.buffer = NStepBuffer(3)
+
+    def add(self, i):
+        return self.buffer.add(np.full((1, 2), i), i, float(i + 1), np.full((1, 2), i + 1), [True, i < 3], -i, 0.5)
+
+    def test_add(self):
+        self.assertEqual(self.add(0), [])
+        self.assertEqual(self.add(1), [])
+        # once the window is full, the oldest move is combined with the next two
+        combined = self.add(2)
+        self.assertEqual(len(combined), 1)
+        inputs, action, reward, nextInputs, nextValid, fallback, steps = combined[0]
+        self.assertEqual(inputs[0, 0], 0)
+        self.assertEqual(action, 0)
+        self.assertEqual(reward, 1 + 2 * 0.5 + 3 * 0.25)
+        self.assertEqual(nextInputs[0, 0], 3)
+        self.assertEqual(nextValid, [True, True])
+        self.assertEqual(fallback, -2)
+        self.assertEqual(steps, 3)
+        self.assertEqual(len(self.buffer), 2)
+
+    def test_finish(self):
+        for i in range(4):
+            self.add(i)
+        # the moves at the end of the episode combine the moves left after them
+        combined = self.buffer.finish(0.5)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual([c[1] for c in combined], [2, 3])
+        self.assertEqual([c[2] for c in combined], [3 + 4 * 0.5, 4])
+        self.assertEqual([c[3][0, 0] for c in combined], [4, 4])
+        self.assertEqual([c[4] for c in combined], [[True, False], [True, False]])
+        self.assertEqual([c[6] for c in combined], [2, 1])
+        self.assertEqual(self.buffer.finish(0.5), [])
+
+    def test_players(self):
+        # the moves of each player are only combined with their own moves
+        for i in range(4):
+            self.buffer.add(np.full((1, 2), i), i, 1.0, np.full((1, 2), i + 1), [True], 0, 0.5, player=i % 2 == 0)
+        self.assertEqual(len(self.buffer), 4)
+        combined = self.buffer.finish(0.5)
+        self.assertEqual(sorted((c[1], c[2], c[3][0, 0], c[6]) for c in combined),
+                         [(0, 1.5, 3, 2), (1, 1.5, 4, 2), (2, 1, 3, 1), (3, 1, 4, 1)])
+
+
+class TestNetworkReplay(TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.env = PieceEnvironment(Game(4), gameInner=[6], pieceInner=[6])
+        self.net = self.env.gameNetwork
+
+    def test_sampleWeights(self):
+        rng = np.random.default_rng(0)
+        inputs = rng.random((10,) + gameToNetInput(self.env.game, None).shape[1:])
+        outputs = rng.random((10, self.net.actions))
+
+        # a sample with no weight does not change the network
+        for fast in (False, True):
+            if fast:
+                self.net.enableFastTraining(jitCompile=False)
+            weights = self.net.net.get_weights()
+            self.net.fitNetwork(inputs, outputs, 1, np.zeros(10))
+            for a, b in zip(self.net.net.get_weights(), weights):
+                np.testing.assert_array_equal(a, b)
+
+    def test_trainReplay(self):
+        self.net.enableReplay(500, batchSize=4)
+        twin = PieceEnvironment(Game(4), gameInner=[6], pieceInner=[6]).gameNetwork
+        twin.enableReplay(500, batchSize=4)
+        self.net.shareSamples(twin)
+
+        weights = self.net.net.get_weights()
+        self.env.playGame()
+        # every move is stored by both networks, and trained on from the replay
+        self.assertGreaterEqual(len(self.net.replay), 4)
+        self.assertEqual(len(twin.replay), len(self.net.replay))
+        self.assertFalse(all(np.array_equal(a, b) for a, b in zip(self.net.net.get_weights(), weights)))
+        # the sampled transitions are given priorities from their errors, instead of the priority they were added with
+        priorities = self.net.replay.tree.get(np.arange(len(self.net.replay)))
+        self.assertTrue(np.any(priorities != 1))
+
+        # nothing is trained until there is a whole batch
+        self.net.enableReplay(500, batchSize=1000)
+        weights = self.net.net.get_weights()
+        self.env.playGame()
+        for a, b in zip(self.net.net.get_weights(), weights):
+            np.testing.assert_array_equal(a, b)
+
+        self.net.disableReplay()
+        self.assertIsNone(self.net.replay)
+
+    def test_nStep(self):
+        self.net.enableNStep(3)
+        twin = PieceEnvironment(Game(4), gameInner=[6], pieceInner=[6]).gameNetwork
+        self.net.shareSamples(twin)
+
+        # the first moves are only trained on once the moves after them are known
+        weights = self.net.net.get_weights()
+        state = self.env.currentState()
+        self.env.gameNetwork.trainReward(state, self.env.gameEnv.selectAction(), 1.0, self.env.gameEnv.canTakeAction)
+        self.assertEqual(len(self.net.nStep), 1)
+        for a, b in zip(self.net.net.get_weights(), weights):
+            np.testing.assert_array_equal(a, b)
+
+        # the rest of the moves are trained on when the game ends, and shared with the twin
+        self.env.playGame()
+        self.assertEqual(len(self.net.nStep), 0)
+        self.assertGreater(len(twin.sharedTransitions), 0)
+        self.assertFalse(all(np.array_equal(a, b) for a, b in zip(self.net.net.get_weights(), weights)))
+
+        # n-step transitions are also stored in a replay
+        self.net.enableReplay(500, batchSize=2)
+        self.env.playGame()
+        self.assertGreater(len(self.net.replay), 0)
+        self.assertTrue(np.any(self.net.replay.steps[:len(self.net.replay)] > 1))
+
+        self.net.disableNStep()
+        self.assertIsNone(self.net.nStep)
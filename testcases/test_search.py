@@ -0,0 +1,164 @@
+from unittest import TestCase
+
+from Checkers.Search import *
+
+
+class TestSearch(TestCase):
+
+    def test_search(self):
+        # red can capture the last black piece, or move somewhere else
+        game = Game(4)
+        game.clearBoard()
+        game.spot(0, 3, (True, False), True)
+        game.spot(0, 2, (False, False), True)
+        player = AlphaBetaPlayer(game, maxDepth=4, timeLimit=None)
+
+        move = player.search(game)
+        self.assertEqual(move, ((0, 3), (False, True, True)))
+        self.assertEqual(player.bestScore, S_WIN_SCORE - 1)
+        self.assertEqual(game.toList(), [None, None, None, None, (False, False), None, (True, False), None])
+
+        self.assertTrue(player.makeMove())
+        self.assertEqual(game.win, E_RED_WIN)
+        self.assertFalse(player.makeMove())
+
+    def test_tableWinScore(self):
+        # red can capture the last black piece, winning in one move
+        game = Game(4)
+        game.clearBoard()
+        game.spot(0, 3, (True, False), True)
+        game.spot(0, 2, (False, False), True)
+        player = AlphaBetaPlayer(game, maxDepth=4, timeLimit=None)
+
+        # the position is found 3 moves after the root, but the win is stored as one move from the position
+        self.assertEqual(player.negamax(game, 2, -S_WIN_SCORE - 1, S_WIN_SCORE + 1, 3, False), S_WIN_SCORE - 4)
+        self.assertEqual(player.table[game.toKey(True)][1], S_WIN_SCORE - 1)
+
+        # the stored win is adjusted to the ply where the position is found again
+        self.assertEqual(player.negamax(game, 2, -S_WIN_SCORE - 1, S_WIN_SCORE + 1, 1, False), S_WIN_SCORE - 2)
+        self.assertEqual(player.negamax(game, 2, -S_WIN_SCORE - 1, S_WIN_SCORE + 1, 5, False), S_WIN_SCORE - 6)
+
+        # losses are adjusted the other way, and other scores are not changed
+        self.assertEqual(scoreFromTable(scoreToTable(3 - S_WIN_SCORE, 3), 1), 1 - S_WIN_SCORE)
+        self.assertEqual(scoreToTable(3 - S_WIN_SCORE, 3), -S_WIN_SCORE)
+        self.assertEqual(scoreToTable(500, 3), 500)
+        self.assertEqual(scoreFromTable(-500, 3), -500)
+
+    def test_searchTime(self):
+        game = Game(8)
+        player = AlphaBetaPlayer(game, maxDepth=100, timeLimit=0.2)
+        start = time.time()
+        move = player.search(game)
+        self.assertIn(move, game.allMoves())
+        self.assertLess(time.time() - start, 2)
+        self.assertGreaterEqual(player.depthReached, 1)
+        self.assertLess(player.depthReached, 100)
+
+    def test_terminalScore(self):
+        game = Game(4)
+        game.win = E_RED_WIN
+        game.redTurn = True
+        self.assertEqual(terminalScore(game, 2), S_WIN_SCORE - 2)
+        game.redTurn = False
+        self.assertEqual(terminalScore(game, 2), 2 - S_WIN_SCORE)
+        game.win = E_DRAW_TOO_MANY_MOVES
+        self.assertEqual(terminalScore(game, 2), 0)
+
+    def test_materialEvaluation(self):
+        game = Game(8)
+        self.assertEqual(materialEvaluation(game), 0)
+
+        # give red an extra king
+        game.clearBoard()
+        game.spot(0, 0, (True, True), True)
+        game.spot(1, 7, (True, False), True)
+        game.spot(2, 0, (False, False), True)
+        self.assertGreater(materialEvaluation(game), 0)
+        game.redTurn = False
+        self.assertLess(materialEvaluation(game), 0)
+
+    def test_rootParallel(self):
+        # red can capture the last black piece, or move somewhere else
+        game = Game(4)
+        game.clearBoard()
+        game.spot(0, 3, (True, False), True)
+        game.spot(0, 2, (False, False), True)
+        player = RootParallelPlayer(game, workers=2, maxDepth=4, timeLimit=None)
+        try:
+            self.assertEqual(player.search(game), ((0, 3), (False, True, True)))
+            self.assertEqual(player.bestScore, S_WIN_SCORE - 1)
+
+            # the best score is the same as searching in one process
+            game.resetGame()
+            single = AlphaBetaPlayer(game, maxDepth=3, timeLimit=None)
+            player.maxDepth = 3
+            single.search(game)
+            self.assertIn(player.search(game), game.allMoves())
+            self.assertEqual(player.bestScore, single.bestScore)
+        finally:
+            player.close()
+
+    def test_rootParallelStop(self):
+        game = Game(8)
+        player = RootParallelPlayer(game, workers=2, maxDepth=100, timeLimit=None)
+        try:
+            # with no time limit, the search only ends when it is stopped
+            result = []
+            thread = threading.Thread(target=lambda: result.append(player.search(game)))
+            start = time.time()
+            thread.start()
+            time.sleep(1)
+            player.stop()
+            thread.join(30)
+            self.assertFalse(thread.is_alive())
+            self.assertLess(time.time() - start, 30)
+            self.assertIn(result[0], game.allMoves())
+            self.assertLess(player.depthReached, 100)
+
+            # the next search is not stopped
+            player.stopped = False
+            player.maxDepth = 2
+            self.assertIn(player.search(game), game.allMoves())
+            self.assertEqual(player.depthReached, 2)
+        finally:
+            player.close()
+
+    def test_ponderer(self):
+        game = Game(4)
+        player = AlphaBetaPlayer(game, maxDepth=3, timeLimit=None)
+        ponderer = Ponderer(player)
+
+        # red is thinking, so black searches every reply
+        ponderer.start(game)
+        ponderer.thread.join()
+        ponderer.stop()
+        positions = predictPositions(game)
+        self.assertEqual(len(ponderer.replies), len(positions))
+
+        # when red makes a move, the reply is ready, and is the same as searching after the move
+        pos, modifiers = game.allMoves()[0]
+        game.play(pos, modifiers)
+        self.assertEqual(ponderer.reply(game), AlphaBetaPlayer(game, maxDepth=3, timeLimit=None).search(game))
+        self.assertFalse(player.stopped)
+
+        # stopping a long search returns quickly, and keeps the player usable
+        player.maxDepth = 100
+        player.timeLimit = 100
+        ponderer.start(Game(8))
+        start = time.time()
+        time.sleep(0.1)
+        ponderer.stop()
+        self.assertLess(time.time() - start, 5)
+        self.assertIsNone(ponderer.thread)
+        self.assertFalse(player.stopped)
+
+    def test_predictPositions(self):
+        # red can only jump, then after landing, the turn passes to black
+        game = Game(4)
+        game.clearBoard()
+        game.spot(0, 3, (True, False), True)
+        game.spot(0, 2, (False, False), True)
+        game.spot(1, 0, (False, False), True)
+        positions = predictPositions(game)
+        self.assertGreater(len(positions), 0)
+        self.assertTrue(all(not p.redTurn == game.redTurn for p in positions))
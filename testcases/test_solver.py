@@ -0,0 +1,70 @@
+from unittest import TestCase
+
+from learning.Solver import *
+
+
+class TestSolver(TestCase):
+
+    def setUp(self):
+        # a line of 3 squares, starting in the middle, winning on the left and dying on the right
+        grid = np.zeros((1, 3), dtype=np.int32)
+        grid[0, 0] = WIN
+        grid[0, 2] = DEAD
+        self.env = DummyGame(grid, pos=(1, 0))
+
+    def test_transitions(self):
+        newStates, rewards = self.env.transitions()
+
+        # moving left and right from the middle square changes the state
+        self.assertEqual(newStates[1, LEFT], 0)
+        self.assertEqual(newStates[1, RIGHT], 2)
+        self.assertEqual(rewards[1, LEFT], D_WIN - MOVE_COST)
+        self.assertEqual(rewards[1, RIGHT], D_DEAD - MOVE_COST)
+
+        # moving out of the grid, or not moving, stays in place
+        self.assertEqual(newStates[1, UP], 1)
+        self.assertEqual(newStates[0, LEFT], 0)
+        self.assertEqual(newStates[1, CANT_MOVE], 1)
+        self.assertEqual(rewards[1, UP], D_DO_NOTHING)
+        self.assertEqual(rewards[1, CANT_MOVE], D_DO_NOTHING)
+
+    def test_valueIteration(self):
+        q, iterations = valueIteration(self.env, 0.5)
+
+        # the best move is to win immediately
+        self.assertAlmostEqual(q[1, LEFT], D_WIN - MOVE_COST)
+        self.assertAlmostEqual(q[1, RIGHT], D_DEAD - MOVE_COST)
+        # not moving costs the do nothing reward, then gets the discounted value of winning
+        self.assertAlmostEqual(q[1, UP], D_DO_NOTHING + 0.5 * (D_WIN - MOVE_COST))
+
+    def test_policyIteration(self):
+        q, policy = policyIteration(self.env, 0.5)
+        expected, iterations = valueIteration(self.env, 0.5)
+
+        self.assertEqual(policy[1], LEFT)
+        self.assertTrue(np.allclose(q, expected))
+
+    def test_noActions(self):
+        # a single square has no actions which move, so it has no value in either solver
+        env = DummyGame(np.zeros((1, 1), dtype=np.int32))
+        q, iterations = valueIteration(env, 0.5)
+        policyQ, policy = policyIteration(env, 0.5)
+        np.testing.assert_allclose(policyQ, q)
+        if not ENABLE_DO_NOTHING:
+            np.testing.assert_allclose(q, env.transitions()[1])
+
+    def test_qError(self):
+        q, iterations = valueIteration(self.env, 0.5)
+        self.assertEqual(qError(q, q, self.env), 0)
+
+        # squares which end the game are not checked
+        changed = q.copy()
+        changed[0] += 5
+        changed[2] += 5
+        self.assertEqual(qError(changed, q, self.env), 0)
+
+        # only actions which move are checked
+        changed[1, CANT_MOVE] += 5
+        self.assertEqual(qError(changed, q, self.env), 0)
+        changed[1, LEFT] += 1
+        self.assertEqual(qError(changed, q, self.env), 1)
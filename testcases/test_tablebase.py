@@ -0,0 +1,123 @@
+from unittest import TestCase
+
+from Checkers.Environments import *
+from Checkers.Tablebase import *
+
+
+class TestTablebase(TestCase):
+
+    def test_build(self):
+        # red can capture the last black piece
+        game = Game(4)
+        game.clearBoard()
+        game.spot(0, 3, (True, False), True)
+        game.spot(0, 2, (False, False), True)
+        tablebase = Tablebase.build(4, startGame=game)
+
+        self.assertEqual(tablebase.lookup(game), (TB_WIN, 1))
+        self.assertEqual(tablebase.reward(game, True), Q_PIECE_REWARD_WIN)
+        self.assertEqual(tablebase.reward(game, False), Q_PIECE_REWARD_LOSE)
+
+        # after the capture, the game is over, and it is still red's turn after jumping, so red has won
+        game.play((0, 3), (False, True, True))
+        self.assertTrue(game.redTurn)
+        self.assertEqual(tablebase.lookup(game), (TB_WIN, 0))
+        self.assertIsNone(tablebase.reward(game, True))
+
+    def test_lookup(self):
+        tablebase = Tablebase.build(4)
+        game = Game(4)
+
+        # every position found by playing moves is in the tablebase
+        for i in range(6):
+            found = tablebase.lookup(game)
+            self.assertIsNotNone(found)
+            if not game.win == E_PLAYING:
+                break
+            pos, modifiers = game.allMoves()[0]
+            game.play(pos, modifiers)
+
+        # a position that can't be reached is not in the tablebase
+        game.clearBoard()
+        game.spot(0, 0, (True, True), True)
+        game.spot(1, 0, (True, True), True)
+        self.assertIsNone(tablebase.lookup(game))
+
+    def test_rewardFunc(self):
+        np.random.seed(0)
+        env = PieceEnvironment(Game(4), gameInner=[6], pieceInner=[6])
+        game = env.game
+        pos, modifiers = game.allMoves()[0]
+        env.current = pos
+        action = boolListToInt(modifiers)
+
+        # count the moves found by the networks
+        performAction = env.gameEnv.performAction
+        calls = []
+
+        def countedAction(qModel):
+            calls.append(qModel)
+            performAction(qModel)
+        env.gameEnv.performAction = countedAction
+
+        # without a tablebase, the enemy moves are found before giving the reward
+        env.rewardFunc(game, action)
+        self.assertGreater(len(calls), 0)
+
+        # a position in the tablebase gives the reward for the move, and how the game ends, without the enemy moves
+        env.tablebase = Tablebase.build(4)
+        calls.clear()
+        newState = game.makeCopy()
+        expected = moveReward(newState, pos, modifiers, True)
+        newState.play(pos, modifiers)
+        expected += env.tablebase.reward(newState, True)
+        self.assertEqual(env.rewardFunc(game, action), expected)
+        self.assertEqual(calls, [])
+
+        # a Tablebase without the position before the enemy moves is still used for the position after them
+        env.gameNetwork.explorationRate = env.internalNetwork.explorationRate = 0
+        env.tablebase = None
+        withoutTablebase = env.rewardFunc(game, action)
+        tablebase = Tablebase.build(4)
+        looked = []
+
+        class LaterTablebase:
+            def reward(self, state, redSide):
+                looked.append(state.makeCopy())
+                return None if len(looked) == 1 else tablebase.reward(state, redSide)
+        env.tablebase = LaterTablebase()
+        reward = env.rewardFunc(game, action)
+        self.assertEqual(len(looked), 2)
+        self.assertTrue(looked[1].redTurn)
+        later = tablebase.reward(looked[1], True)
+        self.assertIsNotNone(later)
+        self.assertEqual(reward, withoutTablebase + later)
+
+    def test_retrogradeAnalysis(self):
+        # position 0 can move to 1, where the same player moves again, or to 2 where the other player moves
+        #   position 1 wins for the player moving, position 2 is a draw
+        successors = [[(1, True), (2, False)], [], []]
+        terminal = {1: TB_WIN, 2: TB_DRAW}
+        results, distances = retrogradeAnalysis(successors, terminal)
+        self.assertEqual(results.tolist(), [TB_WIN, TB_WIN, TB_DRAW])
+        self.assertEqual(distances.tolist(), [1, 0, 0])
+
+        # position 0 can only reach positions which win for the other player, so it loses as late as possible
+        successors = [[(1, False), (2, False)], [(3, True)], [], []]
+        terminal = {2: TB_WIN, 3: TB_WIN}
+        results, distances = retrogradeAnalysis(successors, terminal)
+        self.assertEqual(results.tolist(), [TB_LOSS, TB_WIN, TB_WIN, TB_WIN])
+        self.assertEqual(distances.tolist(), [2, 1, 0, 0])
+
+        # a draw uses the distance of the move which draws, not of the last move solved
+        successors = [[(1, False), (2, False)], [], [(3, True)], []]
+        terminal = {1: TB_DRAW, 3: TB_WIN}
+        results, distances = retrogradeAnalysis(successors, terminal)
+        self.assertEqual(results.tolist(), [TB_DRAW, TB_DRAW, TB_WIN, TB_WIN])
+        self.assertEqual(distances.tolist(), [1, 0, 1, 0])
+
+        # positions which can repeat forever are draws
+        successors = [[(1, False)], [(0, False)]]
+        results, distances = retrogradeAnalysis(successors, {})
+        self.assertEqual(results.tolist(), [TB_DRAW, TB_DRAW])
+        self.assertEqual(distances.tolist(), [TB_NO_DISTANCE, TB_NO_DISTANCE])